@@ -0,0 +1,292 @@
+"""
+AIの計算用ワーカープール
+Bounded worker pool for AI moves
+
+- AIの推測をリクエストのスレッドから切り離し、スレッドプール（またはCPUを使う戦略向けのプロセスプール）で計算する
+- submit() は計算を登録してチケットを返し、クライアントは result() でチケットの結果を待つ（ロングポーリング）
+- 実行中＋待機中の数が workers + max_queue に達したら登録を拒否する（呼び出し側は軽い戦略で即座に計算する）
+- stats(): 登録・完了・失敗・拒否・取り消しの回数、実行中の数、待ち行列の長さ（現在値と最大値）
+  - 失敗は計算中の例外だけで、取り消し・結果を取りに来ないまま上限で削除したチケットは取り消しとして数える
+- compute_ai_move(): ゲーム状態のスナップショット（JSONにできる辞書）からAIの推測を計算する（プールの作業単位）
+- Ponderer: 人間が考えている間に、AIの次の推測を空いているワーカーで先読みしておく（先読み）
+  - 局面（AIのコール履歴と戦略）ごとに結果を保存し、実際の手番で一致すれば計算せずに使う
+  - ゲームごとの局面数・保持するゲーム数に上限があり、ワーカーが空いていない場合は先読みしない
+  - ゲームの終了・新規作成で取り消す（待機中の計算は実行しない）
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait
+from typing import Optional, Dict, Any, Tuple, Callable, List
+
+from numeron_game import AIPlayer
+import numeron_scoring
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_PONDER_GAMES = 1000  # 先読みを保持するゲーム数の上限
+MAX_PONDER_POSITIONS = 16  # 1ゲームで先読みする局面数の上限（AIのコールの判定結果の種類数）
+MAX_TICKETS = 10000  # 結果を取りに来ないチケットを保持する上限（古いものから削除）
+
+
+def compute_ai_move(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """スナップショット（AIの番号・コール履歴・戦略・計算時間の上限）からAIの推測を計算する
+
+    戻り値: {'guess', 'think_time', 'strategy'（次の手で使う戦略）, 'selector', 'timed_out'}
+    """
+    ai = AIPlayer("AI", strategy=snapshot['strategy'], time_budget=snapshot.get('time_budget'),
+                  fallback_strategy=snapshot.get('fallback_strategy'), item_policy="none")
+    ai.set_number(snapshot['number'])
+    for guess, eat, bite in snapshot['calls']:
+        ai.update_possible_numbers(guess, eat, bite)
+    selector = ai.guess_selector
+    started = time.perf_counter()
+    guess = ai.make_guess(None)
+    return {
+        'guess': guess,
+        'think_time': time.perf_counter() - started,
+        'strategy': ai.strategy,
+        'selector': selector.name,
+        'timed_out': selector.last_timed_out,
+    }
+
+
+def warm_up():
+    """判定テーブルを読み込んでおく（プロセスプールの各ワーカーの初期化）"""
+    numeron_scoring.table()
+
+
+class PoolFullError(Exception):
+    """ワーカープールが満杯で登録できない"""
+
+
+class AIWorkerPool:
+    """待ち行列の長さに上限があるワーカープール"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 processes: bool = False):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.processes = processes
+        if processes:
+            self._executor = ProcessPoolExecutor(workers, initializer=warm_up)
+        else:
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix="ai-worker")
+        self._tickets: 'OrderedDict[str, Future]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.max_queue_depth = 0
+
+    def submit(self, fn: Callable, *args, ticket: Optional[str] = None) -> str:
+        """計算を登録してチケットを返す（満杯なら PoolFullError、ticket を指定するとそのチケットで登録する）"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolFullError("AIの計算が混み合っています")
+            self._in_flight += 1
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._in_flight - self.workers)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._done)
+        ticket = ticket or uuid.uuid4().hex
+        self._register(ticket, future)
+        return ticket
+
+    def complete(self, ticket: str, result: Any):
+        """計算済みの結果をチケットで受け取れるようにする（先読み済み・その場で計算した推測）"""
+        future: Future = Future()
+        future.set_result(result)
+        self._register(ticket, future)
+
+    def rename(self, ticket: str, new_ticket: str) -> bool:
+        """計算中のチケットの結果を新しいチケットで受け取るようにする（チケットが無ければFalse）"""
+        with self._lock:
+            future = self._tickets.pop(ticket, None)
+        if future is None:
+            return False
+        self._register(new_ticket, future)
+        return True
+
+    def _register(self, ticket: str, future: Future):
+        expired = []
+        with self._lock:
+            self._tickets[ticket] = future
+            while len(self._tickets) > MAX_TICKETS:
+                expired.append(self._tickets.popitem(last=False)[1])
+            self.cancelled += len(expired)
+        for old in expired:
+            old.cancel()
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                return  # cancel() で数えた
+            if future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def result(self, ticket: str, timeout: float = 0.0) -> Tuple[bool, Any]:
+        """チケットの結果を最大 timeout 秒待って (完了したか, 結果) を返す
+
+        完了したチケットは削除する。不明なチケットは KeyError、計算中の例外はそのまま送出する
+        """
+        with self._lock:
+            future = self._tickets.get(ticket)
+        if future is None:
+            raise KeyError(ticket)
+        wait([future], timeout=timeout)
+        if not future.done():
+            return False, None
+        with self._lock:
+            self._tickets.pop(ticket, None)
+        return True, future.result()
+
+    def idle(self) -> bool:
+        """空いているワーカーがあるか"""
+        with self._lock:
+            return self._in_flight < self.workers
+
+    def cancel(self, ticket: str):
+        """チケットを取り消す（待機中なら実行しない、実行中なら結果を捨てる）"""
+        with self._lock:
+            future = self._tickets.pop(ticket, None)
+            if future is not None:
+                self.cancelled += 1
+        if future is not None:
+            future.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        """カウンタと現在の負荷"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'running': min(self._in_flight, self.workers),
+                'queue_depth': max(0, self._in_flight - self.workers),
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'tickets': len(self._tickets),
+            }
+
+    def shutdown(self, wait: bool = True):
+        """プールを停止する"""
+        self._executor.shutdown(wait=wait)
+
+
+def position_key(snapshot: Dict[str, Any]) -> str:
+    """先読みの局面のキー（AIのコール履歴と戦略）"""
+    return json.dumps([snapshot['strategy'], snapshot['calls']], separators=(',', ':'))
+
+
+class Ponderer:
+    """AIの次の推測の先読み（ワーカープールの空きを使う）"""
+
+    def __init__(self, pool: AIWorkerPool, time_budget: Optional[float] = None,
+                 max_games: int = DEFAULT_PONDER_GAMES):
+        self.pool = pool
+        self.time_budget = time_budget  # 先読み1局面あたりの計算時間の上限（秒）
+        self.max_games = max_games
+        self._games: 'OrderedDict[str, Dict[str, str]]' = OrderedDict()  # ゲームID -> {局面のキー: チケット}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.skipped = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def ponder(self, game_id: str, snapshots: List[Dict[str, Any]]):
+        """起こりうる局面ごとにAIの推測の計算を登録する（以前の先読みは取り消す）"""
+        self.cancel(game_id)
+        tickets = {}
+        skipped = 0
+        for snapshot in snapshots[:MAX_PONDER_POSITIONS]:
+            if not self.pool.idle():
+                # 実際の手番の計算を優先する
+                skipped += 1
+                continue
+            # 先読みでは時間切れでも戦略を切り替えない
+            job = dict(snapshot, time_budget=self.time_budget, fallback_strategy=None)
+            try:
+                tickets[position_key(snapshot)] = self.pool.submit(compute_ai_move, job)
+            except PoolFullError:
+                skipped += 1
+        evicted = []
+        with self._lock:
+            self.started += len(tickets)
+            self.skipped += skipped
+            if tickets:
+                self._games[game_id] = tickets
+                while len(self._games) > self.max_games:
+                    evicted.append(self._games.popitem(last=False)[1])
+        for old in evicted:
+            self._cancel_tickets(old)
+
+    def take(self, game_id: str, snapshot: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """局面の先読みを取り出す
+
+        (None, 推測) : 計算済み / (チケット, None) : 計算中（プールのチケットで結果を待つ） / (None, None) : 先読みなし
+        他の局面の先読みは取り消す
+        """
+        with self._lock:
+            tickets = self._games.pop(game_id, None) or {}
+        ticket = tickets.pop(position_key(snapshot), None)
+        self._cancel_tickets(tickets)
+        if ticket is not None:
+            try:
+                done, move = self.pool.result(ticket)
+            except Exception:
+                # 取り消し済み・計算失敗の場合は先読みなしとして扱う
+                done, move, ticket = False, None, None
+            if ticket is not None:
+                with self._lock:
+                    self.hits += 1
+                return (None, dict(move, pondered=True)) if done else (ticket, None)
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def cancel(self, game_id: str):
+        """ゲームの先読みを取り消す"""
+        with self._lock:
+            tickets = self._games.pop(game_id, None)
+        if tickets:
+            self._cancel_tickets(tickets)
+
+    def _cancel_tickets(self, tickets: Dict[str, str]):
+        """チケットを取り消す（ロックの外で呼ぶ）"""
+        for ticket in tickets.values():
+            self.pool.cancel(ticket)
+        with self._lock:
+            self.cancelled += len(tickets)
+
+    def stats(self) -> Dict[str, int]:
+        """先読みのカウンタ"""
+        with self._lock:
+            return {
+                'games': len(self._games),
+                'started': self.started,
+                'skipped': self.skipped,
+                'hits': self.hits,
+                'misses': self.misses,
+                'cancelled': self.cancelled,
+            }
@@ -1,12 +1,26 @@
 import os
 import logging
+import json
+import functools
 from datetime import datetime, timezone, timedelta
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
+from flask import (Flask, Response, render_template, request, session, redirect, url_for, jsonify, g,
+                   before_render_template, template_rendered)
 from dotenv import load_dotenv
 import random
 import sys
+import time
+import uuid
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from numeron_game import NumeronGame, GameMode, HumanPlayer, AIPlayer, Item, ItemType
+sys.path.append(os.path.dirname(__file__))
+from numeron_game import NumeronGame, GameMode, HumanPlayer, AIPlayer, Item, ItemType, parse_number, random_number
+import numeron_scoring
+from game_store import create_game_store, ConflictError, HashRing
+from ai_pool import AIWorkerPool, Ponderer, PoolFullError, compute_ai_move
+from game_records import GameRecorder, game_record, database_path
+from rooms import RoomRegistry, RoomError, event_stream
+import event_log
+from event_log import log_event
+import metrics
 
 # 環境変数を読み込み
 load_dotenv()
@@ -27,13 +41,54 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     SESSION_COOKIE_SECURE = False  # HTTPS環境ではTrueに変更
     
+    # ゲーム状態ストア設定（クッキーにはゲームIDのみ保存）
+    GAME_STORE_URL = os.environ.get('GAME_STORE_URL') or 'memory://'
+    GAME_STORE_MAX_GAMES = int(os.environ.get('GAME_STORE_MAX_GAMES') or 10000)
+    # 他のワーカーと同時に保存した（バージョンが変わっていた）場合に操作をやり直す回数
+    GAME_SAVE_RETRIES = int(os.environ.get('GAME_SAVE_RETRIES') or 3)
+    # 振り分けのヒント: ワーカー名（カンマ区切り）を指定すると、担当ワーカーを game_route クッキーで返す
+    GAME_ROUTE_NODES = [node for node in os.environ.get('GAME_ROUTE_NODES', '').split(',') if node]
+    
+    # AI設定（1人用）: 1手の計算時間の上限（秒）を超えたら、以降は軽い戦略に切り替える
+    AI_STRATEGY = os.environ.get('AI_STRATEGY') or 'entropy'
+    AI_FALLBACK_STRATEGY = os.environ.get('AI_FALLBACK_STRATEGY') or 'random'
+    AI_TIME_BUDGET = float(os.environ.get('AI_TIME_BUDGET') or 0.05)
+    
+    # AIのワーカープール設定（満杯の場合は軽い戦略でその場で計算する）
+    AI_POOL_WORKERS = int(os.environ.get('AI_POOL_WORKERS') or 2)
+    AI_POOL_QUEUE = int(os.environ.get('AI_POOL_QUEUE') or 16)
+    AI_POOL_PROCESSES = os.environ.get('AI_POOL_PROCESSES', 'False') == 'True'
+    AI_POLL_TIMEOUT = float(os.environ.get('AI_POLL_TIMEOUT') or 10)  # ロングポーリングの最大待ち時間（秒）
+    
+    # AIの先読み設定（人間が考えている間に空いているワーカーで次の推測を計算する）
+    AI_PONDER = os.environ.get('AI_PONDER', 'True') == 'True'
+    AI_PONDER_BUDGET = float(os.environ.get('AI_PONDER_BUDGET') or 1.0)  # 先読み1局面あたりの計算時間の上限（秒）
+    AI_PONDER_MAX_GAMES = int(os.environ.get('AI_PONDER_MAX_GAMES') or 1000)
+    
+    # オンライン対戦設定（Server-Sent Events のキープアライブ間隔、秒）
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT') or 15)
+    # ルーム数の上限と、操作の無いルームを削除するまでの時間（秒）
+    ROOMS_MAX = int(os.environ.get('ROOMS_MAX') or 10000)
+    ROOM_IDLE_TIMEOUT = float(os.environ.get('ROOM_IDLE_TIMEOUT') or 1800)
+    ROOM_SWEEP_INTERVAL = float(os.environ.get('ROOM_SWEEP_INTERVAL') or 60)  # 操作の無いルームを削除する間隔（秒）
+    # ルーム・イベントの購読者・クイックマッチの待ち行列はプロセス内に保持するので、
+    # 複数ワーカーでは無効にする（gunicorn.conf.py がワーカー数から設定する）
+    ROOMS_ENABLED = os.environ.get('ROOMS_ENABLED', 'True') == 'True'
+    
     # アプリケーション設定
     MAX_TURNS = 12
     NUMBER_LENGTH = 3
     
     # ログ設定
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
-    LOG_FILE = os.environ.get('LOG_FILE') or 'logs/numeron.log'
+    LOG_FILE = os.environ.get('LOG_FILE') or 'logs/numeron.log'  # 1行1イベントのJSON
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES') or 10 * 1024 * 1024)  # このサイズでファイルを切り替える
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT') or 5)
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE') or 1.0)  # DEBUGのログを残す割合
+    
+    # メトリクス設定（/metrics）: 複数ワーカーでは各ワーカーの値をこのディレクトリに書き出して合算する
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)
 
 class DevelopmentConfig(Config):
     """開発環境設定"""
@@ -82,44 +137,246 @@ def create_app(config_name=None):
 # ログ設定
 # ----------------------------------------
 def setup_logging(app):
-    os.makedirs('logs', exist_ok=True)
-    logging.basicConfig(
-        level=getattr(logging, app.config['LOG_LEVEL'], logging.INFO),
-        format='%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]',
-        handlers=[
-            logging.FileHandler(app.config['LOG_FILE']),
-            logging.StreamHandler()
-        ]
-    )
+    """ログは待ち行列に入れ、専用スレッドがファイル（JSON・サイズで切り替え）と標準エラーに書き込む"""
+    event_log.setup_logging(level=getattr(logging, app.config['LOG_LEVEL'], logging.INFO),
+                            path=app.config['LOG_FILE'],
+                            max_bytes=app.config['LOG_MAX_BYTES'],
+                            backup_count=app.config['LOG_BACKUP_COUNT'],
+                            sample_rate=app.config['LOG_DEBUG_SAMPLE_RATE'])
 
 # ----------------------------------------
 # アプリケーションインスタンス生成
 # ----------------------------------------
 app = create_app()
+game_router = HashRing(app.config['GAME_ROUTE_NODES']) if app.config['GAME_ROUTE_NODES'] else None
+game_store = create_game_store(app.config['GAME_STORE_URL'],
+                               ttl=app.config['PERMANENT_SESSION_LIFETIME'].total_seconds(),
+                               max_games=app.config['GAME_STORE_MAX_GAMES'])
+ai_pool = AIWorkerPool(app.config['AI_POOL_WORKERS'], app.config['AI_POOL_QUEUE'],
+                       processes=app.config['AI_POOL_PROCESSES'])
+game_recorder = GameRecorder(database_path(app.config['DATABASE_URL']))
+rooms = RoomRegistry(max_rooms=app.config['ROOMS_MAX'], idle_timeout=app.config['ROOM_IDLE_TIMEOUT'])
+ponderer = (Ponderer(ai_pool, time_budget=app.config['AI_PONDER_BUDGET'],
+                     max_games=app.config['AI_PONDER_MAX_GAMES'])
+            if app.config['AI_PONDER'] else None)
 
 # ----------------------------------------
-# ユーティリティ関数
+# メトリクス（/metrics で Prometheus のテキスト形式で出力する）
+# ----------------------------------------
+registry = metrics.Registry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+request_seconds = registry.histogram('numeron_request_seconds', "リクエストの処理時間（秒）", ['action'])
+handler_seconds = registry.histogram('numeron_handler_seconds', "ゲーム操作・画面生成の処理時間（秒）", ['handler'])
+template_seconds = registry.histogram('numeron_template_render_seconds', "テンプレートの描画時間（秒）",
+                                      ['template'])
+session_bytes = registry.histogram('numeron_session_bytes', "セッションクッキーのサイズ（バイト）",
+                                   buckets=metrics.BYTES_BUCKETS)
+state_bytes = registry.histogram('numeron_game_state_bytes', "保存したゲーム状態のサイズ（JSON、バイト）",
+                                 buckets=metrics.BYTES_BUCKETS)
+ai_think_seconds = registry.histogram('numeron_ai_think_seconds', "AIの1手の思考時間（コールから推測を受け取るまで、秒）",
+                                      ['strategy'])
+registry.gauge('numeron_active_games', "保持しているゲーム数", function=lambda: len(game_store))
+registry.gauge('numeron_active_rooms', "オンライン対戦のルーム数", function=lambda: len(rooms))
+registry.gauge('numeron_ai_queue_depth', "AIワーカープールの待ち行列の長さ",
+               function=lambda: ai_pool.stats()['queue_depth'])
+registry.counter('numeron_evicted_games_total', "期限切れ・最大件数超えで削除したゲーム数",
+                 function=lambda: game_store.evicted)
+registry.counter('numeron_evicted_rooms_total', "操作が無く削除したルーム数", function=lambda: rooms.evicted)
+GAME_ACTIONS = {'set_number', 'guess', 'item', 'giveup'}
+
+@app.before_request
+def start_request_timer():
+    registry.start()  # ワーカーごとの書き出し（fork後の最初のリクエストで開始する）
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    """リクエストの処理時間（フォームの操作は操作ごと）とセッションのサイズを記録する"""
+    action = request.endpoint or 'not_found'
+    if action == 'game_post':
+        form_action = request.form.get('action')
+        action = f"game_{form_action if form_action in GAME_ACTIONS else 'other'}"
+    if 'request_started' in g:
+        request_seconds.observe(time.perf_counter() - g.request_started, action=action)
+    cookie = request.cookies.get(app.config.get('SESSION_COOKIE_NAME', 'session'))
+    if cookie:
+        session_bytes.observe(len(cookie))
+    return response
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def observe_template(sender, template, context, **extra):
+    if 'template_started' in g:
+        template_seconds.observe(time.perf_counter() - g.pop('template_started'), template=template.name)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """メトリクス（全ワーカーの合計）"""
+    return Response(registry.render(), content_type=metrics.CONTENT_TYPE)
+
+# ----------------------------------------
+# ゲーム状態（サーバー側に保存し、クッキーのセッションにはゲームIDのみ保存）
 # ----------------------------------------
-def generate_computer_number():
-    digits = list(range(10))
-    random.shuffle(digits)
-    if digits[0] == 0:
-        for i in range(1, 10):
-            if digits[i] != 0:
-                digits[0], digits[i] = digits[i], digits[0]
-                break
-    return digits[:3]
+def new_game_state(mode):
+    """新しいゲーム状態を作成する"""
+    state = {
+        'game_mode': mode,
+        'turn': 1,
+        'current_player': 'プレイヤー1',
+        'game_ended': False,
+        'winner': None,
+        'message': '',
+        'message_type': 'info',
+        'item_used_this_turn': False,
+        'started_at': time.time(),
+    }
+    if mode == 'single':
+        state['player1_number'] = [1, 5, 8]  # プレイヤー番号
+        state['player2_number'] = random_number()  # AI番号
+        state['numbers_set'] = True
+        state['ai_strategy'] = app.config['AI_STRATEGY']  # 時間切れで軽い戦略に切り替わる
+    else:
+        # 2人用の場合は番号未設定
+        state['player1_number'] = None
+        state['player2_number'] = None
+        state['numbers_set'] = False
+        state['number_setting_player'] = 'プレイヤー1'
+    
+    state['player1_history'] = []
+    state['player2_history'] = []
+    state['player1_items'] = [{'name': 'DOUBLE', 'used': False}, {'name': 'HIGH&LOW', 'used': False},
+                              {'name': 'TARGET', 'used': False}, {'name': 'SLASH', 'used': False},
+                              {'name': 'SHUFFLE', 'used': False}, {'name': 'CHANGE', 'used': False}]
+    state['player2_items'] = [{'name': 'DOUBLE', 'used': False}, {'name': 'HIGH&LOW', 'used': False},
+                              {'name': 'TARGET', 'used': False}, {'name': 'SLASH', 'used': False},
+                              {'name': 'SHUFFLE', 'used': False}, {'name': 'CHANGE', 'used': False}]
+    state['player1_memo'] = [False] * 10
+    state['player2_memo'] = [False] * 10
+    return state
+
+def start_game(mode):
+    """新しいゲームを開始し、ゲームIDをセッションに保存する"""
+    old_id = session.get('game_id')
+    if old_id:
+        game_store.delete(old_id)
+        if ponderer is not None:
+            ponderer.cancel(old_id)
+    # プレイヤーID（対戦記録・オンライン対戦の席）はゲームをまたいで引き継ぐ
+    player_id = current_player_id()
+    session.clear()
+    session['player_id'] = player_id
+    session['game_id'] = game_store.new_id()
+    g.game = new_game_state(mode)
+    g.game_version = 0
+    return g.game
+
+def current_game():
+    """現在のゲーム状態を取得する（無いか期限切れならNone）"""
+    if 'game' not in g:
+        game_id = session.get('game_id')
+        g.game_version, g.game = game_store.get_versioned(game_id) if game_id else (0, None)
+    return g.game
+
+def save_game():
+    """現在のゲーム状態を保存する（終了したゲームは記録し、先読みを取り消す）
+
+    読み込んだ後に他のワーカーが保存していた場合は ConflictError（update_game() でやり直す）
+    """
+    if g.get('game') is not None and session.get('game_id'):
+        record = g.game['game_ended'] and not g.game.get('recorded')
+        if record:
+            g.game['recorded'] = True
+        g.game_version = game_store.put(session['game_id'], g.game, g.get('game_version'))
+        state_bytes.observe(len(json.dumps(g.game, ensure_ascii=False, separators=(',', ':')).encode()))
+        log_event('save', logging.DEBUG, game_id=session['game_id'], version=g.game_version)
+        if record:
+            game_recorder.record(game_record(session['game_id'], g.game, game_player_ids(g.game)))
+        if g.game['game_ended'] and ponderer is not None:
+            ponderer.cancel(session['game_id'])
+
+def update_game(action, any_turn=False):
+    """ゲーム状態に action(state) を適用して保存し、action の戻り値を返す（ゲームが無ければNone）
+
+    他のワーカー・リクエストが先に同じゲームを保存していた場合は、保存済みの状態を読み込み直して適用し直す
+    （全体のロックは取らない）
+    - 手番が進んでいた場合は古い画面からの操作なので、やり直さずに ConflictError（any_turn=True ならやり直す）
+    - after_save() で登録した処理（ログ・メトリクス・AIの計算の登録）は保存できた試行の分だけ行う
+    """
+    first_turn = None
+    for _ in range(app.config['GAME_SAVE_RETRIES']):
+        g.pop('game', None)  # 試行ごとに保存済みの状態から始める
+        state = current_game()
+        if state is None:
+            return None
+        if first_turn is None:
+            first_turn = turn_key(state)
+        elif not any_turn and turn_key(state) != first_turn:
+            break
+        g.after_save = []
+        try:
+            result = action(state)
+            save_game()
+        except ConflictError:
+            log_event('conflict', game_id=session.get('game_id'))
+            continue
+        finally:
+            pending = g.pop('after_save')
+        for fn in pending:
+            fn()
+        return result
+    raise ConflictError(session.get('game_id'))
+
+def turn_key(state):
+    """手番を表す値（他の保存でこれが変わっていたら、操作は古い画面に対するもの）"""
+    return state['turn'], state['current_player'], state['game_ended'], state.get('number_setting_player')
+
+def after_save(fn, *args, **kwargs):
+    """ゲーム状態の保存に成功した後に行う処理を登録する（update_game() の外ではすぐに行う）"""
+    pending = g.get('after_save')
+    if pending is None:
+        fn(*args, **kwargs)
+    else:
+        pending.append(functools.partial(fn, *args, **kwargs))
+
+@app.errorhandler(ConflictError)
+def handle_conflict(e):
+    """やり直しても保存できなかった操作（同じゲームへの同時操作が続いた）"""
+    log_event('conflict_failed', logging.WARNING, game_id=session.get('game_id'))
+    return jsonify({'ok': False, 'error': '同時に操作されました。もう一度お試しください'}), 409
+
+@app.after_request
+def set_game_route(response):
+    """振り分けのヒント（ゲームの担当ワーカー）をクッキーで返す"""
+    game_id = session.get('game_id')
+    if game_router is not None and game_id:
+        node = game_router.node_for(game_id)
+        if request.cookies.get('game_route') != node:
+            response.set_cookie('game_route', node, httponly=True, samesite='Lax')
+    return response
 
+def current_player_id():
+    """セッションのプレイヤーID（無ければ発行する）"""
+    if 'player_id' not in session:
+        session['player_id'] = uuid.uuid4().hex
+    return session['player_id']
+
+def game_player_ids(state):
+    """記録するプレイヤーID（1人用のAIは "ai:戦略"、2人用のプレイヤー2は同じ端末なのでNone）"""
+    if state['game_mode'] == 'single':
+        return session.get('player_id'), f"ai:{app.config['AI_STRATEGY']}"
+    return session.get('player_id'), None
+
+# ----------------------------------------
+# ユーティリティ関数
+# ----------------------------------------
 def judge(answer, guess):
-    eat = sum(a == g for a, g in zip(answer, guess))
-    bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
-    return eat, bite
+    return numeron_scoring.calculate_eat_bite(answer, guess)
 
 def calculate_eat_bite(answer, guess):
     """EAT/BITE計算"""
-    eat = sum(a == g for a, g in zip(answer, guess))
-    bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
-    return eat, bite
+    return numeron_scoring.calculate_eat_bite(answer, guess)
 
 def is_valid_number(number_str):
     if len(number_str) != 3 or not number_str.isdigit():
@@ -144,7 +401,7 @@ def use_item(item_name, computer_number, target_digit=None):
 @app.route('/')
 def index():
     """ゲームモード選択画面"""
-    return render_template('index.html')
+    return render_template('index.html', rooms_enabled=app.config['ROOMS_ENABLED'])
 
 @app.route('/game')
 def game():
@@ -152,45 +409,17 @@ def game():
     mode = request.args.get('mode', 'single')
     new_game = request.args.get('new', 'false') == 'true'
     
-    if 'game_mode' not in session or session['game_mode'] != mode or new_game:
+    state = current_game()
+    if state is None or state['game_mode'] != mode or new_game:
         # 新しいゲームを開始
-        session.clear()
-        session['game_mode'] = mode
-        session['game'] = None
-        session['turn'] = 1
-        session['current_player'] = 'プレイヤー1'
-        session['game_ended'] = False
-        session['winner'] = None
-        session['message'] = ''
-        session['message_type'] = 'info'
-        session['item_used_this_turn'] = False
-        
-        # ゲームデータをセッションに保存（オブジェクトではなくデータのみ）
-        if mode == 'single':
-            session['player1_number'] = [1, 5, 8]  # プレイヤー番号
-            session['player2_number'] = [6, 3, 4]  # AI番号
-            session['numbers_set'] = True
-        else:
-            # 2人用の場合は番号未設定
-            session['player1_number'] = None
-            session['player2_number'] = None
-            session['numbers_set'] = False
-            session['number_setting_player'] = 'プレイヤー1'
-        
-        session['player1_history'] = []
-        session['player2_history'] = []
-        session['player1_items'] = [{'name': 'DOUBLE', 'used': False}, {'name': 'HIGH&LOW', 'used': False}, 
-                                   {'name': 'TARGET', 'used': False}, {'name': 'SLASH', 'used': False},
-                                   {'name': 'SHUFFLE', 'used': False}, {'name': 'CHANGE', 'used': False}]
-        session['player2_items'] = [{'name': 'DOUBLE', 'used': False}, {'name': 'HIGH&LOW', 'used': False}, 
-                                   {'name': 'TARGET', 'used': False}, {'name': 'SLASH', 'used': False},
-                                   {'name': 'SHUFFLE', 'used': False}, {'name': 'CHANGE', 'used': False}]
-        session['player1_memo'] = [False] * 10
-        session['player2_memo'] = [False] * 10
-        session.modified = True
+        state = start_game(mode)
+        save_game()
+    elif state.get('ai_ticket'):
+        # AIの推測を計算中に画面を開き直した場合（スクリプトの無いブラウザの自動更新）
+        wait_ai_turn(state)
     
     # 2人用で番号が未設定の場合は番号設定画面を表示
-    if mode == 'two' and not session.get('numbers_set', False):
+    if mode == 'two' and not state.get('numbers_set', False):
         return render_number_setting_page()
     
     return render_game_page()
@@ -200,59 +429,418 @@ def game_post():
     """ゲーム操作の処理"""
     action = request.form.get('action')
     
-    if action == 'set_number':
-        handle_number_setting()
-    elif action == 'guess':
-        handle_guess()
-    elif action == 'item':
-        handle_item_use()
-    elif action == 'giveup':
-        handle_giveup()
+    def dispatch(state):
+        if action == 'set_number':
+            handle_number_setting()
+        elif action == 'guess':
+            handle_guess()
+        elif action == 'item':
+            handle_item_use()
+        elif action == 'giveup':
+            handle_giveup()
+        return state
+    
+    state = update_game(dispatch)
+    if state is None:
+        # ゲームが無いか期限切れの場合はモード選択画面へ
+        return redirect(url_for('index'))
+    if state.get('ai_ticket'):
+        wait_ai_turn(state)
     
     # 2人用で番号が未設定の場合は番号設定画面を表示
-    if session['game_mode'] == 'two' and not session.get('numbers_set', False):
+    if state['game_mode'] == 'two' and not state.get('numbers_set', False):
         return render_number_setting_page()
     
     return render_game_page()
 
+# ----------------------------------------
+# JSON API（操作による変化だけを返し、画面はスクリプトで部分更新する）
+# ----------------------------------------
+def api_game(game_id):
+    """セッションのゲームIDと一致する場合のみゲーム状態を返す"""
+    if session.get('game_id') != game_id:
+        return None
+    return current_game()
+
+def api_response(delta):
+    """差分をJSONで返す（エラーは400）"""
+    return jsonify(delta), 200 if delta['ok'] else 400
+
+def api_update(game_id, action):
+    """セッションのゲームに action(state) を適用して保存し、差分を返す"""
+    if session.get('game_id') != game_id:
+        return api_not_found()
+    delta = update_game(action)
+    if delta is None:
+        return api_not_found()
+    return api_response(delta)
+
+def api_not_found():
+    return jsonify({'ok': False, 'error': 'ゲームが見つかりません'}), 404
+
+@app.route('/api/games/<game_id>/state')
+def api_state(game_id):
+    """ゲーム状態の取得（番号は含めない）"""
+    state = api_game(game_id)
+    if state is None:
+        return api_not_found()
+    view = action_delta(state, player_key(state))
+    del view['history'], view['items'], view['player']
+    if state.get('ai_ticket'):
+        view['ai_ticket'] = state['ai_ticket']
+    view.update(mode=state['game_mode'],
+                player1_history=state['player1_history'], player2_history=state['player2_history'],
+                player1_items=state['player1_items'], player2_items=state['player2_items'])
+    return jsonify(view)
+
+@app.route('/api/games/<game_id>/guess', methods=['POST'])
+@handler_seconds.time(handler='api_guess')
+def api_guess(game_id):
+    """推測（{"guess": "123"}）"""
+    data = request.get_json(silent=True) or {}
+    guess = data.get('guess', '')
+    if isinstance(guess, list):
+        guess = ''.join(map(str, guess))
+
+    def guess_and_submit(state):
+        delta = apply_guess(state, str(guess))
+        if delta['ok'] and ai_to_move(state):
+            # AIの推測はワーカープールで計算し、クライアントは /ai でチケットの結果を待つ
+            delta['ai_ticket'] = submit_ai_turn(state)
+        return delta
+
+    if session.get('game_id') != game_id:
+        return api_not_found()
+    delta = update_game(guess_and_submit)
+    if delta is None:
+        return api_not_found()
+    if delta.get('ai_ticket'):
+        # 先読み済み・プールが満杯でその場で計算した推測は、この応答に含めて返す
+        done, ai_delta = finish_ai_turn(current_game(), delta['ai_ticket'])
+        if done and ai_delta is not None:
+            delta['ai'] = ai_delta
+    return api_response(delta)
+
+@app.route('/api/games/<game_id>/ai')
+@handler_seconds.time(handler='api_ai')
+def api_ai(game_id):
+    """AIの推測の結果を待つ（?ticket=...&wait=秒、計算中なら pending を返す）"""
+    state = api_game(game_id)
+    if state is None:
+        return api_not_found()
+    ticket = request.args.get('ticket')
+    if not ticket or state.get('ai_ticket') != ticket:
+        # 既に適用済み（または不明なチケット）の場合は現在の状態を返す
+        return jsonify(action_delta(state, 'player2'))
+    timeout = min(request.args.get('wait', 0, type=float), app.config['AI_POLL_TIMEOUT'])
+    done, delta = finish_ai_turn(state, ticket, timeout)
+    if not done:
+        return jsonify({'ok': True, 'pending': True, 'ai_ticket': ticket})
+    if delta is None:
+        return api_not_found()
+    return jsonify(delta)
+
+@app.route('/api/players/me/games')
+def api_my_games():
+    """自分の対戦履歴（新しい順、?limit=件数）"""
+    player_id = session.get('player_id')
+    if not player_id:
+        return jsonify([])
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify(game_recorder.player_games(player_id, limit))
+
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    """勝利数のランキング（?limit=件数）"""
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    return jsonify(game_recorder.leaderboard(limit))
+
+@app.route('/api/ai/stats')
+def api_ai_stats():
+    """AIワーカープールと先読みのカウンタ"""
+    return jsonify(dict(ai_pool.stats(), ponder=ponderer.stats() if ponderer is not None else None))
+
+@app.route('/api/games/<game_id>/item', methods=['POST'])
+@handler_seconds.time(handler='api_item')
+def api_item(game_id):
+    """アイテム使用（{"item_name": "TARGET", "target_digit": 5}）"""
+    data = request.get_json(silent=True) or {}
+    target_digit = data.get('target_digit')
+    if target_digit is not None and (not isinstance(target_digit, int) or not 0 <= target_digit <= 9):
+        return api_response({'ok': False, 'error': 'TARGETの数字は0〜9で指定してください'})
+    return api_update(game_id, lambda state: apply_item(state, data.get('item_name'), target_digit))
+
+@app.route('/api/games/<game_id>/giveup', methods=['POST'])
+@handler_seconds.time(handler='api_giveup')
+def api_giveup(game_id):
+    """GIVE UP"""
+    return api_update(game_id, apply_giveup)
+
+# ----------------------------------------
+# オンライン対戦（各プレイヤーが自分の端末から参加し、相手の操作はSSEで受け取る）
+# ----------------------------------------
+@app.before_request
+def check_rooms_enabled():
+    """オンライン対戦が無効の場合（複数ワーカー）は、ルームの画面はメニューに戻し、APIは503を返す"""
+    if app.config['ROOMS_ENABLED'] or not (request.endpoint or '').startswith(('room_', 'api_room')):
+        return None
+    if request.path.startswith('/api/'):
+        return jsonify({'ok': False, 'error': 'オンライン対戦は現在利用できません'}), 503
+    return redirect(url_for('index'))
+
+@app.before_request
+def start_room_sweeper():
+    """操作の無いルームを一定間隔で削除するスレッドを開始する（fork後の最初のリクエストで開始する）"""
+    if app.config['ROOMS_ENABLED']:
+        rooms.start_sweeper(app.config['ROOM_SWEEP_INTERVAL'])
+
+@app.route('/room/new')
+def room_new():
+    """ルームを作成して、ルームの画面へ"""
+    room = rooms.create(current_player_id(), new_game_state('two'))
+    return redirect(url_for('room_page', room_id=room.id))
+
+@app.route('/room/quick')
+def room_quick():
+    """クイックマッチ（相手待ちのプレイヤーと組み、いなければ公開ルームで相手を待つ）"""
+    room, _ = rooms.quick_match(current_player_id(), lambda: new_game_state('two'))
+    return redirect(url_for('room_page', room_id=room.id))
+
+@app.route('/api/rooms')
+def api_rooms():
+    """相手待ちの公開ルーム（待ちの長い順）とルーム数"""
+    rooms.evict_idle()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return jsonify({'waiting': rooms.list_waiting(limit), 'stats': rooms.stats()})
+
+@app.route('/api/rooms/quick', methods=['POST'])
+def api_room_quick():
+    """クイックマッチ（ルームIDと自分の席を返す）"""
+    room, seat = rooms.quick_match(current_player_id(), lambda: new_game_state('two'))
+    return jsonify({'ok': True, 'room_id': room.id, 'seat': seat,
+                    'url': url_for('room_page', room_id=room.id)})
+
+@app.route('/room/<room_id>')
+def room_page(room_id):
+    """ルームの画面（空いていれば参加する）"""
+    try:
+        room, seat = rooms.join(room_id, current_player_id())
+    except RoomError:
+        return redirect(url_for('index'))
+    state = room.state
+    if not state['numbers_set']:
+        own_number_set = state[f'player{seat}_number'] is not None
+        return render_template('number_setting.html',
+                               setting_player=f'プレイヤー{seat}',
+                               room_id=room.id,
+                               room_url=url_for('room_page', room_id=room.id, _external=True),
+                               public=room.public,
+                               waiting=own_number_set,
+                               opponent_joined=room.players[1] is not None,
+                               message=state['message'] if own_number_set else '',
+                               message_type=state['message_type'])
+    return render_game_page(state, api_base=f'/api/rooms/{room.id}', seat=seat)
+
+def room_for_request(room_id):
+    """リクエストしたプレイヤーのルームと席（参加していなければ RoomError）"""
+    room = rooms.get(room_id)
+    if room is None:
+        raise RoomError('ルームが見つかりません')
+    seat = room.seat_of(session.get('player_id'))
+    if seat is None:
+        raise RoomError('ルームに参加していません')
+    return room, seat
+
+def room_error(e):
+    return jsonify({'ok': False, 'error': str(e)}), 404
+
+@app.route('/api/rooms/<room_id>/number', methods=['POST'])
+def api_room_number(room_id):
+    """自分の番号の設定（{"number": "123"}）。両者が設定したらゲーム開始を配信する"""
+    try:
+        room, seat = room_for_request(room_id)
+    except RoomError as e:
+        return room_error(e)
+    data = request.get_json(silent=True) or {}
+    try:
+        number = parse_number(str(data.get('number', '')))
+    except ValueError as e:
+        return api_response({'ok': False, 'error': str(e)})
+    with room.lock:
+        state = room.state
+        if state['numbers_set']:
+            return api_response({'ok': False, 'error': '番号は既に設定されています'})
+        state[f'player{seat}_number'] = number
+        state['numbers_set'] = state['player1_number'] is not None and state['player2_number'] is not None
+        if state['numbers_set']:
+            state['message'] = 'ゲームを開始します！'
+            state['message_type'] = 'success'
+            room.publish('ready', {})
+        else:
+            state['message'] = '番号を設定しました。相手の番号設定を待っています'
+            state['message_type'] = 'info'
+        return jsonify({'ok': True, 'ready': state['numbers_set']})
+
+def room_action(room_id, action):
+    """手番の操作を適用し、差分を両者に配信する"""
+    try:
+        room, seat = room_for_request(room_id)
+    except RoomError as e:
+        return room_error(e)
+    g.room_id = room.id  # ログのゲームID
+    with room.lock:
+        state = room.state
+        if state['numbers_set'] and not state['game_ended'] and state['current_player'] != f'プレイヤー{seat}':
+            return api_response({'ok': False, 'error': 'あなたの手番ではありません'})
+        delta = action(state)
+        if delta['ok']:
+            room.publish('move', delta)
+            if state['game_ended']:
+                game_recorder.record(game_record(room.id, state, tuple(room.players)))
+        return api_response(delta)
+
+@app.route('/api/rooms/<room_id>/guess', methods=['POST'])
+def api_room_guess(room_id):
+    """推測（{"guess": "123"}）"""
+    guess = (request.get_json(silent=True) or {}).get('guess', '')
+    if isinstance(guess, list):
+        guess = ''.join(map(str, guess))
+    return room_action(room_id, lambda state: apply_guess(state, str(guess)))
+
+@app.route('/api/rooms/<room_id>/item', methods=['POST'])
+def api_room_item(room_id):
+    """アイテム使用（{"item_name": "TARGET", "target_digit": 5}）"""
+    data = request.get_json(silent=True) or {}
+    target_digit = data.get('target_digit')
+    if target_digit is not None and (not isinstance(target_digit, int) or not 0 <= target_digit <= 9):
+        return api_response({'ok': False, 'error': 'TARGETの数字は0〜9で指定してください'})
+    return room_action(room_id, lambda state: apply_item(state, data.get('item_name'), target_digit))
+
+@app.route('/api/rooms/<room_id>/giveup', methods=['POST'])
+def api_room_giveup(room_id):
+    """GIVE UP"""
+    return room_action(room_id, apply_giveup)
+
+@app.route('/api/rooms/<room_id>/state')
+def api_room_state(room_id):
+    """ルームのゲーム状態（番号は自分の分のみ）"""
+    try:
+        room, seat = room_for_request(room_id)
+    except RoomError as e:
+        return room_error(e)
+    with room.lock:
+        state = room.state
+        view = action_delta(state, player_key(state))
+        del view['history'], view['items'], view['player']
+        view.update(mode='online', room_id=room.id, seat=seat, numbers_set=state['numbers_set'],
+                    opponent_joined=room.players[1] is not None, number=state[f'player{seat}_number'],
+                    player1_history=state['player1_history'], player2_history=state['player2_history'],
+                    player1_items=state['player1_items'], player2_items=state['player2_items'])
+        return jsonify(view)
+
+@app.route('/api/rooms/<room_id>/events')
+def api_room_events(room_id):
+    """ルームのイベント（Server-Sent Events）: joined / ready / move / closed"""
+    try:
+        room, _ = room_for_request(room_id)
+        subscriber = room.subscribe()
+    except RoomError as e:
+        return room_error(e)
+    return Response(event_stream(room, subscriber, app.config['SSE_HEARTBEAT']),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@handler_seconds.time(handler='handle_guess')
 def handle_guess():
-    """推測の処理"""
-    digit1 = request.form.get('digit1')
-    digit2 = request.form.get('digit2')
-    digit3 = request.form.get('digit3')
-    player = request.form.get('player')
-    
-    if not all([digit1, digit2, digit3]):
-        session['message'] = '3桁の数字を入力してください'
-        session['message_type'] = 'error'
-        return
-    
-    guess = [int(digit1), int(digit2), int(digit3)]
-    
-    if len(set(guess)) != 3:
-        session['message'] = '数字の重複は禁止です'
-        session['message_type'] = 'error'
-        return
+    """推測の処理（フォーム）"""
+    state = current_game()
+    digits = [request.form.get('digit1'), request.form.get('digit2'), request.form.get('digit3')]
+    apply_guess(state, ''.join(d or '' for d in digits), request.form.get('player'))
+    if ai_to_move(state):
+        # JSON API と同じくワーカープールで計算する（結果は game_post() で待つ）
+        submit_ai_turn(state)
+
+@handler_seconds.time(handler='handle_item_use')
+def handle_item_use():
+    """アイテム使用の処理（フォーム）"""
+    apply_item(current_game(), request.form.get('item_name'))
+
+def player_key(state, player=None):
+    """操作するプレイヤーのキー（'player1' / 'player2'）"""
+    # フォームから送信されたプレイヤー情報を優先する
+    if player == 'player1' or state['current_player'] == 'プレイヤー1':
+        return 'player1'
+    return 'player2'
+
+def action_error(state, message):
+    """操作エラーをメッセージに設定し、エラーの差分を返す"""
+    state['message'] = message
+    state['message_type'] = 'error'
+    return {'ok': False, 'error': message}
+
+def check_can_act(state):
+    """操作できる状態かチェックし、できなければエラーメッセージを返す"""
+    if state['game_ended']:
+        return 'ゲームは既に終了しています'
+    if not state.get('numbers_set', False):
+        return '番号が設定されていません'
+    if state['current_player'] == 'AI':
+        return 'AIの手番です'
+    return None
+
+def action_delta(state, key):
+    """操作による変化（追加された履歴・アイテム状態・ターンの持ち主）"""
+    history = state[f'{key}_history']
+    row = dict(history[-1], index=len(history)) if history else None
+    return {
+        'ok': True,
+        'player': key,
+        'history': row,
+        'items': state[f'{key}_items'],
+        'turn': state['turn'],
+        'current_player': state['current_player'],
+        'item_used_this_turn': state['item_used_this_turn'],
+        'memo': state['player1_memo'] if state['current_player'] == 'プレイヤー1' else state['player2_memo'],
+        'game_ended': state['game_ended'],
+        'winner': state['winner'],
+        'message': state['message'],
+        'message_type': state['message_type'],
+    }
+
+def log_action(action, delta, **fields):
+    """成功した操作を（ゲーム状態の保存後に）構造化ログに記録し、差分をそのまま返す"""
+    if delta['ok']:
+        row = delta.get('history') or {}
+        after_save(log_event, action, game_id=g.get('room_id') or session.get('game_id'), player=delta['player'],
+                  guess=''.join(map(str, row['guess'])) if row.get('guess') else None,
+                  eat=row.get('eat') if row.get('guess') else None,
+                  bite=row.get('bite') if row.get('guess') else None,
+                  turn=delta['turn'], winner=delta['winner'], **fields)
+    return delta
+
+def apply_guess(state, text, player=None):
+    """推測を適用し、変化した部分を返す"""
+    error = check_can_act(state)
+    if error:
+        return action_error(state, error)
+    try:
+        guess = parse_number(text or '')
+    except ValueError as e:
+        return action_error(state, str(e))
     
-    # フォームから送信されたプレイヤー情報を使用
-    if player == 'player1' or session['current_player'] == 'プレイヤー1':
-        current_number = session['player1_number']
-        opponent_number = session['player2_number']
-        current_history = session['player1_history']
-        current_memo = session['player1_memo']
-        next_player = 'プレイヤー2' if session['game_mode'] == 'two' else 'AI'
+    key = player_key(state, player)
+    if key == 'player1':
+        opponent_number = state['player2_number']
+        next_player = 'プレイヤー2' if state['game_mode'] == 'two' else 'AI'
     else:
-        current_number = session['player2_number']
-        opponent_number = session['player1_number']
-        current_history = session['player2_history']
-        current_memo = session['player2_memo']
+        opponent_number = state['player1_number']
         next_player = 'プレイヤー1'
     
     # EAT/BITE計算
     eat, bite = calculate_eat_bite(opponent_number, guess)
     
     # 履歴に追加
-    current_history.append({
+    state[f'{key}_history'].append({
         'guess': guess,
         'eat': eat,
         'bite': bite,
@@ -261,137 +849,234 @@ def handle_guess():
     
     # メモカード更新
     for digit in guess:
-        current_memo[digit] = True
+        state[f'{key}_memo'][digit] = True
     
-    session['message'] = f"推測: {''.join(map(str, guess))} → {eat}EAT {bite}BITE"
-    session['message_type'] = 'success' if eat == 3 else 'info'
+    state['message'] = f"推測: {''.join(map(str, guess))} → {eat}EAT {bite}BITE"
+    state['message_type'] = 'success' if eat == 3 else 'info'
     
     # 勝利判定
     if eat == 3:
-        session['game_ended'] = True
-        session['winner'] = session['current_player']
-        session['message'] = f"🎉 {session['current_player']}の勝利！"
-        session['message_type'] = 'success'
+        state['game_ended'] = True
+        state['winner'] = state['current_player']
+        state['message'] = f"🎉 {state['current_player']}の勝利！"
+        state['message_type'] = 'success'
     else:
         # ターン終了処理
-        session['turn'] += 1
-        session['current_player'] = next_player
-        session['item_used_this_turn'] = False
-    
-    session.modified = True
+        state['turn'] += 1
+        state['current_player'] = next_player
+        state['item_used_this_turn'] = False
+    return log_action('guess', action_delta(state, key))
 
-def handle_item_use():
-    """アイテム使用の処理"""
-    item_name = request.form.get('item_name')
-    
-    if session['item_used_this_turn']:
-        session['message'] = 'このターンでは既にアイテムを使用しました'
-        session['message_type'] = 'error'
-        return
+def apply_item(state, item_name, target_digit=None):
+    """アイテム使用を適用し、変化した部分を返す"""
+    error = check_can_act(state)
+    if error:
+        return action_error(state, error)
+    if state['item_used_this_turn']:
+        return action_error(state, 'このターンでは既にアイテムを使用しました')
     
     # 現在のプレイヤーのアイテムを取得
-    if session['current_player'] == 'プレイヤー1':
-        current_items = session['player1_items']
-        current_history = session['player1_history']
-        opponent_number = session['player2_number']
-    else:
-        current_items = session['player2_items']
-        current_history = session['player2_history']
-        opponent_number = session['player1_number']
+    key = player_key(state)
+    opponent_number = state['player2_number'] if key == 'player1' else state['player1_number']
     
     # アイテムを検索
     item = None
-    for i in current_items:
+    for i in state[f'{key}_items']:
         if i['name'] == item_name and not i['used']:
             item = i
             break
     
     if not item:
-        session['message'] = 'アイテムが見つからないか、既に使用済みです'
-        session['message_type'] = 'error'
-        return
+        return action_error(state, 'アイテムが見つからないか、既に使用済みです')
     
     # アイテム使用
     item['used'] = True
-    session['item_used_this_turn'] = True
+    state['item_used_this_turn'] = True
     
     # アイテム効果を処理
-    effect = process_item_effect(item_name, opponent_number)
+    effect = process_item_effect(item_name, opponent_number, target_digit)
     
     # 履歴に追加
-    current_history.append({
+    state[f'{key}_history'].append({
         'guess': None,
         'eat': 0,
         'bite': 0,
         'effect': f"{item_name}アイテム: {effect}"
     })
     
-    session['message'] = f"{item_name}アイテムを使用しました: {effect}"
-    session['message_type'] = 'info'
-    
-    session.modified = True
+    state['message'] = f"{item_name}アイテムを使用しました: {effect}"
+    state['message_type'] = 'info'
+    return log_action('item', action_delta(state, key), item=item_name)
 
 def handle_number_setting():
     """番号設定の処理"""
+    state = current_game()
     digit1 = request.form.get('digit1')
     digit2 = request.form.get('digit2')
     digit3 = request.form.get('digit3')
     
     if not all([digit1, digit2, digit3]):
-        session['message'] = '3桁の数字を入力してください'
-        session['message_type'] = 'error'
+        state['message'] = '3桁の数字を入力してください'
+        state['message_type'] = 'error'
         return
     
     number = [int(digit1), int(digit2), int(digit3)]
     
     if len(set(number)) != 3:
-        session['message'] = '数字の重複は禁止です'
-        session['message_type'] = 'error'
+        state['message'] = '数字の重複は禁止です'
+        state['message_type'] = 'error'
         return
     
     # 現在の設定プレイヤーに番号を設定
-    if session['number_setting_player'] == 'プレイヤー1':
-        session['player1_number'] = number
-        session['number_setting_player'] = 'プレイヤー2'
-        session['message'] = f"プレイヤー1の番号を設定しました。次はプレイヤー2の番号を設定してください。"
-        session['message_type'] = 'info'
+    if state['number_setting_player'] == 'プレイヤー1':
+        state['player1_number'] = number
+        state['number_setting_player'] = 'プレイヤー2'
+        state['message'] = f"プレイヤー1の番号を設定しました。次はプレイヤー2の番号を設定してください。"
+        state['message_type'] = 'info'
     else:
-        session['player2_number'] = number
-        session['numbers_set'] = True
-        session['message'] = f"プレイヤー2の番号を設定しました。ゲームを開始します！"
-        session['message_type'] = 'success'
-    
-    session.modified = True
+        state['player2_number'] = number
+        state['numbers_set'] = True
+        state['message'] = f"プレイヤー2の番号を設定しました。ゲームを開始します！"
+        state['message_type'] = 'success'
 
+@handler_seconds.time(handler='handle_giveup')
 def handle_giveup():
-    """GIVE UPの処理"""
+    """GIVE UPの処理（フォーム）"""
+    apply_giveup(current_game())
+
+def apply_giveup(state):
+    """GIVE UPを適用し、変化した部分を返す"""
+    error = check_can_act(state)
+    if error:
+        return action_error(state, error)
     # 現在のプレイヤーと対戦相手を決定
-    if session['current_player'] == 'プレイヤー1':
-        current_history = session['player1_history']
-        opponent_number = session['player2_number']
-        winner = 'プレイヤー2' if session['game_mode'] == 'two' else 'AI'
+    key = player_key(state)
+    if key == 'player1':
+        opponent_number = state['player2_number']
+        winner = 'プレイヤー2' if state['game_mode'] == 'two' else 'AI'
     else:
-        current_history = session['player2_history']
-        opponent_number = session['player1_number']
+        opponent_number = state['player1_number']
         winner = 'プレイヤー1'
     
-    session['game_ended'] = True
-    session['winner'] = winner
-    session['message'] = f"GIVE UP! {session['current_player']}の敗北。{winner}の勝利！"
-    session['message_type'] = 'error'
+    state['game_ended'] = True
+    state['winner'] = winner
+    state['message'] = f"GIVE UP! {state['current_player']}の敗北。{winner}の勝利！"
+    state['message_type'] = 'error'
     
     # 履歴に追加
-    current_history.append({
+    state[f'{key}_history'].append({
         'guess': None,
         'eat': 0,
         'bite': 0,
         'effect': f"GIVE UP! 答えは {''.join(map(str, opponent_number))} でした"
     })
+    return log_action('giveup', action_delta(state, key))
+
+def ai_to_move(state):
+    """1人用でAIの手番か"""
+    return state['game_mode'] == 'single' and state['current_player'] == 'AI' and not state['game_ended']
+
+def ai_snapshot(state, strategy=None):
+    """AIの計算に必要な部分（番号・コール履歴・戦略）だけを取り出す（ワーカープールに渡す）"""
+    return {
+        'number': state['player2_number'],
+        'calls': [(call['guess'], call['eat'], call['bite'])
+                  for call in state['player2_history'] if call['guess']],
+        'strategy': strategy or state.get('ai_strategy', app.config['AI_STRATEGY']),
+        'time_budget': app.config['AI_TIME_BUDGET'],
+        'fallback_strategy': app.config['AI_FALLBACK_STRATEGY'],
+    }
+
+def submit_ai_turn(state):
+    """AIのターンのチケットを発行して返す（計算はゲーム状態の保存後に start_ai_turn() で登録する）"""
+    ticket = uuid.uuid4().hex
+    state['ai_ticket'] = ticket
+    state['ai_started_at'] = time.time()  # プレイヤーが待った時間を思考時間として記録する
+    after_save(start_ai_turn, session['game_id'], ticket, ai_snapshot(state))
+    return ticket
+
+def start_ai_turn(game_id, ticket, snapshot):
+    """AIの推測の計算をチケットでワーカープールに登録する
+
+    先読み済みの場合とプールが満杯の場合（軽い戦略で計算する）は、このスレッドで結果を用意する
+    """
+    if ponderer is not None:
+        # 先読み済みなら計算せずに使い、計算中ならその計算の結果を待つ
+        pondered, move = ponderer.take(game_id, snapshot)
+        if move is not None:
+            ai_pool.complete(ticket, move)
+            return
+        if pondered is not None and ai_pool.rename(pondered, ticket):
+            return
+    try:
+        ai_pool.submit(compute_ai_move, snapshot, ticket=ticket)
+    except PoolFullError:
+        log_event('ai_pool_full', logging.WARNING, game_id=game_id, strategy=app.config['AI_FALLBACK_STRATEGY'])
+        ai_pool.complete(ticket, compute_ai_move(dict(snapshot, strategy=app.config['AI_FALLBACK_STRATEGY'])))
+
+def finish_ai_turn(state, ticket, wait=0.0):
+    """チケットのAIの推測を最大 wait 秒待ってゲームに適用し、(完了したか, 変化した部分) を返す"""
+    try:
+        done, move = ai_pool.result(ticket, timeout=max(wait, 0))
+    except KeyError:
+        # 別プロセスで登録された・期限切れのチケットはこのスレッドで計算し直す
+        done, move = True, compute_ai_move(ai_snapshot(state))
+    if not done:
+        return False, None
+    # 待っている間に他のリクエスト（他のワーカー）が適用した場合は保存済みの状態を使う
+    return True, update_game(lambda state: apply_ai_move(state, move) if state.get('ai_ticket') == ticket
+                             else action_delta(state, 'player2'), any_turn=True)
+
+def wait_ai_turn(state):
+    """フォームの画面: AIの推測をAIの1手の計算時間の上限だけ待って適用する
+
+    間に合わなければ計算中のまま画面を返す（スクリプトは /ai で待ち、無ければ画面の自動更新で開き直す）
+    """
+    finish_ai_turn(state, state['ai_ticket'], app.config['AI_TIME_BUDGET'])
+
+def apply_ai_move(state, move):
+    """計算済みのAIの推測をゲームに適用し、変化した部分を返す
+
+    思考時間（think_time）はプレイヤーがコールしてから推測を受け取るまでの時間（先読み済みならほぼ0）で、
+    計算にかかった時間は compute_time として別に記録する
+    """
+    guess = move['guess']
+    state.pop('ai_ticket', None)
+    started_at = state.pop('ai_started_at', None)
+    think_time = max(time.time() - started_at, 0.0) if started_at is not None else move['think_time']
+    state['ai_strategy'] = move['strategy']
+    after_save(ai_think_seconds.observe, think_time, strategy=move['selector'])
+    
+    eat, bite = calculate_eat_bite(state['player1_number'], guess)
+    state['player2_history'].append({
+        'guess': guess,
+        'eat': eat,
+        'bite': bite,
+        'effect': '',
+        'think_time': think_time,
+        'compute_time': move['think_time']
+    })
+    ai_message = f"AIの推測: {''.join(map(str, guess))} → {eat}EAT {bite}BITE"
     
-    session.modified = True
+    if eat == 3:
+        state['game_ended'] = True
+        state['winner'] = 'AI'
+        state['message'] = f"{ai_message} / 😢 AIの勝利！"
+        state['message_type'] = 'error'
+    else:
+        state['message'] = f"{state['message']} / {ai_message}"
+        state['turn'] += 1
+        state['current_player'] = 'プレイヤー1'
+        state['item_used_this_turn'] = False
+        if ponderer is not None:
+            # 人間が考えている間に次の推測を先読みする（判定はその場で決まるので局面は1つ）
+            after_save(ponderer.ponder, session['game_id'], [ai_snapshot(state)])
+    return log_action('ai_move', action_delta(state, 'player2'), think_time_ms=round(think_time * 1000, 2),
+                      compute_time_ms=round(move['think_time'] * 1000, 2), strategy=move['selector'],
+                      timed_out=move['timed_out'], pondered=move.get('pondered', False))
 
-def process_item_effect(item_name, opponent_number):
-    """アイテム効果を処理"""
+def process_item_effect(item_name, opponent_number, target_digit=None):
+    """アイテム効果を処理（TARGETの数字を省略するとランダムに選ぶ）"""
     if item_name == "DOUBLE":
         return "2回連続コール可能。ただし1桁開示。"
     elif item_name == "HIGH&LOW":
@@ -403,7 +1088,8 @@ def process_item_effect(item_name, opponent_number):
                 high_low_info.append("L")
         return "各桁のHIGH/LOW情報: " + "".join(high_low_info)
     elif item_name == "TARGET":
-        target_digit = random.randint(0, 9)
+        if target_digit is None:
+            target_digit = random.randint(0, 9)
         if target_digit in opponent_number:
             pos = opponent_number.index(target_digit)
             return f"数字{target_digit}は{pos+1}桁目にあります"
@@ -423,18 +1109,23 @@ def process_item_effect(item_name, opponent_number):
 
 def render_number_setting_page():
     """番号設定画面のレンダリング"""
+    state = current_game()
     return render_template('number_setting.html',
-                           setting_player=session['number_setting_player'],
-                           message=session['message'],
-                           message_type=session['message_type'])
+                           setting_player=state['number_setting_player'],
+                           message=state['message'],
+                           message_type=state['message_type'])
 
-def render_game_page():
-    """ゲーム画面のレンダリング"""
-    mode = session['game_mode']
+@handler_seconds.time(handler='render_game_page')
+def render_game_page(state=None, api_base=None, seat=None):
+    """ゲーム画面のレンダリング（オンライン対戦ではルームの状態・APIと自分の席を渡す）"""
+    if state is None:
+        state = current_game()
+        api_base = f"/api/games/{session['game_id']}"
+    mode = state['game_mode'] if seat is None else 'online'
     
     # 両プレイヤーのアイテム情報を準備
-    player1_items = session['player1_items'].copy()
-    player2_items = session['player2_items'].copy()
+    player1_items = [dict(item) for item in state['player1_items']]
+    player2_items = [dict(item) for item in state['player2_items']]
     
     # アイテムタイプを追加
     for item in player1_items:
@@ -453,7 +1144,7 @@ def render_game_page():
     player1_history = []
     player2_history = []
     
-    for call in session['player1_history']:
+    for call in state['player1_history']:
         player1_history.append({
             'guess': call['guess'],
             'eat': call['eat'],
@@ -461,7 +1152,7 @@ def render_game_page():
             'effect': call.get('effect', '')
         })
     
-    for call in session['player2_history']:
+    for call in state['player2_history']:
         player2_history.append({
             'guess': call['guess'],
             'eat': call['eat'],
@@ -470,25 +1161,29 @@ def render_game_page():
         })
     
     # 現在のプレイヤーのメモカード
-    if session['current_player'] == 'プレイヤー1':
-        memo_cards = session['player1_memo']
+    if state['current_player'] == 'プレイヤー1':
+        memo_cards = state['player1_memo']
     else:
-        memo_cards = session['player2_memo']
+        memo_cards = state['player2_memo']
     
     return render_template('game_with_items.html',
+                           game_id=session.get('game_id'),
+                           api_base=api_base,
+                           seat=seat,
+                           ai_ticket=state.get('ai_ticket'),
                            mode=mode,
-                           turn=session['turn'],
-                           current_player=session['current_player'],
+                           turn=state['turn'],
+                           current_player=state['current_player'],
                            player1_items=player1_items,
                            player2_items=player2_items,
                            player1_history=player1_history,
                            player2_history=player2_history,
                            memo_cards=memo_cards,
-                           message=session['message'],
-                           message_type=session['message_type'],
-                           game_ended=session['game_ended'],
-                           winner=session['winner'],
-                           item_used_this_turn=session['item_used_this_turn'])
+                           message=state['message'],
+                           message_type=state['message_type'],
+                           game_ended=state['game_ended'],
+                           winner=state['winner'],
+                           item_used_this_turn=state['item_used_this_turn'])
 
 
 # ----------------------------------------
@@ -14,13 +14,54 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(hours=2)
     SESSION_COOKIE_SECURE = False  # HTTPS環境ではTrueに変更
     
+    # ゲーム状態ストア設定（クッキーにはゲームIDのみ保存）
+    GAME_STORE_URL = os.environ.get('GAME_STORE_URL') or 'memory://'
+    GAME_STORE_MAX_GAMES = int(os.environ.get('GAME_STORE_MAX_GAMES') or 10000)
+    # 他のワーカーと同時に保存した（バージョンが変わっていた）場合に操作をやり直す回数
+    GAME_SAVE_RETRIES = int(os.environ.get('GAME_SAVE_RETRIES') or 3)
+    # 振り分けのヒント: ワーカー名（カンマ区切り）を指定すると、担当ワーカーを game_route クッキーで返す
+    GAME_ROUTE_NODES = [node for node in os.environ.get('GAME_ROUTE_NODES', '').split(',') if node]
+    
+    # AI設定（1人用）: 1手の計算時間の上限（秒）を超えたら、以降は軽い戦略に切り替える
+    AI_STRATEGY = os.environ.get('AI_STRATEGY') or 'entropy'
+    AI_FALLBACK_STRATEGY = os.environ.get('AI_FALLBACK_STRATEGY') or 'random'
+    AI_TIME_BUDGET = float(os.environ.get('AI_TIME_BUDGET') or 0.05)
+    
+    # AIのワーカープール設定（満杯の場合は軽い戦略でその場で計算する）
+    AI_POOL_WORKERS = int(os.environ.get('AI_POOL_WORKERS') or 2)
+    AI_POOL_QUEUE = int(os.environ.get('AI_POOL_QUEUE') or 16)
+    AI_POOL_PROCESSES = os.environ.get('AI_POOL_PROCESSES', 'False') == 'True'
+    AI_POLL_TIMEOUT = float(os.environ.get('AI_POLL_TIMEOUT') or 10)  # ロングポーリングの最大待ち時間（秒）
+    
+    # AIの先読み設定（人間が考えている間に空いているワーカーで次の推測を計算する）
+    AI_PONDER = os.environ.get('AI_PONDER', 'True') == 'True'
+    AI_PONDER_BUDGET = float(os.environ.get('AI_PONDER_BUDGET') or 1.0)  # 先読み1局面あたりの計算時間の上限（秒）
+    AI_PONDER_MAX_GAMES = int(os.environ.get('AI_PONDER_MAX_GAMES') or 1000)
+    
+    # オンライン対戦設定（Server-Sent Events のキープアライブ間隔、秒）
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT') or 15)
+    # ルーム数の上限と、操作の無いルームを削除するまでの時間（秒）
+    ROOMS_MAX = int(os.environ.get('ROOMS_MAX') or 10000)
+    ROOM_IDLE_TIMEOUT = float(os.environ.get('ROOM_IDLE_TIMEOUT') or 1800)
+    ROOM_SWEEP_INTERVAL = float(os.environ.get('ROOM_SWEEP_INTERVAL') or 60)  # 操作の無いルームを削除する間隔（秒）
+    # ルーム・イベントの購読者・クイックマッチの待ち行列はプロセス内に保持するので、
+    # 複数ワーカーでは無効にする（gunicorn.conf.py がワーカー数から設定する）
+    ROOMS_ENABLED = os.environ.get('ROOMS_ENABLED', 'True') == 'True'
+    
     # アプリケーション設定
     MAX_TURNS = 12
     NUMBER_LENGTH = 3
     
     # ログ設定
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
-    LOG_FILE = os.environ.get('LOG_FILE') or 'logs/numeron.log'
+    LOG_FILE = os.environ.get('LOG_FILE') or 'logs/numeron.log'  # 1行1イベントのJSON
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES') or 10 * 1024 * 1024)  # このサイズでファイルを切り替える
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT') or 5)
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE') or 1.0)  # DEBUGのログを残す割合
+    
+    # メトリクス設定（/metrics）: 複数ワーカーでは各ワーカーの値をこのディレクトリに書き出して合算する
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL') or 5)
 
 class DevelopmentConfig(Config):
     """開発環境設定"""
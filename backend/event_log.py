@@ -0,0 +1,158 @@
+"""
+ログの非同期出力
+Non-blocking structured logging
+
+- リクエストのスレッドはログを待ち行列に入れるだけ（QueueHandler）で、ファイル・標準エラーへの書き込みは
+  専用スレッド（QueueListener）が行う（応答時間がディスクの速さに左右されない）
+  - 待ち行列が満杯の場合はログを捨て、dropped として数える
+- ファイルには1行1イベントのJSONを書き込み、サイズで切り替える（RotatingFileHandler）
+- log_event(): ゲームの操作（ゲームID・操作・EAT/BITE・AIの思考時間など）を構造化ログとして記録する
+- 量の多いDEBUGのログは sample_rate の割合だけ残す（INFO以上は全て残す）
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_MAX_QUEUE = 10000
+TEXT_FORMAT = '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+logger = logging.getLogger('numeron.events')
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1イベントのJSON（log_event() の項目はそのまま並べる）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'event', None) or {})
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """従来のテキスト形式（log_event() の項目はJSONで後ろに付ける）"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        event = getattr(record, 'event', None)
+        if event:
+            text += ' ' + json.dumps(event, ensure_ascii=False, separators=(',', ':'), default=str)
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """DEBUGのログを sample_rate の割合だけ通す"""
+
+    def __init__(self, sample_rate: float = 1.0, rng: Optional[random.Random] = None):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rng = rng or random.Random()
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1:
+            return True
+        if self.rng.random() < self.sample_rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """待ち行列が満杯ならログを捨てるQueueHandler（リクエストのスレッドを待たせない）"""
+
+    def __init__(self, log_queue: 'queue.Queue'):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(level: int = logging.INFO, path: Optional[str] = None,
+                  max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT,
+                  sample_rate: float = 1.0, max_queue: int = DEFAULT_MAX_QUEUE,
+                  stream: bool = True) -> logging.handlers.QueueListener:
+    """ルートロガーを待ち行列経由の出力に切り替え、書き込みスレッドを開始する
+
+    path にはJSON（サイズで切り替え）、標準エラーには従来のテキスト形式で出力する
+    """
+    handlers = []
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                            encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if stream:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(TextFormatter())
+        handlers.append(stream_handler)
+
+    global _listener
+    shutdown()  # 以前の設定の書き込みスレッドは止める
+    queue_handler = DroppingQueueHandler(queue.Queue(max_queue))
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def shutdown():
+    """待ち行列に残ったログを書き込んで書き込みスレッドを止める"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    try:
+        listener.stop()
+    except queue.Full:
+        # 待ち行列が満杯のままなら残りは捨てる
+        pass
+    for handler in listener.handlers:
+        handler.close()
+
+
+def log_event(action: str, level: int = logging.INFO, **fields: Any):
+    """ゲームの操作を構造化ログとして記録する（値がNoneの項目は省く、テキスト形式の出力場所は呼び出し元）"""
+    if not logger.isEnabledFor(level):
+        return
+    event: Dict[str, Any] = {'action': action}
+    event.update((key, value) for key, value in fields.items() if value is not None)
+    logger.log(level, action, extra={'event': event}, stacklevel=2)
+
+
+def stats() -> Dict[str, int]:
+    """ログの待ち行列の長さと、捨てた・間引いたログの数"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            sampled_out = sum(f.sampled_out for f in handler.filters if isinstance(f, SamplingFilter))
+            return {'queued': handler.queue.qsize(), 'dropped': handler.dropped, 'sampled_out': sampled_out}
+    return {'queued': 0, 'dropped': 0, 'sampled_out': 0}
@@ -0,0 +1,230 @@
+"""
+ゲーム記録の保存
+Persistent game records
+
+- 終了したゲーム・コール・アイテム使用を SQLite（WALモード）に保存する（DATABASE_URL の "sqlite:///パス"）
+- record() は記録を待ち行列に入れるだけで、書き込みは専用スレッドがまとめて行う
+  （リクエストの応答時間にディスクへの同期書き込みが含まれない）
+  - 待ち行列が満杯の場合は記録を捨て、dropped として数える（書き込みエラーは failed）
+- 読み込みはプロセス内で使い回す接続プールで行う
+  - player_games(): プレイヤーの対戦履歴（新しい順）
+  - leaderboard(): 勝利数のランキング
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 0.5  # 秒（記録が少なくても、この間隔で書き込む）
+DEFAULT_MAX_QUEUE = 10000
+DEFAULT_POOL_SIZE = 4
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS games ("
+    "id TEXT PRIMARY KEY, mode TEXT NOT NULL, player1_id TEXT, player2_id TEXT, "
+    "winner INTEGER, winner_id TEXT, reason TEXT, turns INTEGER NOT NULL, "
+    "started_at REAL, ended_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS calls ("
+    "game_id TEXT NOT NULL, player INTEGER NOT NULL, seq INTEGER NOT NULL, guess TEXT NOT NULL, "
+    "eat INTEGER NOT NULL, bite INTEGER NOT NULL, think_time REAL, PRIMARY KEY (game_id, player, seq))",
+    "CREATE TABLE IF NOT EXISTS item_uses ("
+    "game_id TEXT NOT NULL, player INTEGER NOT NULL, seq INTEGER NOT NULL, item TEXT NOT NULL, "
+    "effect TEXT, PRIMARY KEY (game_id, player, seq))",
+    # プレイヤーごとの対戦履歴（新しい順）とランキング用
+    "CREATE INDEX IF NOT EXISTS games_player1 ON games (player1_id, ended_at)",
+    "CREATE INDEX IF NOT EXISTS games_player2 ON games (player2_id, ended_at)",
+    "CREATE INDEX IF NOT EXISTS games_winner ON games (winner_id)",
+]
+
+
+def database_path(url: str) -> str:
+    """DATABASE_URL（"sqlite:///パス"）からファイルのパスを取り出す"""
+    if not url.startswith("sqlite:///"):
+        raise ValueError(f"SQLite以外のデータベースには対応していません: {url}")
+    return os.path.abspath(url[len("sqlite:///"):])
+
+
+def game_record(game_id: str, state: Dict[str, Any], player_ids=(None, None),
+                ended_at: Optional[float] = None) -> Dict[str, Any]:
+    """Webのゲーム状態から保存する記録を作成する"""
+    calls, item_uses = [], []
+    for player in (1, 2):
+        for seq, row in enumerate(state[f'player{player}_history']):
+            if row['guess']:
+                calls.append((game_id, player, seq, ''.join(map(str, row['guess'])),
+                              row['eat'], row['bite'], row.get('think_time')))
+            elif 'アイテム:' in row['effect']:
+                item_uses.append((game_id, player, seq, row['effect'].split('アイテム:')[0], row['effect']))
+    winner = {'プレイヤー1': 1, 'プレイヤー2': 2, 'AI': 2}.get(state['winner'])
+    gave_up = any(row['effect'].startswith('GIVE UP') for player in (1, 2)
+                  for row in state[f'player{player}_history'])
+    return {
+        'game': (game_id, state['game_mode'], player_ids[0], player_ids[1], winner,
+                 player_ids[winner - 1] if winner else None, 'giveup' if gave_up else 'eat',
+                 state['turn'], state.get('started_at'), ended_at or time.time()),
+        'calls': calls,
+        'item_uses': item_uses,
+    }
+
+
+class GameRecorder:
+    """ゲーム記録の非同期書き込みと読み込み"""
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_queue: int = DEFAULT_MAX_QUEUE,
+                 pool_size: int = DEFAULT_POOL_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pool_size = pool_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
+        with self._writer_conn:
+            for statement in SCHEMA:
+                self._writer_conn.execute(statement)
+        self._pool: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._queue: 'queue.Queue[Optional[Dict[str, Any]]]' = queue.Queue(max_queue)
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="game-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        # WALでは synchronous=NORMAL でもコミット済みのデータは壊れない
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ----------------------------------------
+    # 書き込み（専用スレッド）
+    # ----------------------------------------
+    def record(self, record: Dict[str, Any]) -> bool:
+        """記録を待ち行列に入れる（満杯ならFalse）"""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._write(records)
+            except sqlite3.Error:
+                # 書き込めなかった記録は捨てて書き込みを続ける
+                self.failed += len(records)
+                logging.getLogger(__name__).exception("ゲーム記録の書き込みに失敗しました")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records: List[Dict[str, Any]]):
+        """記録をまとめて1つのトランザクションで書き込む"""
+        with self._writer_conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             [record['game'] for record in records])
+            conn.executemany("INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [call for record in records for call in record['calls']])
+            conn.executemany("INSERT OR REPLACE INTO item_uses VALUES (?, ?, ?, ?, ?)",
+                             [use for record in records for use in record['item_uses']])
+        self.written += len(records)
+        self.batches += 1
+
+    def flush(self):
+        """待ち行列の記録が全て書き込まれるまで待つ"""
+        self._queue.join()
+
+    def close(self):
+        """残りの記録を書き込んで書き込みスレッドを止める"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # ----------------------------------------
+    # 読み込み（接続プール）
+    # ----------------------------------------
+    @contextmanager
+    def connection(self):
+        """プールから読み込み用の接続を借りる（無ければ作成し、上限を超えた分は返却時に閉じる）"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                if self._pool.qsize() < self.pool_size:
+                    self._pool.put(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def player_games(self, player_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """プレイヤーの対戦履歴（新しい順）"""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT * FROM (SELECT * FROM games WHERE player1_id = ? "
+                "UNION ALL SELECT * FROM games WHERE player2_id = ? AND player1_id IS NOT ?) "
+                "ORDER BY ended_at DESC LIMIT ?", (player_id, player_id, player_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def game_calls(self, game_id: str) -> List[Dict[str, Any]]:
+        """ゲームのコール一覧"""
+        with self.connection() as conn:
+            rows = conn.execute("SELECT * FROM calls WHERE game_id = ? ORDER BY player, seq",
+                                (game_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """勝利数のランキング"""
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT winner_id AS player_id, COUNT(*) AS wins FROM games WHERE winner_id IS NOT NULL "
+                "GROUP BY winner_id ORDER BY wins DESC, player_id LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """書き込みのカウンタ"""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pooled_connections': self._pool.qsize(),
+        }
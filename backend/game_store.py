@@ -0,0 +1,237 @@
+"""
+ゲーム状態のサーバー側ストア
+Server-side game state store
+
+- クッキーのセッションにはゲームIDだけを保存し、ゲーム状態（番号・履歴・アイテム等）はサーバー側に保持する
+- MemoryGameStore: プロセス内のLRU。最大件数と最終アクセスからのTTLで削除し、状態の辞書のコピーを保持する（シリアライズなし）
+  - 取得・保存のたびにコピーするので、保存前の変更や保存しなかった変更がストアの状態に混ざらない
+- SQLiteGameStore: SQLite（WALモード）にJSONで保存する（プロセスの再起動後も続きから遊べる、複数ワーカーで共有できる）
+- create_game_store(url): "memory://" / "sqlite:///path/to/games.db" からストアを作成する
+- 楽観的排他制御: ゲームごとにバージョン番号を持ち、get_versioned() で読んだバージョンを put() に渡すと、
+  その間に他のワーカーが保存していた場合は ConflictError になる（呼び出し側は読み込み直して操作をやり直す）
+  - 全体のロックは取らず、SQLiteでは1行の条件付きUPDATEで判定する
+- HashRing: ゲームIDから担当ワーカーを選ぶコンシステントハッシュ（ロードバランサーへの振り分けのヒント）
+"""
+
+import bisect
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+DEFAULT_TTL = 2 * 60 * 60  # 秒（セッションの有効期間と同じ2時間）
+DEFAULT_MAX_GAMES = 10000
+PURGE_INTERVAL = 100  # SQLiteで期限切れのゲームを削除する間隔（保存回数）
+HASH_REPLICAS = 64  # コンシステントハッシュの1ワーカーあたりの仮想ノード数
+
+
+class ConflictError(Exception):
+    """読み込んだ後に他のワーカーがゲーム状態を保存していた"""
+
+
+class GameStore:
+    """ゲーム状態ストアの基底クラス"""
+
+    evicted = 0  # 期限切れ等で削除したゲーム数
+
+    def new_id(self) -> str:
+        """新しいゲームIDを発行する"""
+        return uuid.uuid4().hex
+
+    def get(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """ゲーム状態を取得する（無いか期限切れならNone）"""
+        return self.get_versioned(game_id)[1]
+
+    def get_versioned(self, game_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """(バージョン, ゲーム状態) を取得する（無いか期限切れなら (0, None)）"""
+        raise NotImplementedError
+
+    def put(self, game_id: str, state: Dict[str, Any], version: Optional[int] = None) -> int:
+        """ゲーム状態を保存して新しいバージョンを返す
+
+        version を指定した場合、保存されているバージョンと異なれば ConflictError（0 は未保存のゲーム）
+        """
+        raise NotImplementedError
+
+    def delete(self, game_id: str):
+        """ゲーム状態を削除する"""
+        raise NotImplementedError
+
+
+class MemoryGameStore(GameStore):
+    """プロセス内のLRU + TTL ストア
+
+    取得・保存のたびに状態をコピーするので、同じプロセスの同時のリクエストも SQLite と同じくバージョンで検出する
+    """
+
+    def __init__(self, max_games: int = DEFAULT_MAX_GAMES, ttl: float = DEFAULT_TTL, clock=time.monotonic):
+        self.max_games = max_games
+        self.ttl = ttl
+        self.clock = clock
+        self._games: 'OrderedDict[str, tuple]' = OrderedDict()  # ゲームID -> (期限, バージョン, 状態)、古いアクセス順
+        self._lock = threading.Lock()
+        self.evicted = 0  # 期限切れ・最大件数超えで削除したゲーム数
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+    def get_versioned(self, game_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        now = self.clock()
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is None:
+                return 0, None
+            expires, version, state = entry
+            if expires <= now:
+                del self._games[game_id]
+                self.evicted += 1
+                return 0, None
+            # アクセスで期限を延ばし、LRUの末尾に移す
+            self._games[game_id] = (now + self.ttl, version, state)
+            self._games.move_to_end(game_id)
+            return version, copy.deepcopy(state)
+
+    def put(self, game_id: str, state: Dict[str, Any], version: Optional[int] = None) -> int:
+        now = self.clock()
+        with self._lock:
+            entry = self._games.get(game_id)
+            current = entry[1] if entry is not None else 0
+            if version is not None and version != current:
+                raise ConflictError(game_id)
+            self._games[game_id] = (now + self.ttl, current + 1, copy.deepcopy(state))
+            self._games.move_to_end(game_id)
+            self._evict(now)
+            return current + 1
+
+    def delete(self, game_id: str):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def _evict(self, now: float):
+        """期限切れと、最大件数を超えた古いゲームを削除する（先頭ほど古いので先頭から見る）"""
+        while self._games:
+            game_id, (expires, _, _) = next(iter(self._games.items()))
+            if expires > now and len(self._games) <= self.max_games:
+                break
+            del self._games[game_id]
+            self.evicted += 1
+
+
+class SQLiteGameStore(GameStore):
+    """SQLiteにJSONで保存するストア（複数のワーカー・プロセスで共有する）"""
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self._local = threading.local()  # スレッドごとの接続
+        self._puts = 0
+        self.evicted = 0  # このプロセスで削除した期限切れのゲーム数
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        # 読み込みが書き込みを待たないようにWALモードにする（データベースファイルに記録される）
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS games ("
+                         "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL, "
+                         "version INTEGER NOT NULL DEFAULT 1)")
+            conn.execute("CREATE INDEX IF NOT EXISTS games_updated_at ON games (updated_at)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(games)")]
+            if 'version' not in columns:
+                # バージョン番号の無い以前のデータベース
+                conn.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def get_versioned(self, game_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        row = self._connection().execute("SELECT state, updated_at, version FROM games WHERE id = ?",
+                                         (game_id,)).fetchone()
+        if row is None:
+            return 0, None
+        if row[1] + self.ttl <= self.clock():
+            self.delete(game_id)
+            self.evicted += 1
+            return 0, None
+        return row[2], json.loads(row[0])
+
+    def put(self, game_id: str, state: Dict[str, Any], version: Optional[int] = None) -> int:
+        now = self.clock()
+        data = json.dumps(state, ensure_ascii=False, separators=(',', ':'))
+        with self._connection() as conn:
+            if version is None:
+                conn.execute("INSERT INTO games (id, state, updated_at, version) VALUES (?, ?, ?, 1) "
+                             "ON CONFLICT (id) DO UPDATE SET state = excluded.state, "
+                             "updated_at = excluded.updated_at, version = version + 1", (game_id, data, now))
+                new_version = conn.execute("SELECT version FROM games WHERE id = ?", (game_id,)).fetchone()[0]
+            elif version == 0:
+                try:
+                    conn.execute("INSERT INTO games (id, state, updated_at, version) VALUES (?, ?, ?, 1)",
+                                 (game_id, data, now))
+                except sqlite3.IntegrityError:
+                    raise ConflictError(game_id)
+                new_version = 1
+            else:
+                # 読み込んだ時のバージョンのままなら更新する（1行の条件付きUPDATEなので他のゲームを待たせない）
+                updated = conn.execute("UPDATE games SET state = ?, updated_at = ?, version = version + 1 "
+                                       "WHERE id = ? AND version = ?", (data, now, game_id, version)).rowcount
+                if not updated:
+                    raise ConflictError(game_id)
+                new_version = version + 1
+            self._puts += 1
+            if self._puts % PURGE_INTERVAL == 0:
+                self.evicted += conn.execute("DELETE FROM games WHERE updated_at <= ?", (now - self.ttl,)).rowcount
+        return new_version
+
+    def delete(self, game_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+
+class HashRing:
+    """ゲームIDから担当ワーカーを選ぶコンシステントハッシュ
+
+    ワーカーの増減で担当が変わるゲームは全体の 1/ワーカー数 程度で済む
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = HASH_REPLICAS):
+        self.nodes = list(nodes)
+        points = sorted((self._hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def node_for(self, key: str) -> str:
+        """キーの担当ワーカー"""
+        if not self._keys:
+            raise ValueError("ワーカーがありません")
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+def create_game_store(url: str = "memory://", ttl: float = DEFAULT_TTL,
+                      max_games: int = DEFAULT_MAX_GAMES) -> GameStore:
+    """URLからストアを作成する（"memory://" または "sqlite:///パス"）"""
+    if url.startswith("memory://"):
+        return MemoryGameStore(max_games=max_games, ttl=ttl)
+    if url.startswith("sqlite:///"):
+        return SQLiteGameStore(url[len("sqlite:///"):], ttl=ttl)
+    raise ValueError(f"不明なゲームストアです: {url}")
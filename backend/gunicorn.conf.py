@@ -0,0 +1,63 @@
+"""
+gunicorn の設定（gunicorn -c gunicorn.conf.py app:app）
+
+- オンライン対戦のイベント配信（SSE）は接続を開いたまま待つので、gevent がインストールされていれば
+  gevent ワーカーを使う（1プロセスで WORKER_CONNECTIONS 本の接続を扱える）
+  - AIの計算は既定のスレッドプールで行う（gevent ではスレッドも協調的に切り替わるが、1手の計算は AI_TIME_BUDGET で
+    打ち切られるので他の接続を待たせる時間は短い）
+  - gevent のモンキーパッチとプロセスプール（AI_POOL_PROCESSES=True）の組み合わせは、プールの管理スレッド・キューが
+    パッチされた状態で fork するため停止することがあり、サポートしない（起動時に警告する）
+- gevent が無い場合はスレッドワーカー（接続ごとに1スレッド）
+- ルームはプロセス内に保持するので、ワーカー数（WEB_CONCURRENCY）の既定値は1
+  - 2以上にすると、別のワーカーに届いた操作・イベントの購読がルームを見つけられないため、
+    オンライン対戦を無効にする（ROOMS_ENABLED=False、起動時に警告する）。1人用・2人用は GAME_STORE_URL で共有する
+  - GAME_STORE_URL が未設定なら一時ディレクトリの SQLite（SHARED_GAME_STORE_URL）を使い、
+    memory:// が指定されていれば起動しない（ワーカーごとに別のストアになり、ゲームが見つからなくなるため）
+- 複数ワーカーでは /metrics が全ワーカーの値を合算できるよう、METRICS_DIR（既定は一時ディレクトリ）を使う
+"""
+
+import os
+import tempfile
+
+try:
+    import gevent  # noqa: F401
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS') or 2000)
+except ImportError:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('THREADS') or 32)
+
+# 複数ワーカーで GAME_STORE_URL が未設定の場合に共有するゲーム状態の保存先
+SHARED_GAME_STORE_URL = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'numeron-games.db')
+
+bind = f"0.0.0.0:{os.environ.get('PORT') or 8000}"
+workers = int(os.environ.get('WEB_CONCURRENCY') or 1)
+if workers > 1:
+    os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'numeron-metrics'))
+    os.environ['ROOMS_ENABLED'] = 'False'
+    os.environ['GAME_STORE_URL'] = os.environ.get('GAME_STORE_URL') or SHARED_GAME_STORE_URL
+# SSEの接続はキープアライブを送り続けるので、タイムアウトは通常のリクエストの長さで判定する
+timeout = 30
+
+
+def on_starting(server):
+    """前回の起動でワーカーが書き出したメトリクスを削除し、使えない組み合わせの設定を警告する（複数ワーカーで memory:// なら起動しない）"""
+    if server.cfg.workers > 1:
+        # コマンドラインの -w で指定された場合も、ワーカーの起動前に無効にする
+        os.environ['ROOMS_ENABLED'] = 'False'
+        server.log.warning("ワーカー数が %d のため、オンライン対戦（ルーム）を無効にしました"
+                           "（ルームはプロセス内に保持するので、1ワーカーでのみ利用できます）", server.cfg.workers)
+        store_url = os.environ['GAME_STORE_URL'] = os.environ.get('GAME_STORE_URL') or SHARED_GAME_STORE_URL
+        if store_url.startswith('memory://'):
+            server.log.error("ワーカー数が %d の場合、GAME_STORE_URL=memory:// は使えません"
+                             "（ワーカーごとに別のストアになります）。sqlite:///パス を指定してください",
+                             server.cfg.workers)
+            raise RuntimeError("複数ワーカーでは GAME_STORE_URL=memory:// を使えません")
+        server.log.info("ゲーム状態の保存先: %s", store_url)
+    if 'gevent' in server.cfg.worker_class_str and os.environ.get('AI_POOL_PROCESSES') == 'True':
+        server.log.warning("gevent ワーカーと AI_POOL_PROCESSES=True の組み合わせはサポートしていません"
+                           "（AIの計算が止まることがあります）")
+    directory = os.environ.get('METRICS_DIR')
+    if directory and os.path.isdir(directory):
+        from metrics import clear_directory
+        clear_directory(directory)
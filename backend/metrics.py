@@ -0,0 +1,268 @@
+"""
+メトリクスの集計と Prometheus 形式での出力
+Prometheus-style metrics
+
+- Counter / Histogram / Gauge: ラベルごとの値をプロセス内の辞書に持つ（記録は辞書の更新1回とロックだけ）
+  - Histogram は固定のバケット（le）ごとの件数と合計・件数
+  - Counter / Gauge は記録した値か、出力時に呼び出す関数の値（他の部品が数えているカウンタなど）
+- Registry.render(): テキスト形式（text/plain; version=0.0.4）で出力する
+- 複数ワーカー: directory を指定すると、各ワーカーが一定間隔で自分の値を "<pid>.json" に書き出し、
+  出力時に全ワーカーのファイルを合算する（Counter / Histogram は合計、Gauge は worker ラベルを付けて並べる）
+  - 終了したワーカーの Counter / Histogram は残し（累計が減らないように）、Gauge は捨てる
+"""
+
+import bisect
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterable
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+DEFAULT_FLUSH_INTERVAL = 5.0  # 秒
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """メトリクスの基底クラス（ラベルの値の組ごとに値を持つ）"""
+
+    type = ''
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function  # ラベルなしの値を出力時に取得する関数
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} のラベルは {self.labelnames} です")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """書き出し用の値（JSONにできる辞書）"""
+        if self.function is not None:
+            value = self.function()
+            with self._lock:
+                self._values[()] = value
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {'type': self.type, 'help': self.help, 'labelnames': list(self.labelnames), 'values': values}
+
+
+class Counter(Metric):
+    """増えるだけの値"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """現在の値"""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """値の分布（バケットごとの件数・合計・件数）"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [バケットごとの件数（累積ではない）..., 上限超えの件数, 合計]
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def time(self, **labels):
+        """with ブロック・関数の実行時間を記録する"""
+        return _Timer(self, labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot['buckets'] = list(self.buckets)
+        return snapshot
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    """メトリクスの一覧（directory を指定すると複数ワーカーの値を合算する）"""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, Metric] = {}
+        self._started = False
+        self._start_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"{metric.name} は登録済みです")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = (),
+                function: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, help, labelnames, function))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, function))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets=buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    # ----------------------------------------
+    # 複数ワーカー（ワーカーごとのファイル）
+    # ----------------------------------------
+    def start(self):
+        """ワーカーの値を一定間隔で書き出すスレッドを開始する（fork後のワーカーで呼ぶ）"""
+        if not self.directory:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="metrics-writer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.write()
+
+    def write(self):
+        """このワーカーの値を書き出す（置き換えはアトミック）"""
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temp = f"{path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(temp, path)
+
+    def collect(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """全ワーカーの (pid, 値)。directory が無ければこのプロセスの値だけ"""
+        if not self.directory:
+            return [(os.getpid(), self.snapshot())]
+        self.write()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshots.append((int(os.path.basename(path)[:-len('.json')]), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """全ワーカーの値を合算してテキスト形式で出力する"""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for pid, snapshot in sorted(self.collect()):
+            alive = pid == os.getpid() or _alive(pid)
+            for name, metric in snapshot.items():
+                entry = merged.setdefault(name, dict(metric, values={}))
+                for key, value in metric['values']:
+                    if metric['type'] == 'gauge':
+                        if alive:
+                            entry['values'][tuple(key) + (str(pid),)] = value
+                    elif tuple(key) in entry['values']:
+                        current = entry['values'][tuple(key)]
+                        entry['values'][tuple(key)] = ([a + b for a, b in zip(current, value)]
+                                                       if isinstance(value, list) else current + value)
+                    else:
+                        entry['values'][tuple(key)] = value
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric['labelnames'] + (['worker'] if metric['type'] == 'gauge' else [])
+            for key, value in sorted(metric['values'].items()):
+                labels = list(zip(labelnames, key))
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric['buckets'] + ['+Inf'], value[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def clear_directory(directory: str):
+    """前回の起動で書き出したワーカーのファイルを削除する（gunicorn の起動時）"""
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(labels: List[Tuple[str, Any]]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
@@ -0,0 +1,339 @@
+"""
+オンライン2人対戦のルーム
+Online two-player rooms
+
+- ルームは各プレイヤーが自分の端末から参加する対戦（席1が作成者、席2が参加者）
+- 席はセッションのプレイヤーIDで判定する（セッションは署名付きなので他人の席には座れない）
+- 手番の操作は publish() でルームの購読者（Server-Sent Events の接続）に配信する
+  - 購読者ごとに上限付きの待ち行列を持ち、受け取りが追いつかない接続は切断する
+- event_stream(): 購読者の待ち行列をSSEの形式で返すジェネレータ（一定間隔でキープアライブを送る）
+- 待機中の接続はイベントを待つだけなので、gevent ワーカーなら1プロセスで数千接続を扱える（gunicorn.conf.py）
+- RoomRegistry: ルームIDで O(1) に引けるプロセス内のルーム一覧
+  - 公開ルーム（クイックマッチ）の相手待ちは到着順に並べ、quick_match() で先頭の相手と組み合わせる
+  - 最後の操作から idle_timeout 秒経ったルームと、max_rooms を超えた古いルームは削除する（最終操作の古い順に並べて先頭から見る）
+  - ルームの作成時に加えて、start_sweeper() のスレッドが一定間隔で削除する（操作の無いサーバーでも購読者の待ち行列を残さない）
+- 1ルームのメモリは __slots__ のルームとゲーム状態の辞書、上限付きの購読者の待ち行列だけ
+  （python rooms.py --rooms 10000 でルーム数ごとのメモリ・操作の速さを計測する）
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Iterator, Tuple, Callable
+
+MAX_SUBSCRIBERS = 4  # 1ルームの同時接続数の上限（1人2タブまで）
+MAX_PENDING_EVENTS = 64  # 1接続で未送信のイベント数の上限
+DEFAULT_HEARTBEAT = 15.0  # 秒
+DEFAULT_MAX_ROOMS = 10000
+DEFAULT_IDLE_TIMEOUT = 30 * 60  # 秒
+DEFAULT_SWEEP_INTERVAL = 60.0  # 秒
+
+
+class RoomError(Exception):
+    """ルームの操作エラー（見つからない・満員など）"""
+
+
+class Room:
+    """対戦ルーム"""
+
+    __slots__ = ('id', 'state', 'players', 'subscribers', 'lock', 'public', 'created_at', 'last_active')
+
+    def __init__(self, room_id: str, state: Dict[str, Any], now: float, public: bool = False):
+        self.id = room_id
+        self.state = state  # Webのゲーム状態と同じ形式（mode == 'two'）
+        self.players: List[Optional[str]] = [None, None]  # 席ごとのプレイヤーID
+        self.subscribers: List['queue.Queue'] = []
+        self.lock = threading.RLock()
+        self.public = public  # クイックマッチで相手を募集するルーム
+        self.created_at = now
+        self.last_active = now
+
+    def seat_of(self, player_id: Optional[str]) -> Optional[int]:
+        """プレイヤーの席（1 / 2、参加していなければNone）"""
+        if player_id is None:
+            return None
+        for seat, occupant in enumerate(self.players, 1):
+            if occupant == player_id:
+                return seat
+        return None
+
+    def subscribe(self) -> 'queue.Queue':
+        """イベントの購読を開始する"""
+        subscriber = queue.Queue(MAX_PENDING_EVENTS)
+        with self.lock:
+            if len(self.subscribers) >= MAX_SUBSCRIBERS:
+                raise RoomError("接続数が上限に達しています")
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'queue.Queue'):
+        """イベントの購読を終了する"""
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """購読者全員にイベントを配信する（受け取りが追いつかない購読者は切断する）"""
+        message = (event, data)
+        with self.lock:
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self.subscribers.remove(subscriber)
+                    # 接続側のジェネレータに終了を知らせる
+                    with subscriber.mutex:
+                        subscriber.queue.clear()
+                    subscriber.put_nowait(None)
+
+
+class RoomRegistry:
+    """プロセス内のルーム一覧（ルームIDで引く・相手待ちの到着順・最終操作の古い順）"""
+
+    def __init__(self, max_rooms: int = DEFAULT_MAX_ROOMS, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 clock=time.monotonic):
+        self.max_rooms = max_rooms
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._rooms: 'OrderedDict[str, Room]' = OrderedDict()  # 最終操作の古い順
+        self._waiting: 'OrderedDict[str, Room]' = OrderedDict()  # 相手待ちの公開ルーム（到着順）
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+        self.created = 0
+        self.matched = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def create(self, player_id: str, state: Dict[str, Any], public: bool = False) -> Room:
+        """ルームを作成し、作成者を席1に座らせる（公開ルームは相手待ちに並べる）"""
+        now = self.clock()
+        room = Room(uuid.uuid4().hex[:12], state, now, public)
+        room.players[0] = player_id
+        with self._lock:
+            self._rooms[room.id] = room
+            if public:
+                self._waiting[room.id] = room
+            self.created += 1
+            evicted = self._evict(now)
+        self._close(evicted)
+        return room
+
+    def get(self, room_id: str) -> Optional[Room]:
+        """ルームを取得する（無ければNone）。取得したルームは最終操作の時刻を更新する"""
+        now = self.clock()
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                return None
+            room.last_active = now
+            self._rooms.move_to_end(room_id)
+        return room
+
+    def join(self, room_id: str, player_id: str) -> Tuple[Room, int]:
+        """ルームに参加して席を返す（既に参加していればその席）"""
+        room = self.get(room_id)
+        if room is None:
+            raise RoomError("ルームが見つかりません")
+        if not self._seat(room, player_id):
+            seat = room.seat_of(player_id)
+            if seat is None:
+                raise RoomError("ルームは満員です")
+            return room, seat
+        with self._lock:
+            self._waiting.pop(room.id, None)
+        return room, 2
+
+    def _seat(self, room: Room, player_id: str) -> bool:
+        """空いている席2に座らせて参加を配信する（座れなければFalse）"""
+        with room.lock:
+            if room.players[1] is not None or room.players[0] == player_id:
+                return False
+            room.players[1] = player_id
+        room.publish('joined', {'seat': 2})
+        return True
+
+    def quick_match(self, player_id: str, new_state: Callable[[], Dict[str, Any]]) -> Tuple[Room, int]:
+        """相手待ちの先頭の公開ルームに参加する（いなければ公開ルームを作成して相手を待つ）"""
+        while True:
+            with self._lock:
+                room = next(iter(self._waiting.values()), None)
+                if room is not None and room.players[0] == player_id:
+                    # 既に自分が相手を待っている
+                    return room, 1
+                if room is not None:
+                    del self._waiting[room.id]
+            if room is None:
+                return self.create(player_id, new_state(), public=True), 1
+            # ロックを外している間に削除・参加されたルームは飛ばす
+            if room.id in self._rooms and self._seat(room, player_id):
+                self.matched += 1
+                self.get(room.id)
+                return room, 2
+
+    def list_waiting(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """相手待ちの公開ルーム（待ちの長い順）"""
+        now = self.clock()
+        with self._lock:
+            rooms = [room for _, room in zip(range(limit), self._waiting.values())]
+        return [{'room_id': room.id, 'waiting_seconds': round(now - room.created_at, 1)} for room in rooms]
+
+    def remove(self, room_id: str):
+        """ルームを削除する"""
+        with self._lock:
+            room = self._rooms.pop(room_id, None)
+            self._waiting.pop(room_id, None)
+        if room is not None:
+            self._close([room])
+
+    def evict_idle(self) -> int:
+        """操作の無いルームを削除して、削除した数を返す"""
+        with self._lock:
+            evicted = self._evict(self.clock())
+        self._close(evicted)
+        return len(evicted)
+
+    def start_sweeper(self, interval: float = DEFAULT_SWEEP_INTERVAL):
+        """操作の無いルームを interval 秒ごとに削除するスレッドを開始する（fork後のワーカーで呼ぶ、2回目以降は何もしない）"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, args=(interval,), name="room-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """削除のスレッドを止める"""
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+
+    def _sweep(self, interval: float):
+        while not self._stop_sweeper.wait(interval):
+            self.evict_idle()
+
+    def _evict(self, now: float) -> List[Room]:
+        """操作の無いルームと、最大数を超えた古いルームを一覧から外す（先頭ほど古いので先頭から見る）"""
+        evicted = []
+        while self._rooms:
+            room = next(iter(self._rooms.values()))
+            if now - room.last_active < self.idle_timeout and len(self._rooms) <= self.max_rooms:
+                break
+            del self._rooms[room.id]
+            self._waiting.pop(room.id, None)
+            evicted.append(room)
+        self.evicted += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _close(rooms: List[Room]):
+        """削除したルームの接続に終了を知らせる"""
+        for room in rooms:
+            room.publish('closed', {})
+
+    def stats(self) -> Dict[str, int]:
+        """ルーム数とカウンタ"""
+        with self._lock:
+            return {
+                'rooms': len(self._rooms),
+                'waiting': len(self._waiting),
+                'max_rooms': self.max_rooms,
+                'created': self.created,
+                'matched': self.matched,
+                'evicted': self.evicted,
+            }
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Server-Sent Events の1イベント"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+def event_stream(room: Room, subscriber: 'queue.Queue', heartbeat: float = DEFAULT_HEARTBEAT) -> Iterator[str]:
+    """購読者のイベントをSSEの形式で返す（接続が切れたら購読を終了する）"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                return
+            yield sse_event(*message)
+    finally:
+        room.unsubscribe(subscriber)
+
+
+def benchmark(rooms: int, new_state: Callable[[], Dict[str, Any]]) -> Dict[str, float]:
+    """rooms 個のルームを作成（半分はクイックマッチで2人組）し、メモリと操作の速さを計測する"""
+    now = [0.0]
+
+    def fill() -> Tuple[RoomRegistry, List[str]]:
+        registry = RoomRegistry(max_rooms=rooms, clock=lambda: now[0])
+        ids = []
+        for i in range(rooms):
+            if i % 2:
+                room, _ = registry.quick_match(f"q{i // 2}", new_state)
+                registry.quick_match(f"q{i // 2}-opponent", new_state)
+            else:
+                room = registry.create(f"p{i}", new_state())
+            ids.append(room.id)
+        return registry, ids
+
+    # メモリは別に計測する（tracemalloc は作成を遅くする）
+    tracemalloc.start()
+    registry, ids = fill()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del registry, ids
+
+    started = time.perf_counter()
+    registry, ids = fill()
+    create_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for room_id in ids:
+        registry.get(room_id)
+    get_time = time.perf_counter() - started
+
+    now[0] += registry.idle_timeout
+    started = time.perf_counter()
+    evicted = registry.evict_idle()
+    evict_time = time.perf_counter() - started
+    return {
+        'rooms': len(ids),
+        'evicted': evicted,
+        'bytes_per_room': memory / len(ids),
+        'create_us': create_time / len(ids) * 1e6,
+        'get_us': get_time / len(ids) * 1e6,
+        'evict_ms': evict_time * 1000,
+    }
+
+
+def main():
+    """ルーム数ごとのメモリ・操作の速さを計測する（1ワーカーあたりの上限の目安）"""
+    parser = argparse.ArgumentParser(description="ルーム一覧の容量の計測")
+    parser.add_argument('--rooms', type=int, default=DEFAULT_MAX_ROOMS, help="ルーム数")
+    args = parser.parse_args()
+
+    # Webのゲーム状態をそのまま使う
+    from app import new_game_state
+    result = benchmark(args.rooms, lambda: new_game_state('two'))
+    print(f"ルーム数: {result['rooms']}")
+    print(f"メモリ: {result['bytes_per_room'] / 1024:.1f}KB/ルーム"
+          f"（合計 {result['bytes_per_room'] * result['rooms'] / 1024 / 1024:.1f}MB）")
+    print(f"作成・クイックマッチ: {result['create_us']:.1f}µs/ルーム")
+    print(f"取得: {result['get_us']:.2f}µs/回")
+    print(f"削除: {result['evicted']}ルームを {result['evict_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,143 @@
-// アイテム即時発動
+// ゲームAPI（/api/games/<ゲームID>/... またはオンライン対戦の /api/rooms/<ルームID>/...）の呼び出しと、
+// 返ってきた差分による画面の部分更新
+// APIのパスは <body data-api-base="...">、オンライン対戦の自分の席は data-seat から取得する
+
+window.callGameApi = function(action, payload = {}) {
+    return fetch(`${document.body.dataset.apiBase}/${action}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(payload)
+    }).then(res => res.json());
+};
+
+// AIの推測の結果をロングポーリングで待ち、画面に反映する
+window.pollAiMove = function(ticket) {
+    const gameId = document.body.dataset.gameId;
+    return fetch(`/api/games/${gameId}/ai?ticket=${ticket}&wait=10`)
+        .then(res => res.json())
+        .then(delta => delta.pending ? window.pollAiMove(ticket) : applyGameDelta(delta));
+};
+
+window.showApiError = function(err) {
+    alert('通信中にエラーが発生しました');
+    console.error(err);
+};
+
+// メッセージ欄を更新
+function showGameMessage(text, type) {
+    const message = document.getElementById('message');
+    if (!message) return;
+    message.className = 'message ' + (text ? type : 'empty');
+    message.textContent = text || '';
+}
+
+// 履歴の1行を作成（テンプレートの .history-item と同じ構造）
+function createHistoryRow(row) {
+    const item = document.createElement('div');
+    item.className = 'history-item';
+    const turn = document.createElement('div');
+    turn.className = 'history-turn';
+    turn.textContent = row.index;
+    const guess = document.createElement('div');
+    guess.className = 'history-guess';
+    (row.guess || ['-', '-', '-']).forEach(d => {
+        const digit = document.createElement('div');
+        digit.className = 'history-digit';
+        digit.textContent = d;
+        guess.appendChild(digit);
+    });
+    const result = document.createElement('div');
+    result.className = 'history-result';
+    result.textContent = row.guess ? `${row.eat}EAT ${row.bite}BITE` : row.effect;
+    item.append(turn, guess, result);
+    return item;
+}
+
+// 手番・アイテム使用状況に合わせて入力欄とボタンの有効/無効を切り替え
+function updateControls(state) {
+    const seat = document.body.dataset.seat;
+    document.querySelectorAll('.player-controls').forEach(panel => {
+        const active = !state.game_ended && panel.dataset.playerLabel === state.current_player
+            && (!seat || panel.id === `player${seat}-controls`);
+        panel.querySelectorAll('.digit-input, .submit-btn, .giveup-btn').forEach(el => {
+            el.disabled = !active;
+        });
+        panel.querySelectorAll('.item-btn').forEach(btn => {
+            btn.disabled = !active || state.item_used_this_turn || btn.classList.contains('used');
+        });
+    });
+}
+
+// APIの差分を画面に反映し、差分をそのまま返す
+window.applyGameDelta = function(delta) {
+    if (!delta.ok) {
+        showGameMessage(delta.error, 'error');
+        return delta;
+    }
+    // オンライン対戦では自分の操作もサーバーから配信されるので、APIの応答では画面を更新しない
+    if (document.body.dataset.seat && !delta.pushed) {
+        return delta;
+    }
+    if (delta.history) {
+        const history = document.getElementById(`${delta.player}-history`);
+        if (history) {
+            history.querySelectorAll('.history-empty').forEach(el => el.remove());
+            history.appendChild(createHistoryRow(delta.history));
+        }
+    }
+    const panel = document.getElementById(`${delta.player}-controls`);
+    if (panel) {
+        delta.items.forEach(item => {
+            const btn = panel.querySelector(`.item-btn[data-item="${item.name}"]`);
+            if (btn) btn.classList.toggle('used', item.used);
+        });
+    }
+    document.getElementById('turn').textContent = delta.turn;
+    document.getElementById('current-player').textContent = delta.current_player;
+    document.querySelectorAll('.memo-card').forEach((card, i) => {
+        card.classList.toggle('used', delta.memo[i]);
+    });
+    updateControls(delta);
+    const endActions = document.getElementById('game-end-actions');
+    if (endActions) endActions.style.display = delta.game_ended ? '' : 'none';
+    showGameMessage(delta.message, delta.message_type);
+    return delta;
+};
+
+// アイテム即時発動（TARGETの数字を省略するとサーバー側でランダムに選ぶ）
 window.useItemImmediately = function(itemName, targetDigit = null) {
     if (!itemName) return;
     // 既に使用済みなら無効
-    const btn = document.querySelector(`button[data-item="${itemName}"]`);
+    const btn = document.querySelector(`button[data-item="${itemName}"]:not(:disabled)`);
     if (btn && btn.classList.contains('used')) return;
-    // TARGETの場合は数字が必要
-    if (itemName === 'TARGET' && (targetDigit === null || targetDigit === undefined)) {
-        alert('TARGETアイテムを使う場合は数字を選択してください。');
-        return;
+    const payload = { item_name: itemName };
+    if (targetDigit !== null && targetDigit !== undefined) {
+        payload.target_digit = targetDigit;
     }
-    fetch('/use-item', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ item_name: itemName, target_digit: targetDigit })
-    })
-    .then(res => res.json())
-    .then(data => {
-        if (data.error) {
-            alert('アイテム使用に失敗しました: ' + data.error);
-            return;
-        }
-        // メッセージ表示
-        if (typeof showItemResult === 'function') {
-            showItemResult(data.effect || 'アイテム効果が実行されました');
-        }
-        // アイテムボタンをグレーアウト
-        if (btn) {
-            btn.classList.remove('selected');
-            btn.classList.add('used');
-        }
-        // 履歴をリロード
-        location.reload();
-    })
-    .catch(err => {
-        alert('アイテム使用中にエラーが発生しました');
-        console.error(err);
-    });
+    return callGameApi('item', payload)
+        .then(applyGameDelta)
+        .then(delta => {
+            if (delta.ok && btn) btn.classList.remove('selected');
+            return delta;
+        })
+        .catch(showApiError);
 };
 
 window.selectItemButton = function(btn) {
     if (btn.classList.contains('used')) return;
     const item = btn.dataset.item;
-    if (item === 'TARGET') {
-        document.getElementById('target-ui').style.display = 'block';
+    const targetUi = document.getElementById('target-ui');
+    if (item === 'TARGET' && targetUi) {
+        targetUi.style.display = 'block';
         document.querySelectorAll('.digit-btn').forEach(dbtn => {
             dbtn.onclick = function() {
                 const digit = parseInt(this.textContent);
                 document.getElementById('target-digit-input').value = digit;
                 window.useItemImmediately('TARGET', digit);
-                document.getElementById('target-ui').style.display = 'none';
+                targetUi.style.display = 'none';
             };
         });
     } else {
         window.useItemImmediately(item);
     }
 };
-
-// アイテム効果のメッセージ表示（game.html側のshowItemResultを利用） 
\ No newline at end of file
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+AI同士の一括（ロックステップ）シミュレーション
+Lockstep batched self-play in NumPy
+
+【概要】
+- N個の独立したゲームを同じ手番で同時に進める（コールのみ、アイテムなし）
+- 番号・AIの状態・コール数は (N, ...) の配列で保持し、1手ごとに全ゲームの推測を
+  numeron_scoring の判定テーブルから1回の配列参照で判定する
+- 判定は NumeronGame.calculate_eat_bite と同じテーブル、候補の絞り込みは CandidateSet.filter_code と同じ規則
+- 推測戦略（一括版）
+  - tree: 戦略木を配列にして全ゲームのノードを一括で辿る。
+          AIPlayer(strategy="tree", item_policy="none") と同じ推測になる
+          （推測が自分の番号になり木を外れたゲームだけ、AIPlayerと同じく entropy 戦略で1件ずつ選ぶ）
+  - random: 候補マスク (N, 720) から一様に選ぶ（AIPlayer(strategy="random") と同じ分布）
+- entropy / minimax / expected は1局面ごとの評価が重いため一括版は無い（tree が entropy の事前計算に当たる）
+- 番号は Player.generate_random_number と同じ分布で選ぶ
+
+【使い方】
+    python3 numeron_batch.py --games 1000000 [--player1 tree] [--player2 random] [--seed 0]
+"""
+
+import argparse
+import time
+from typing import Dict, Any, Tuple
+
+import numeron_scoring
+from numeron_scoring import np, WIN_CODE, NUMBER_COUNT
+from numeron_candidates import CandidateSet
+from numeron_strategy import EntropySelector
+from numeron_tree import TREE_PATH, load_tree
+
+BATCH_SIZE = 65536  # 1回に同時に進めるゲーム数（メモリ使用量の上限）
+MAX_TURNS = 100
+FALLBACK_CACHE_SIZE = 100000
+
+
+def secret_map():
+    """0〜719の一様乱数を Player.generate_random_number と同じ分布の番号に写す配列
+
+    generate_random_number は数字を並べ替えた先頭3桁を使い、先頭が0なら2桁目と入れ替える
+    """
+    mapping = np.arange(NUMBER_COUNT, dtype=np.intp)
+    for i, number in enumerate(numeron_scoring.ALL_NUMBERS):
+        if number[0] == 0:
+            mapping[i] = numeron_scoring.index_of([number[1], 0, number[2]])
+    return mapping
+
+
+class BatchPolicy:
+    """一括版の推測戦略の基底クラス（1プレイヤー分、ゲームごとの状態を配列で持つ）"""
+
+    name = ""
+
+    def start(self, own):
+        """ゲームを開始する（own: 各ゲームの自分の番号のインデックス配列）"""
+        self.own = own
+
+    def select(self, games):
+        """ゲーム番号の配列 games について推測インデックスの配列を返す"""
+        raise NotImplementedError
+
+    def observe(self, games, guesses, codes):
+        """コール結果（判定コードの配列）を反映する"""
+        raise NotImplementedError
+
+
+class BatchRandomPolicy(BatchPolicy):
+    """残り候補からランダムに選ぶ（RandomSelectorの一括版）"""
+
+    name = "random"
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def start(self, own):
+        super().start(own)
+        in_universe = np.frombuffer(numeron_scoring.IN_UNIVERSE, dtype=np.uint8).astype(bool)
+        self.masks = np.repeat(in_universe[None, :], len(own), axis=0)
+
+    def select(self, games):
+        masks = self.masks[games]
+        rows = np.arange(len(games))
+        # 自分の番号以外に候補があれば自分の番号は選ばない
+        choices = masks.copy()
+        choices[rows, self.own[games]] = False
+        empty = ~choices.any(axis=1)
+        choices[empty] = masks[empty]
+        counts = choices.sum(axis=1)
+        picks = (self.generator.random(len(games)) * counts).astype(np.intp)
+        return (choices.cumsum(axis=1, dtype=np.int16) > picks[:, None]).argmax(axis=1)
+
+    def observe(self, games, guesses, codes):
+        self.masks[games] &= numeron_scoring.table_array()[guesses] == codes[:, None]
+
+
+class BatchTreePolicy(BatchPolicy):
+    """戦略木のノードを全ゲーム一括で辿る（TreeSelectorの一括版）"""
+
+    name = "tree"
+
+    def __init__(self, path: str = TREE_PATH):
+        tree = load_tree(path)
+        if tree is not None:
+            self.guesses, self.children = tree.node_arrays()
+            self.root = tree.root
+        else:
+            # 戦略木ファイルが無ければ TreeSelector と同じく entropy 戦略（幅1の戦略木と同じ推測）
+            from numeron_solver import TreeSolver
+            solver = TreeSolver("entropy")
+            self.root = solver.solve(CandidateSet())[0]
+            self.guesses = np.array([guess for guess, _ in solver.nodes], dtype=np.intp)
+            self.children = np.full((len(solver.nodes), numeron_scoring.CODE_COUNT), -1, dtype=np.intp)
+            for node, (_, children) in enumerate(solver.nodes):
+                for code, child in children.items():
+                    self.children[node, code] = child
+        self.fallback = EntropySelector()
+        self._cache: Dict[Tuple[Tuple[int, int], ...], int] = {}
+
+    def start(self, own):
+        super().start(own)
+        self.nodes = np.full(len(own), self.root, dtype=np.intp)
+        # コール履歴（木を外れたゲームの候補を作り直すのに使う）
+        self.history_guesses = np.zeros((len(own), MAX_TURNS), dtype=np.intp)
+        self.history_codes = np.zeros((len(own), MAX_TURNS), dtype=np.uint8)
+        self.history_length = np.zeros(len(own), dtype=np.intp)
+        self.off_tree: Dict[int, CandidateSet] = {}  # 木を外れたゲームの候補
+
+    def select(self, games):
+        guesses = self.guesses[self.nodes[games]]
+        leave = (guesses == self.own[games]) | (self.nodes[games] < 0)
+        for row in np.flatnonzero(leave).tolist():
+            game = int(games[row])
+            guesses[row] = self.fallback_select(game)
+        return guesses
+
+    def fallback_select(self, game: int) -> int:
+        """木を外れたゲームの推測を entropy 戦略で選ぶ（同じ局面の結果は使い回す）"""
+        candidates = self.off_tree.get(game)
+        if candidates is None:
+            candidates = CandidateSet()
+            length = self.history_length[game]
+            for guess_index, code in zip(self.history_guesses[game, :length].tolist(),
+                                         self.history_codes[game, :length].tolist()):
+                candidates.filter_code(guess_index, code)
+            self.off_tree[game] = candidates
+            self.nodes[game] = -1
+        own = int(self.own[game])
+        key = tuple(candidates.observations) + ((own, -1),)
+        guess_index = self._cache.get(key)
+        if guess_index is None:
+            if len(self._cache) >= FALLBACK_CACHE_SIZE:
+                self._cache.clear()
+            guess_index = self.fallback.select(candidates, exclude=own)
+            self._cache[key] = guess_index
+        return guess_index
+
+    def observe(self, games, guesses, codes):
+        nodes = self.nodes[games]
+        on_tree = nodes >= 0
+        nodes[on_tree] = self.children[nodes[on_tree], codes[on_tree]]
+        self.nodes[games] = nodes
+        lengths = self.history_length[games]
+        self.history_guesses[games, lengths] = guesses
+        self.history_codes[games, lengths] = codes
+        self.history_length[games] = lengths + 1
+        for row in np.flatnonzero(~on_tree).tolist():
+            self.off_tree[int(games[row])].filter_code(int(guesses[row]), int(codes[row]))
+
+
+BATCH_POLICIES = {
+    BatchTreePolicy.name: BatchTreePolicy,
+    BatchRandomPolicy.name: BatchRandomPolicy,
+}
+
+
+def get_policy(name: str, generator) -> BatchPolicy:
+    """名前から一括版の推測戦略を作成する"""
+    if name == BatchRandomPolicy.name:
+        return BatchRandomPolicy(generator)
+    if name in BATCH_POLICIES:
+        return BATCH_POLICIES[name]()
+    raise ValueError(f"一括シミュレーションに対応していない戦略です: {name}（{', '.join(BATCH_POLICIES)}）")
+
+
+def simulate_batch(secrets, first, strategies: Tuple[str, str] = ("tree", "tree"), generator=None,
+                   max_turns: int = MAX_TURNS) -> Dict[str, Any]:
+    """番号 secrets (N, 2) と先攻 first (N,)（0か1）のゲームを一括で進め、結果の配列を返す
+
+    winner は 1 か 2（打ち切りは0）、turns / calls は numeron_simulate.play_game と同じ数え方
+    """
+    if np is None:
+        raise ImportError("一括シミュレーションにはnumpyが必要です")
+    generator = generator if generator is not None else np.random.default_rng()
+    max_turns = min(max_turns, MAX_TURNS)  # コール履歴の配列の長さ
+    secrets = np.asarray(secrets, dtype=np.intp)
+    first = np.asarray(first, dtype=np.intp)
+    size = len(secrets)
+    table = numeron_scoring.table_array()
+    policies = [get_policy(name, generator) for name in strategies]
+    for side, policy in enumerate(policies):
+        policy.start(secrets[:, side])
+
+    winner = np.zeros(size, dtype=np.int8)
+    turns = np.zeros(size, dtype=np.int16)
+    calls = np.zeros((size, 2), dtype=np.int16)
+    active = np.arange(size, dtype=np.intp)
+    step = 0
+    while len(active) and step < max_turns:
+        sides = (first[active] + step) % 2
+        for side, policy in enumerate(policies):
+            games = active[sides == side]
+            if not len(games):
+                continue
+            guesses = policy.select(games)
+            codes = table[guesses, secrets[games, 1 - side]]
+            policy.observe(games, guesses, codes)
+            calls[games, side] += 1
+            won = games[codes == WIN_CODE]
+            winner[won] = side + 1
+            turns[won] = step + 1
+        active = active[winner[active] == 0]
+        step += 1
+    turns[active] = step
+    return {'secrets': secrets, 'first': first, 'winner': winner, 'turns': turns, 'calls': calls}
+
+
+def simulate(games: int, seed: int = 0, strategies: Tuple[str, str] = ("tree", "tree"),
+             batch_size: int = BATCH_SIZE, max_turns: int = MAX_TURNS) -> Dict[str, Any]:
+    """games ゲームを batch_size ずつ一括で進め、結果の配列を返す（先攻はゲーム番号の偶奇で入れ替える）"""
+    generator = np.random.default_rng(seed)
+    mapping = secret_map()
+    results = []
+    for start in range(0, games, batch_size):
+        size = min(batch_size, games - start)
+        secrets = mapping[generator.integers(NUMBER_COUNT, size=(size, 2))]
+        first = np.arange(start, start + size, dtype=np.intp) % 2
+        results.append(simulate_batch(secrets, first, strategies, generator, max_turns))
+    return {key: np.concatenate([result[key] for result in results]) for key in results[0]} if results else {}
+
+
+def summarize(results: Dict[str, Any]) -> Dict[str, Any]:
+    """一括シミュレーション結果の集計（numeron_simulate.SimulationStats.summary と同じ項目の一部）"""
+    games = len(results['winner'])
+    winner = results['winner']
+    finished = winner > 0
+    return {
+        'games': games,
+        'win_rate': [float((winner == 1).mean()), float((winner == 2).mean())],
+        'first_win_rate': float((winner[finished] - 1 == results['first'][finished]).sum() / games),
+        'unfinished': int((~finished).sum()),
+        'average_turns': float(results['turns'].mean()),
+        'average_calls': results['calls'].mean(axis=0).tolist(),
+        'max_calls': results['calls'].max(axis=0).tolist(),
+    }
+
+
+def main():
+    """一括シミュレーションを実行して集計を表示する"""
+    parser = argparse.ArgumentParser(description="AI同士の一括シミュレーション（コールのみ）")
+    parser.add_argument('--games', type=int, default=100000, help="ゲーム数")
+    parser.add_argument('--player1', default='tree', choices=sorted(BATCH_POLICIES), help="AI1の推測戦略")
+    parser.add_argument('--player2', default='tree', choices=sorted(BATCH_POLICIES), help="AI2の推測戦略")
+    parser.add_argument('--seed', type=int, default=0, help="乱数シード")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="同時に進めるゲーム数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = simulate(args.games, args.seed, (args.player1, args.player2), args.batch_size)
+    elapsed = time.perf_counter() - started
+    summary = summarize(results)
+    print(f"ゲーム数: {summary['games']}（打ち切り {summary['unfinished']}）")
+    print(f"勝率: AI1({args.player1}) {summary['win_rate'][0]:.3f} / AI2({args.player2}) {summary['win_rate'][1]:.3f}"
+          f"（先攻勝率 {summary['first_win_rate']:.3f}）")
+    print(f"平均ターン数: {summary['average_turns']:.2f}")
+    print(f"平均コール数: {summary['average_calls'][0]:.2f} / {summary['average_calls'][1]:.2f}"
+          f"（最大 {summary['max_calls'][0]} / {summary['max_calls'][1]}）")
+    print(f"実行時間: {elapsed:.2f}秒（{summary['games'] / elapsed:.0f} ゲーム/秒）")
+
+
+if __name__ == "__main__":
+    main()
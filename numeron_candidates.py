@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+AI候補番号管理
+Array-backed candidate set for AIPlayer
+
+【概要】
+- 相手の番号の候補を numeron_scoring のインデックス列として保持する
+- (推測, EAT, BITE) の観測1件につき、判定テーブルの1行を使った1パスで絞り込む
+- numpy がインストールされていれば配列演算で、無ければ純Pythonで絞り込む
+- HIGH&LOW / SLASH / TARGET / DOUBLE の結果は、事前計算した属性を使った1パスのマスクで絞り込む
+- 相手の SHUFFLE / CHANGE 後は、残っている候補から変化後になり得る番号へ広げる
+- 従来の「3要素リストのリスト」形式は numbers() で参照できる
+"""
+
+from typing import List, Tuple, Optional, Iterable, Sequence, Dict, Any
+
+import numeron_scoring
+from numeron_scoring import np
+
+
+class CandidateSet:
+    """候補番号の集合（インデックス配列で保持）"""
+
+    def __init__(self, indices: Optional[Iterable[int]] = None, use_numpy: Optional[bool] = None):
+        if use_numpy is None:
+            use_numpy = np is not None
+        if use_numpy and np is None:
+            raise ImportError("numpyがインストールされていません")
+        self.use_numpy = use_numpy
+        self.observations: List[Tuple[int, int]] = []  # (推測インデックス, 判定コード)
+        self.item_results: List[Dict[str, Any]] = []  # 反映済みのアイテム効果
+        self._numbers: Optional[List[List[int]]] = None
+        # 全候補からコール結果のみで絞り込まれているか（定跡などの使用条件）
+        self.pristine = indices is None
+        if indices is None:
+            indices = numeron_scoring.UNIVERSE
+        if self.use_numpy:
+            self._indices = np.array(sorted(set(indices)), dtype=np.intp)
+        else:
+            self._indices = sorted(set(indices))
+
+    @classmethod
+    def from_numbers(cls, numbers: Iterable[Sequence[int]], use_numpy: Optional[bool] = None) -> 'CandidateSet':
+        """番号のリストから候補集合を作成する"""
+        indices = []
+        for number in numbers:
+            index = numeron_scoring.index_of(number)
+            if index is None:
+                raise ValueError(f"候補にできない番号です: {list(number)}")
+            indices.append(index)
+        return cls(indices, use_numpy=use_numpy)
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    def __contains__(self, number: Sequence[int]) -> bool:
+        index = numeron_scoring.index_of(number)
+        return index is not None and self.contains_index(index)
+
+    def contains_index(self, index: int) -> bool:
+        """インデックスが候補に含まれるかチェックする"""
+        if self.use_numpy:
+            position = int(np.searchsorted(self._indices, index))
+            return position < len(self._indices) and int(self._indices[position]) == index
+        return index in self._indices
+
+    def indices(self) -> List[int]:
+        """候補のインデックス一覧を取得する"""
+        if self.use_numpy:
+            return self._indices.tolist()
+        return list(self._indices)
+
+    def index_array(self):
+        """候補のインデックス配列を取得する（numpy使用時のみ）"""
+        return self._indices if self.use_numpy else None
+
+    def numbers(self) -> List[List[int]]:
+        """候補を従来形式（3要素リストのリスト）で取得する"""
+        if self._numbers is None:
+            self._numbers = [numeron_scoring.number_at(i) for i in self.indices()]
+        return self._numbers
+
+    def copy(self) -> 'CandidateSet':
+        """候補集合を複製する"""
+        clone = CandidateSet.__new__(CandidateSet)
+        clone.use_numpy = self.use_numpy
+        clone.observations = list(self.observations)
+        clone.item_results = list(self.item_results)
+        clone.pristine = self.pristine
+        clone._numbers = self._numbers
+        clone._indices = self._indices.copy() if self.use_numpy else list(self._indices)
+        return clone
+
+    def filter(self, guess: Sequence[int], eat: int, bite: int) -> int:
+        """観測結果 (推測, EAT, BITE) で候補を絞り込み、残り候補数を返す"""
+        guess_index = numeron_scoring.index_of(guess)
+        if guess_index is None:
+            # 重複ありの推測はテーブル外なので直接判定する
+            kept = [i for i in self.indices()
+                    if numeron_scoring.calculate_eat_bite(numeron_scoring.ALL_NUMBERS[i], guess) == (eat, bite)]
+            self._set_indices(kept)
+            self.pristine = False
+            return len(self._indices)
+        return self.filter_code(guess_index, numeron_scoring.encode(eat, bite))
+
+    def filter_code(self, guess_index: int, code: int) -> int:
+        """推測インデックスと判定コードで候補を絞り込み、残り候補数を返す"""
+        if self.use_numpy:
+            row = numeron_scoring.table_array()[guess_index]
+            self._indices = self._indices[row[self._indices] == code]
+        else:
+            row = numeron_scoring.row(guess_index)
+            self._indices = [i for i in self._indices if row[i] == code]
+        self.observations.append((guess_index, code))
+        self._numbers = None
+        return len(self._indices)
+
+    def filter_attribute(self, values: bytes, value: int) -> int:
+        """属性（numeron_scoring.HIGH_LOW など）が指定値の候補だけに絞り込み、残り候補数を返す"""
+        if self.use_numpy:
+            array = numeron_scoring.attribute_array(values)
+            self._indices = self._indices[array[self._indices] == value]
+        else:
+            self._indices = [i for i in self._indices if values[i] == value]
+        self.pristine = False
+        self._numbers = None
+        return len(self._indices)
+
+    def apply_item(self, info: Dict[str, Any]) -> int:
+        """アイテム効果の構造化結果（process_item_effect の info）で候補を絞り込み、残り候補数を返す"""
+        item = info.get('item')
+        if item == 'HIGH&LOW':
+            self.item_results.append(info)
+            return self.filter_attribute(numeron_scoring.HIGH_LOW, numeron_scoring.parse_high_low(info['pattern']))
+        if item == 'SLASH':
+            self.item_results.append(info)
+            return self.filter_attribute(numeron_scoring.SLASH, info['slash'])
+        if item in ('TARGET', 'DOUBLE'):
+            # TARGET: 指定数字の桁（含まれない場合はNone）、DOUBLE: 開示された桁の数字
+            position = info['position']
+            self.item_results.append(info)
+            return self.filter_attribute(numeron_scoring.DIGIT_POSITION[info['digit']],
+                                         numeron_scoring.ABSENT if position is None else position)
+        if item in ('SHUFFLE', 'CHANGE'):
+            self.item_results.append(info)
+            return self.expand(item, info.get('position'))
+        return len(self._indices)
+
+    def expand(self, item: str, position: Optional[int] = None) -> int:
+        """相手のSHUFFLE/CHANGE後の番号になり得る候補に広げ、残り候補数を返す
+        
+        - SHUFFLE: 残っている各候補の全ての並べ替え
+        - CHANGE: 残っている各候補の1桁を、HIGH/LOWを保って番号に無い数字と交換したもの
+          （交換した桁 position が分かっていればその桁のみ）
+        それまでの観測のうち変化後も成り立つもの（数字の組・HIGH/LOWなど）は、
+        残っている候補から広げることでそのまま保たれるため、全候補の再計算は不要
+        広げた後は先頭が0の番号も候補に含める（SHUFFLE/CHANGEで先頭が0になることがある）
+        """
+        survivors = self.indices()
+        expanded = set(survivors)
+        if item == 'SHUFFLE':
+            for i in survivors:
+                expanded.update(numeron_scoring.PERMUTATIONS[i])
+        elif item == 'CHANGE':
+            positions = range(numeron_scoring.NUMBER_LENGTH) if position is None else [position]
+            for pos in positions:
+                neighbors = numeron_scoring.CHANGE_NEIGHBORS[pos]
+                for i in survivors:
+                    expanded.update(neighbors[i])
+        else:
+            raise ValueError(f"候補を広げられないアイテムです: {item}")
+        self._set_indices(expanded)
+        self.pristine = False
+        return len(self._indices)
+
+    def _set_indices(self, indices: Iterable[int]):
+        """候補インデックスを置き換える"""
+        if self.use_numpy:
+            self._indices = np.array(sorted(indices), dtype=np.intp)
+        else:
+            self._indices = sorted(indices)
+        self._numbers = None
+
+
+class OpponentKnowledge:
+    """相手プレイヤーが自分の番号について知り得る情報
+    
+    - candidates: 相手のコール結果・アイテム結果と矛盾しない番号（相手にとっての残り候補）
+      SHUFFLE/CHANGEの防御探索（numeron_strategy.defense_scores）で使用する
+    """
+
+    def __init__(self, indices: Optional[Iterable[int]] = None):
+        self.candidates = CandidateSet(indices)
+
+    def observe_call(self, guess: Sequence[int], eat: int, bite: int):
+        """相手のコール結果を反映する"""
+        self.candidates.filter(guess, eat, bite)
+
+    def observe_item(self, info: Dict[str, Any]):
+        """相手が得たアイテム結果（相手のHIGH&LOW等、自分のDOUBLE/SHUFFLE/CHANGE）を反映する
+
+        自分のSHUFFLE/CHANGE後は番号が変わったので、相手の候補を広げる
+        """
+        self.candidates.apply_item(info)
+
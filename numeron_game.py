@@ -30,10 +30,80 @@ Numeron Game with Items
 import random
 import os
 import sys
+import time
 from typing import List, Tuple, Optional, Dict, Any
 from abc import ABC, abstractmethod
 from enum import Enum
 
+import numeron_scoring
+from numeron_candidates import CandidateSet, OpponentKnowledge
+from numeron_strategy import SELECTORS, get_selector, ItemChooser, best_shuffle, best_change
+from numeron_opening import book_move
+
+
+# AIのアイテム使用戦略
+# information: 期待情報量が通常のコールより大きい場合のみ使用 / random: 30%の確率で使用 / none: 使用しない
+ITEM_POLICIES = ("information", "random", "none")
+
+# 名前付きのAI設定（AIPlayerの引数）。推測戦略ごとの設定は ai_profiles() が自動で追加する
+AI_PROFILES: Dict[str, Dict[str, Any]] = {}
+
+
+def register_profile(name: str, **options):
+    """AI設定を登録する（AIPlayer.from_profile やトーナメントで使用できる）"""
+    AI_PROFILES[name] = options
+
+
+def ai_profiles() -> Dict[str, Dict[str, Any]]:
+    """AI設定の一覧
+    
+    登録済みの推測戦略（numeron_strategy.SELECTORS）ごとに、以下の設定を自動で用意する
+    - "<戦略>": 定跡・アイテムあり
+    - "<戦略>-nobook": 定跡なし
+    - "<戦略>-noitems": アイテムを使用しない
+    """
+    profiles: Dict[str, Dict[str, Any]] = {}
+    for strategy in SELECTORS:
+        profiles[strategy] = {'strategy': strategy}
+        profiles[f"{strategy}-nobook"] = {'strategy': strategy, 'opening_book': False}
+        profiles[f"{strategy}-noitems"] = {'strategy': strategy, 'item_policy': 'none'}
+    profiles.update(AI_PROFILES)
+    return profiles
+
+
+def random_number(rng=random) -> List[int]:
+    """ランダムな番号を生成する（最初の桁は1-9）"""
+    digits = list(range(10))
+    rng.shuffle(digits)
+    # 最初の桁が0でないようにする
+    if digits[0] == 0:
+        for i in range(1, 10):
+            if digits[i] != 0:
+                digits[0], digits[i] = digits[i], digits[0]
+                break
+    return digits[:3]
+
+
+def validate_number(number: List[int]) -> Optional[str]:
+    """番号（推測・設定）が正しいかチェックし、誤りがあればエラーメッセージを返す"""
+    if len(number) != 3 or not all(isinstance(d, int) and 0 <= d <= 9 for d in number):
+        return "3桁の数字を入力してください"
+    if len(set(number)) != 3:
+        return "数字の重複は禁止です"
+    return None
+
+
+def parse_number(text: str) -> List[int]:
+    """入力文字列を番号に変換する（誤りがあれば ValueError）"""
+    text = text.strip()
+    if len(text) != 3 or not text.isdigit():
+        raise ValueError("3桁の数字を入力してください")
+    number = [int(d) for d in text]
+    error = validate_number(number)
+    if error:
+        raise ValueError(error)
+    return number
+
 
 class GameMode(Enum):
     """ゲームモード"""
@@ -76,8 +146,9 @@ class Item:
 class Player(ABC):
     """プレイヤークラス（抽象クラス）"""
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, rng: Optional[random.Random] = None):
         self.name = name
+        self.rng = rng or random  # 乱数生成器（シミュレーションではゲームごとにシードを固定）
         self.number: List[int] = []
         self.items: List[Item] = []
         self.call_history: List[Dict[str, Any]] = []
@@ -86,6 +157,8 @@ class Player(ABC):
         self.used_items_this_turn = False
         self.double_call_count = 0  # DOUBLEアイテム使用時の連続コール回数
         self.double_revealed_digit = None  # DOUBLEアイテムで開示された桁
+        self.target_digit: Optional[int] = None  # TARGETアイテムで指定する数字（Noneならランダム）
+        self.opponent_knowledge = OpponentKnowledge()  # 相手が自分の番号について知り得る情報
     
     def set_number(self, number: List[int]):
         """番号を設定する"""
@@ -95,15 +168,7 @@ class Player(ABC):
     
     def generate_random_number(self) -> List[int]:
         """ランダムな番号を生成する"""
-        digits = list(range(10))
-        random.shuffle(digits)
-        # 最初の桁が0でないようにする
-        if digits[0] == 0:
-            for i in range(1, 10):
-                if digits[i] != 0:
-                    digits[0], digits[i] = digits[i], digits[0]
-                    break
-        return digits[:3]
+        return random_number(self.rng)
     
     def add_call_to_history(self, guess: List[int], eat: int, bite: int, item_used: str = None):
         """コール履歴に追加する"""
@@ -143,8 +208,8 @@ class Player(ABC):
 class HumanPlayer(Player):
     """人間プレイヤークラス"""
     
-    def __init__(self, name: str):
-        super().__init__(name)
+    def __init__(self, name: str, rng: Optional[random.Random] = None):
+        super().__init__(name, rng=rng)
         self.initialize_items()
     
     def initialize_items(self):
@@ -162,18 +227,11 @@ class HumanPlayer(Player):
         """推測を行う"""
         while True:
             try:
-                guess_input = input(f"{self.name}の推測（3桁の数字）: ").strip()
-                if len(guess_input) != 3 or not guess_input.isdigit():
-                    print("3桁の数字を入力してください")
-                    continue
-                
-                guess = [int(d) for d in guess_input]
-                if len(set(guess)) != 3:
-                    print("数字の重複は禁止です")
-                    continue
-                
-                return guess
-            except (ValueError, KeyboardInterrupt):
+                return parse_number(input(f"{self.name}の推測（3桁の数字）: "))
+            except ValueError as e:
+                print(e)
+                continue
+            except KeyboardInterrupt:
                 print("正しい形式で入力してください")
                 continue
     
@@ -211,12 +269,34 @@ class HumanPlayer(Player):
 class AIPlayer(Player):
     """AIプレイヤークラス"""
     
-    def __init__(self, name: str = "AI"):
-        super().__init__(name)
+    def __init__(self, name: str = "AI", strategy: str = "entropy", time_budget: Optional[float] = None,
+                 opening_book: bool = True, item_policy: str = "information",
+                 rng: Optional[random.Random] = None, fallback_strategy: Optional[str] = None):
+        super().__init__(name, rng=rng)
         self.initialize_items()
-        self.possible_numbers = []
+        self.strategy = strategy
+        self.time_budget = time_budget
+        self.opening_book = opening_book  # 定跡（1手目・2手目）を使用するか
+        self.guess_selector = get_selector(strategy, time_budget=time_budget, rng=self.rng)
+        # 時間切れになった場合、以降の推測で使う軽い戦略
+        if fallback_strategy is not None and fallback_strategy not in SELECTORS:
+            raise ValueError(f"不明な推測戦略です: {fallback_strategy}")
+        self.fallback_strategy = fallback_strategy
+        if item_policy not in ITEM_POLICIES:
+            raise ValueError(f"不明なアイテム戦略です: {item_policy}")
+        self.item_policy = item_policy
+        self.item_chooser = ItemChooser()
+        self.candidates = CandidateSet()
         self.generate_all_possible_numbers()
     
+    @classmethod
+    def from_profile(cls, profile: str, name: str = "AI", **options) -> 'AIPlayer':
+        """AI設定の名前（ai_profiles() のキー）からAIプレイヤーを作成する（options は設定を上書き）"""
+        profiles = ai_profiles()
+        if profile not in profiles:
+            raise ValueError(f"不明なAI設定です: {profile}")
+        return cls(name, **{**profiles[profile], **options})
+    
     def initialize_items(self):
         """アイテムを初期化する"""
         self.items = [
@@ -228,28 +308,38 @@ class AIPlayer(Player):
             Item("CHANGE", ItemType.DEFENSE, "桃", "自分の番号の1桁を手持ちカードと交換可能。")
         ]
     
+    @property
+    def possible_numbers(self) -> List[List[int]]:
+        """可能な番号の一覧（候補集合の従来形式ビュー）"""
+        return self.candidates.numbers()
+    
+    @possible_numbers.setter
+    def possible_numbers(self, numbers: List[List[int]]):
+        self.candidates = CandidateSet.from_numbers(numbers)
+    
     def generate_all_possible_numbers(self):
-        """全ての可能な番号を生成する"""
-        self.possible_numbers = []
-        for i in range(1, 10):  # 最初の桁は1-9
-            for j in range(10):
-                if j != i:
-                    for k in range(10):
-                        if k != i and k != j:
-                            self.possible_numbers.append([i, j, k])
+        """全ての可能な番号を生成する（最初の桁は1-9）"""
+        self.candidates = CandidateSet()
     
     def make_guess(self, opponent: 'Player') -> List[int]:
         """推測を行う（AI戦略）"""
-        if not self.possible_numbers:
+        if not len(self.candidates):
             # フォールバック: ランダムな推測
             return self.generate_random_number()
         
         # 自分の番号を除外して推測
-        filtered_numbers = [num for num in self.possible_numbers if num != self.number]
-        if filtered_numbers:
-            return random.choice(filtered_numbers)
-        else:
-            return random.choice(self.possible_numbers)
+        own_index = numeron_scoring.index_of(self.number) if self.number else None
+        if self.opening_book:
+            move = book_move(self.strategy, self.candidates)
+            if move is not None and move != own_index:
+                return numeron_scoring.number_at(move)
+        guess_index = self.guess_selector.select(self.candidates, exclude=own_index)
+        if (self.guess_selector.last_timed_out and self.fallback_strategy
+                and self.fallback_strategy != self.strategy):
+            # 今回は時間切れまでの最良の推測を使い、次から軽い戦略に切り替える
+            self.strategy = self.fallback_strategy
+            self.guess_selector = get_selector(self.strategy, time_budget=self.time_budget, rng=self.rng)
+        return numeron_scoring.number_at(guess_index)
     
     def choose_item(self, opponent: 'Player') -> Optional[Item]:
         """アイテムを選択する（AI戦略）"""
@@ -260,120 +350,114 @@ class AIPlayer(Player):
         if not available_items:
             return None
         
-        # 簡単なAI戦略: ランダムにアイテムを選択
-        if random.random() < 0.3:  # 30%の確率でアイテムを使用
-            return random.choice(available_items)
+        if self.item_policy == "random":
+            # 簡単なAI戦略: ランダムにアイテムを選択
+            if self.rng.random() < 0.3:  # 30%の確率でアイテムを使用
+                return self.rng.choice(available_items)
+            return None
+        
+        if self.item_policy == "information":
+            # 期待情報量が通常のコールより大きい場合のみアイテムを使用
+            choice = self.item_chooser.choose(self.candidates, [item.name for item in available_items],
+                                              opponent_knowledge=self.opponent_knowledge, number=self.number)
+            if choice is not None:
+                name, self.target_digit = choice
+                return next(item for item in available_items if item.name == name)
         
         return None
     
     def update_possible_numbers(self, guess: List[int], eat: int, bite: int):
         """可能な番号を更新する"""
-        new_possible = []
-        for number in self.possible_numbers:
-            if self.calculate_eat_bite(number, guess) == (eat, bite):
-                new_possible.append(number)
-        self.possible_numbers = new_possible
+        self.candidates.filter(guess, eat, bite)
+    
+    def apply_item_result(self, info: Dict[str, Any]):
+        """アイテム効果の構造化結果で可能な番号を絞り込む（相手のSHUFFLE/CHANGEでは広げる）"""
+        self.candidates.apply_item(info)
     
     def calculate_eat_bite(self, answer: List[int], guess: List[int]) -> Tuple[int, int]:
         """EATとBITEを計算する"""
-        eat = sum(a == g for a, g in zip(answer, guess))
-        bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
-        return eat, bite
+        return numeron_scoring.calculate_eat_bite(answer, guess)
 
 
 class NumeronGame:
     """数字当てゲームクラス"""
     
-    def __init__(self, mode: GameMode):
+    def __init__(self, mode: GameMode, rng: Optional[random.Random] = None):
         self.mode = mode
+        self.rng = rng or random  # 乱数生成器（プレイヤーにも引き継ぐ）
         self.player1: Player = None
         self.player2: Player = None
         self.current_player: Player = None
         self.turn_count = 0
         self.game_ended = False
         self.winner: Player = None
+        self.turn_item: Optional[str] = None  # 現在のターンで使用したアイテム
     
     def initialize_players(self):
         """プレイヤーを初期化する"""
         if self.mode == GameMode.SINGLE_PLAYER:
-            self.player1 = HumanPlayer("プレイヤー")
-            self.player2 = AIPlayer("AI")
+            self.player1 = HumanPlayer("プレイヤー", rng=self.rng)
+            self.player2 = AIPlayer("AI", rng=self.rng)
         else:
-            self.player1 = HumanPlayer("プレイヤー1")
-            self.player2 = HumanPlayer("プレイヤー2")
+            self.player1 = HumanPlayer("プレイヤー1", rng=self.rng)
+            self.player2 = HumanPlayer("プレイヤー2", rng=self.rng)
         
         self.current_player = self.player1
     
     def setup_numbers(self):
-        """番号を設定する"""
+        """番号を設定する（コンソール入力）"""
         print("\n=== 番号設定 ===")
         
         if self.mode == GameMode.SINGLE_PLAYER:
-            # プレイヤーの番号設定
-            while True:
-                try:
-                    player_input = input("プレイヤーの番号（3桁の数字）: ").strip()
-                    if len(player_input) != 3 or not player_input.isdigit():
-                        print("3桁の数字を入力してください")
-                        continue
-                    
-                    player_number = [int(d) for d in player_input]
-                    if len(set(player_number)) != 3:
-                        print("数字の重複は禁止です")
-                        continue
-                    
-                    self.player1.set_number(player_number)
-                    break
-                except (ValueError, KeyboardInterrupt):
-                    print("正しい形式で入力してください")
-                    continue
-            
-            # AIの番号は自動生成
-            self.player2.set_number(self.player2.generate_random_number())
+            # プレイヤーの番号設定、AIの番号は自動生成
+            self.start(self.input_number("プレイヤーの番号（3桁の数字）: "))
             print("AIの番号が設定されました")
         
         else:
             # 2人用の場合
-            for i, player in enumerate([self.player1, self.player2], 1):
+            numbers = []
+            for i in (1, 2):
                 print(f"\nプレイヤー{i}の番号設定（他のプレイヤーには見えません）")
-                while True:
-                    try:
-                        player_input = input(f"プレイヤー{i}の番号（3桁の数字）: ").strip()
-                        if len(player_input) != 3 or not player_input.isdigit():
-                            print("3桁の数字を入力してください")
-                            continue
-                        
-                        player_number = [int(d) for d in player_input]
-                        if len(set(player_number)) != 3:
-                            print("数字の重複は禁止です")
-                            continue
-                        
-                        player.set_number(player_number)
-                        break
-                    except (ValueError, KeyboardInterrupt):
-                        print("正しい形式で入力してください")
-                        continue
-                
+                numbers.append(self.input_number(f"プレイヤー{i}の番号（3桁の数字）: "))
                 # 画面をクリア（番号を隠すため）
                 os.system('clear' if os.name == 'posix' else 'cls')
+            self.start(*numbers)
+    
+    def input_number(self, prompt: str) -> List[int]:
+        """番号をコンソールから入力する"""
+        while True:
+            try:
+                return parse_number(input(prompt))
+            except ValueError as e:
+                print(e)
+            except KeyboardInterrupt:
+                print("正しい形式で入力してください")
     
     def calculate_eat_bite(self, answer: List[int], guess: List[int]) -> Tuple[int, int]:
         """EATとBITEを計算する"""
-        eat = sum(a == g for a, g in zip(answer, guess))
-        bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
-        return eat, bite
+        return numeron_scoring.calculate_eat_bite(answer, guess)
     
-    def process_item_effect(self, player: Player, item: Item, opponent: Player) -> Dict[str, Any]:
-        """アイテム効果を処理する"""
-        result = {'effect': '', 'game_ended': False}
+    def process_item_effect(self, player: Player, item: Item, opponent: Player,
+                            target_digit: Optional[int] = None) -> Dict[str, Any]:
+        """アイテム効果を処理する
+        
+        result['info'] には判明した情報を構造化して格納する（AIの候補絞り込み用）
+        - DOUBLE: {'item', 'position', 'digit'}（使用したプレイヤー自身の番号の開示）
+        - HIGH&LOW: {'item', 'pattern'}（例: "HLH"）
+        - TARGET: {'item', 'digit', 'position'}（含まれない場合 position は None）
+        - SLASH: {'item', 'slash'}
+        - CHANGE: {'item', 'position', 'high'}（交換した桁と、その桁のHIGH/LOW）
+        """
+        result = {'effect': '', 'game_ended': False, 'info': {'item': item.name}}
         
         if item.name == "DOUBLE":
             result['effect'] = "DOUBLEアイテムを使用しました。2回連続でコールできます。"
             player.double_call_count = 2
             # 1桁を開示
-            reveal_pos = random.randint(0, 2)
+            reveal_pos = player.rng.randint(0, 2)
             player.double_revealed_digit = reveal_pos
             result['effect'] += f"\n{player.name}の{reveal_pos + 1}桁目が開示されました: {player.number[reveal_pos]}"
+            result['info'].update(position=reveal_pos, digit=player.number[reveal_pos])
         
         elif item.name == "HIGH&LOW":
             high_low_info = []
@@ -383,49 +467,199 @@ class NumeronGame:
                 else:
                     high_low_info.append(f"{i+1}桁目: LOW({digit})")
             result['effect'] = f"HIGH&LOWアイテムを使用しました。\n" + "\n".join(high_low_info)
+            pattern = numeron_scoring.high_low_pattern(opponent.number)
+            result['info']['pattern'] = numeron_scoring.format_high_low(pattern)
         
         elif item.name == "TARGET":
-            # ランダムな数字を選択
-            target_digit = random.randint(0, 9)
+            # 数字の指定が無ければランダムな数字を選択
+            if target_digit is None:
+                target_digit = player.rng.randint(0, 9)
             if target_digit in opponent.number:
                 pos = opponent.number.index(target_digit)
                 result['effect'] = f"TARGETアイテムを使用しました。\n数字{target_digit}は{pos+1}桁目にあります。"
             else:
+                pos = None
                 result['effect'] = f"TARGETアイテムを使用しました。\n数字{target_digit}は含まれていません。"
+            result['info'].update(digit=target_digit, position=pos)
         
         elif item.name == "SLASH":
             max_digit = max(opponent.number)
             min_digit = min(opponent.number)
             slash_number = max_digit - min_digit
             result['effect'] = f"SLASHアイテムを使用しました。\nスラッシュナンバー: {slash_number}"
+            result['info']['slash'] = slash_number
         
         elif item.name == "SHUFFLE":
+            # 相手が広げた候補の中で、相手の次のコールの後も見つけにくい並べ替えを選ぶ
             old_number = player.number.copy()
-            random.shuffle(player.number)
+            player.number = best_shuffle(player.opponent_knowledge, player.number, rng=player.rng)
             result['effect'] = f"SHUFFLEアイテムを使用しました。\n番号を並べ替えました: {old_number} → {player.number}"
         
         elif item.name == "CHANGE":
-            # 簡単な実装: ランダムに1桁を変更
-            pos = random.randint(0, 2)
-            old_digit = player.number[pos]
-            # 使用可能な数字から選択（重複を避ける）
-            available_digits = [d for d in range(10) if d not in player.number]
-            if available_digits:
-                new_digit = random.choice(available_digits)
-                # 一時的に数字を変更
-                temp_number = player.number.copy()
-                temp_number[pos] = new_digit
-                # 重複チェック
-                if len(set(temp_number)) == 3:
-                    player.number[pos] = new_digit
-                    result['effect'] = f"CHANGEアイテムを使用しました。\n{pos+1}桁目を{old_digit}から{new_digit}に変更しました。"
-                else:
-                    result['effect'] = "CHANGEアイテムを使用しましたが、変更により重複が発生するため変更できませんでした。"
+            # HIGH/LOWを保持したまま、相手が広げた候補の中で、相手の次のコールの後も見つけにくい交換を選ぶ
+            change = best_change(player.opponent_knowledge, player.number, rng=player.rng)
+            if change is not None:
+                pos, new_digit = change
+                old_digit = player.number[pos]
+                player.number[pos] = new_digit
+                result['effect'] = f"CHANGEアイテムを使用しました。\n{pos+1}桁目を{old_digit}から{new_digit}に変更しました。"
+                result['info'].update(position=pos, high=new_digit >= numeron_scoring.HIGH_THRESHOLD)
             else:
                 result['effect'] = "CHANGEアイテムを使用しましたが、変更可能な数字がありませんでした。"
         
         return result
     
+    def share_item_info(self, player: Player, opponent: Player, result: Dict[str, Any]):
+        """アイテム効果で判明した情報をAIの候補に反映する"""
+        info = result.get('info', {})
+        if info.get('item') in ("DOUBLE", "SHUFFLE", "CHANGE"):
+            # DOUBLEは使用者の番号の1桁が開示され、SHUFFLE/CHANGEは使用者の番号が変わる
+            player.opponent_knowledge.observe_item(info)
+            if isinstance(opponent, AIPlayer):
+                opponent.apply_item_result(info)
+        else:
+            opponent.opponent_knowledge.observe_item(info)
+            if isinstance(player, AIPlayer):
+                player.apply_item_result(info)
+    
+    # ----------------------------------------
+    # 入出力なしでゲームを進めるAPI（CLI・Web・シミュレーションで共通）
+    # ----------------------------------------
+    def start(self, player1_number: Optional[List[int]] = None, player2_number: Optional[List[int]] = None):
+        """番号を設定してゲームを開始する（番号を省略したプレイヤーはランダムに設定）"""
+        if self.player1 is None or self.player2 is None:
+            self.initialize_players()
+        for player, number in ((self.player1, player1_number), (self.player2, player2_number)):
+            player.set_number(number if number is not None else player.generate_random_number())
+        self.current_player = self.player1
+        self.turn_count = 0
+        self.game_ended = False
+        self.winner = None
+        self.turn_item = None
+    
+    def check_can_act(self) -> Optional[str]:
+        """現在のプレイヤーが操作できるかチェックし、できなければエラーメッセージを返す"""
+        if self.current_player is None or not self.current_player.number:
+            return "ゲームが開始されていません"
+        if self.game_ended:
+            return "ゲームは終了しています"
+        return None
+    
+    def use_item(self, item_name: str, target_digit: Optional[int] = None) -> Dict[str, Any]:
+        """現在のプレイヤーがアイテムを使用する"""
+        error = self.check_can_act()
+        player = self.current_player
+        if error is None and player.double_call_count == 1:
+            error = "DOUBLEの2回目のコール時はアイテムを使用できません"
+        if error is None and not player.can_use_item():
+            error = "このターンでは既にアイテムを使用しました"
+        item = next((i for i in player.items if i.name == item_name), None) if error is None else None
+        if error is None and (item is None or item.used):
+            error = "アイテムが見つからないか、既に使用済みです"
+        if error:
+            return {'ok': False, 'error': error}
+        
+        opponent = self.get_opponent()
+        item.use()
+        player.used_items_this_turn = True
+        self.turn_item = item.name
+        result = self.process_item_effect(player, item, opponent, target_digit=target_digit)
+        self.share_item_info(player, opponent, result)
+        return {
+            'ok': True,
+            'player': player.name,
+            'item': item.name,
+            'effect': result['effect'],
+            'info': result['info'],
+        }
+    
+    def submit_guess(self, guess: List[int]) -> Dict[str, Any]:
+        """現在のプレイヤーがコールする"""
+        error = self.check_can_act() or validate_number(guess)
+        if error:
+            return {'ok': False, 'error': error}
+        
+        player = self.current_player
+        opponent = self.get_opponent()
+        if player.double_call_count > 0:
+            # DOUBLEアイテム使用中
+            player.double_call_count -= 1
+        eat, bite = self.calculate_eat_bite(opponent.number, guess)
+        
+        # 履歴に追加
+        player.add_call_to_history(guess, eat, bite, self.turn_item)
+        player.update_memo_cards(guess)
+        opponent.opponent_knowledge.observe_call(guess, eat, bite)
+        result = {
+            'ok': True,
+            'player': player.name,
+            'guess': list(guess),
+            'eat': eat,
+            'bite': bite,
+            'item_used': self.turn_item,
+            'game_ended': False,
+            'winner': None,
+        }
+        
+        # 勝利判定
+        if eat == 3:
+            self.game_ended = True
+            self.winner = player
+            result.update(game_ended=True, winner=player.name, next_player=None)
+            return result
+        
+        # AIの場合は可能な番号を更新
+        if isinstance(player, AIPlayer):
+            player.update_possible_numbers(guess, eat, bite)
+        
+        # DOUBLEの2回目が残っていれば同じプレイヤーが続けてコールする
+        result['double_remaining'] = player.double_call_count
+        if player.double_call_count == 0:
+            # ターン終了処理
+            player.reset_turn()
+            self.current_player = opponent
+            self.turn_count += 1
+            self.turn_item = None
+        result['next_player'] = self.current_player.name
+        return result
+    
+    def give_up(self) -> Dict[str, Any]:
+        """現在のプレイヤーがギブアップする"""
+        error = self.check_can_act()
+        if error:
+            return {'ok': False, 'error': error}
+        player = self.current_player
+        opponent = self.get_opponent()
+        self.game_ended = True
+        self.winner = opponent
+        return {'ok': True, 'player': player.name, 'winner': opponent.name, 'answer': list(opponent.number)}
+    
+    def play_ai_turn(self) -> List[Dict[str, Any]]:
+        """現在のプレイヤーがAIなら、アイテム使用とコールを行ってターンを終える
+        
+        結果の一覧を返す（コールの結果には思考時間 think_time を追加する）
+        """
+        player = self.current_player
+        events: List[Dict[str, Any]] = []
+        if not isinstance(player, AIPlayer):
+            return events
+        opponent = self.get_opponent()
+        while not self.game_ended and self.current_player is player:
+            started = time.perf_counter()
+            if player.can_use_item() and player.double_call_count != 1:
+                item = player.choose_item(opponent)
+                if item is not None:
+                    events.append(self.use_item(item.name, target_digit=player.target_digit))
+                    player.target_digit = None
+            guess = player.make_guess(opponent)
+            think_time = time.perf_counter() - started  # アイテム選択と推測にかかった時間（秒）
+            result = self.submit_guess(guess)
+            result['think_time'] = think_time
+            events.append(result)
+            if not result['ok']:
+                break
+        return events
+    
     def display_game_state(self):
         """ゲーム状態を表示する"""
         print("\n" + "="*60)
@@ -493,54 +727,42 @@ class NumeronGame:
                 print(f"  {item}")
     
     def play_turn(self):
-        """1ターンを実行する"""
+        """1ターンを実行する（コンソール入出力）"""
         self.display_game_state()
+        player = self.current_player
+        opponent = self.get_opponent()
         
-        # アイテム使用の確認
-        item = self.current_player.choose_item(self.get_opponent())
+        # アイテム使用の確認（DOUBLEの2回目のコール時は使用不可）
+        item = player.choose_item(opponent) if player.double_call_count != 1 else None
         if item:
-            item.use()
-            self.current_player.used_items_this_turn = True
-            result = self.process_item_effect(self.current_player, item, self.get_opponent())
-            print(f"\n{item.name}アイテムの効果:")
-            print(result['effect'])
+            result = self.use_item(item.name, target_digit=player.target_digit)
+            player.target_digit = None
+            if result['ok']:
+                print(f"\n{item.name}アイテムの効果:")
+                print(result['effect'])
+            else:
+                print(result['error'])
             input("Enterキーを押して続行...")
         
         # コール処理
-        if self.current_player.double_call_count > 0:
-            # DOUBLEアイテム使用中
-            self.current_player.double_call_count -= 1
-            print(f"\n{self.current_player.name}のコール（DOUBLE残り{self.current_player.double_call_count}回）:")
+        if player.double_call_count > 0:
+            print(f"\n{player.name}のコール（DOUBLE残り{player.double_call_count - 1}回）:")
         else:
-            print(f"\n{self.current_player.name}のコール:")
-        
-        guess = self.current_player.make_guess(self.get_opponent())
-        opponent = self.get_opponent()
-        eat, bite = self.calculate_eat_bite(opponent.number, guess)
+            print(f"\n{player.name}のコール:")
         
-        # 履歴に追加
-        item_used = item.name if item else None
-        self.current_player.add_call_to_history(guess, eat, bite, item_used)
-        self.current_player.update_memo_cards(guess)
+        while True:
+            result = self.submit_guess(player.make_guess(opponent))
+            if result['ok']:
+                break
+            print(result['error'])
         
-        print(f"推測: {guess} → {eat}EAT {bite}BITE")
+        print(f"推測: {result['guess']} → {result['eat']}EAT {result['bite']}BITE")
         
         # 勝利判定
-        if eat == 3:
-            self.game_ended = True
-            self.winner = self.current_player
-            print(f"\n🎉 {self.current_player.name}の勝利！")
+        if result['game_ended']:
+            print(f"\n🎉 {player.name}の勝利！")
             return
         
-        # AIの場合は可能な番号を更新
-        if isinstance(self.current_player, AIPlayer):
-            self.current_player.update_possible_numbers(guess, eat, bite)
-        
-        # ターン終了処理
-        self.current_player.reset_turn()
-        self.current_player = self.get_opponent()
-        self.turn_count += 1
-        
         input("Enterキーを押して続行...")
     
     def get_opponent(self) -> Player:
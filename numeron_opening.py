@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+AI定跡（オープニングブック）
+Opening book for the first two AI guesses
+
+【概要】
+- 1手目（全648候補に対する推測）と、1手目の各EAT/BITE結果に対する2手目を戦略ごとに保存する
+- 定跡ファイル（opening_book.json）はAIPlayerの初回使用時に1度だけ読み込む
+- 定跡ファイルの再生成:
+    python3 numeron_opening.py [--output opening_book.json] [--strategy entropy ...]
+"""
+
+import argparse
+import json
+import os
+from typing import List, Optional, Dict, Any
+
+import numeron_scoring
+from numeron_candidates import CandidateSet
+from numeron_strategy import get_selector, partition_counts
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.json')
+BOOK_VERSION = 1
+BOOK_STRATEGIES = ['entropy', 'minimax', 'expected']
+
+_BOOK: Optional[Dict[str, Any]] = None
+
+
+def format_code(code: int) -> str:
+    """判定コードを定跡ファイルのキー（例: "1-2"）に変換する"""
+    eat, bite = numeron_scoring.decode(code)
+    return f"{eat}-{bite}"
+
+
+def format_number(index: int) -> str:
+    """インデックスを番号文字列（例: "123"）に変換する"""
+    return ''.join(map(str, numeron_scoring.number_at(index)))
+
+
+def parse_number(number: str) -> int:
+    """番号文字列をインデックスに変換する"""
+    return numeron_scoring.index_of([int(d) for d in number])
+
+
+def generate_strategy_book(strategy: str) -> Dict[str, Any]:
+    """1つの戦略について1手目と2手目の定跡を生成する"""
+    selector = get_selector(strategy)
+    universe = CandidateSet()
+    first = selector.select(universe)
+    replies = {}
+    counts = partition_counts(first, universe.indices())
+    for code, count in enumerate(counts):
+        if count == 0 or code == numeron_scoring.WIN_CODE:
+            continue
+        candidates = universe.copy()
+        candidates.filter_code(first, code)
+        replies[format_code(code)] = format_number(selector.select(candidates))
+    return {'first': format_number(first), 'replies': replies}
+
+
+def generate_book(strategies: Optional[List[str]] = None) -> Dict[str, Any]:
+    """定跡を生成する"""
+    strategies = strategies or BOOK_STRATEGIES
+    return {
+        'version': BOOK_VERSION,
+        'strategies': {strategy: generate_strategy_book(strategy) for strategy in strategies},
+    }
+
+
+def save_book(book: Dict[str, Any], path: str = BOOK_PATH):
+    """定跡ファイルを保存する"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(book, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def load_book(path: str = BOOK_PATH) -> Dict[str, Any]:
+    """定跡ファイルを読み込む（2回目以降はキャッシュを返す、ファイルが無ければ空の定跡）"""
+    global _BOOK
+    if _BOOK is None:
+        try:
+            with open(path, encoding='utf-8') as f:
+                book = json.load(f)
+        except (OSError, ValueError):
+            book = {}
+        if book.get('version') != BOOK_VERSION:
+            book = {'version': BOOK_VERSION, 'strategies': {}}
+        _BOOK = book
+    return _BOOK
+
+
+def book_move(strategy: str, candidates: CandidateSet) -> Optional[int]:
+    """候補集合の観測履歴に対する定跡の推測インデックスを取得する（定跡外ならNone）"""
+    observations = candidates.observations
+    if not candidates.pristine or len(observations) > 1:
+        return None
+    entry = load_book()['strategies'].get(strategy)
+    if entry is None:
+        return None
+    first = parse_number(entry['first'])
+    if not observations:
+        return first
+    guess_index, code = observations[0]
+    if guess_index != first:
+        return None
+    reply = entry['replies'].get(format_code(code))
+    return parse_number(reply) if reply else None
+
+
+def main():
+    """定跡ファイルを再生成する"""
+    parser = argparse.ArgumentParser(description="AI定跡ファイルを生成する")
+    parser.add_argument('--output', default=BOOK_PATH, help="出力ファイル")
+    parser.add_argument('--strategy', action='append', choices=BOOK_STRATEGIES,
+                        help="生成する戦略（複数指定可、省略時は全て）")
+    args = parser.parse_args()
+
+    book = generate_book(args.strategy)
+    save_book(book, args.output)
+    for strategy, entry in book['strategies'].items():
+        print(f"{strategy}: 1手目 {entry['first']}、2手目 {len(entry['replies'])}通り")
+    print(f"定跡ファイルを保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+EAT/BITE判定テーブル
+Precomputed EAT/BITE scoring table
+
+【概要】
+- 重複なし3桁の番号（0〜9から3枚、全720通り）に0〜719のインデックスを割り当てる
+- 全ての (答え, 推測) の組み合わせについて EAT/BITE を事前計算し、720×720 のテーブルに保持する
+- 判定結果は1バイトのコード（EAT * 4 + BITE）に詰めて格納する
+- ゲーム本体・AI・Webバックエンドは全てこのモジュールで判定する
+- アイテム効果（HIGH&LOW, SLASH, TARGET/DOUBLE の桁）で判明する属性もインデックスごとに保持する
+"""
+
+from itertools import permutations
+from typing import List, Tuple, Optional, Sequence, Dict
+
+try:
+    import numpy as np
+except ImportError:  # numpy未インストール時は純Python実装のみ使用する
+    np = None
+
+NUMBER_LENGTH = 3
+DIGIT_COUNT = 10
+
+# 判定コード（EAT * 4 + BITE）の種類数と、3EAT（正解）のコード
+CODE_COUNT = 16
+WIN_CODE = 3 * 4 + 0
+
+# 全ての重複なし3桁番号（先頭0を含む）とそのインデックス
+ALL_NUMBERS: List[Tuple[int, ...]] = list(permutations(range(DIGIT_COUNT), NUMBER_LENGTH))
+NUMBER_COUNT = len(ALL_NUMBERS)
+INDEX: Dict[Tuple[int, ...], int] = {number: i for i, number in enumerate(ALL_NUMBERS)}
+
+# AIが相手の番号として考える候補（先頭が0でない648通り）
+UNIVERSE: List[int] = [i for i, number in enumerate(ALL_NUMBERS) if number[0] != 0]
+
+# コード → (EAT, BITE)
+DECODED: List[Tuple[int, int]] = [divmod(code, 4) for code in range(CODE_COUNT)]
+
+# アイテム効果で判明する属性（インデックスごとに1バイト）
+# HIGH_LOW: 各桁がHIGH(5-9)なら1とした3ビットのパターン（1桁目が最上位ビット）
+# SLASH: スラッシュナンバー（最大数-最小数）
+# DIGIT_POSITION[d]: 数字dの桁（0〜2、含まれない場合はABSENT）
+# DIGIT_AT[pos]: pos桁目の数字
+HIGH_THRESHOLD = 5
+ABSENT = NUMBER_LENGTH
+HIGH_LOW: bytes = bytes(sum((d >= HIGH_THRESHOLD) << (NUMBER_LENGTH - 1 - pos) for pos, d in enumerate(number))
+                        for number in ALL_NUMBERS)
+SLASH: bytes = bytes(max(number) - min(number) for number in ALL_NUMBERS)
+DIGIT_POSITION: List[bytes] = [bytes(number.index(d) if d in number else ABSENT for number in ALL_NUMBERS)
+                               for d in range(DIGIT_COUNT)]
+DIGIT_AT: List[bytes] = [bytes(number[pos] for number in ALL_NUMBERS) for pos in range(NUMBER_LENGTH)]
+
+# SHUFFLE/CHANGE後の候補の広がり
+# PERMUTATIONS[i]: 番号iの並べ替え（i自身を含む6通り）のインデックス
+# CHANGE_NEIGHBORS[pos][i]: 番号iのpos桁目を、HIGH/LOWを保ったまま番号に無い数字と交換した番号のインデックス
+PERMUTATIONS: List[List[int]] = [[INDEX[p] for p in permutations(number)] for number in ALL_NUMBERS]
+CHANGE_NEIGHBORS: List[List[List[int]]] = [
+    [[INDEX[number[:pos] + (d,) + number[pos + 1:]] for d in range(DIGIT_COUNT)
+      if d not in number and (d >= HIGH_THRESHOLD) == (number[pos] >= HIGH_THRESHOLD)]
+     for number in ALL_NUMBERS]
+    for pos in range(NUMBER_LENGTH)]
+IN_UNIVERSE: bytes = bytes(number[0] != 0 for number in ALL_NUMBERS)
+
+_TABLE: Optional[bytes] = None
+_TABLE_ARRAY = None
+_ATTRIBUTE_ARRAYS: Dict[bytes, object] = {}
+
+
+def encode(eat: int, bite: int) -> int:
+    """EAT/BITEを判定コードに変換する"""
+    return eat * 4 + bite
+
+
+def decode(code: int) -> Tuple[int, int]:
+    """判定コードをEAT/BITEに変換する"""
+    return DECODED[code]
+
+
+def index_of(number: Sequence[int]) -> Optional[int]:
+    """番号のインデックスを取得する（重複ありなど範囲外の番号はNone）"""
+    return INDEX.get(tuple(number))
+
+
+def number_at(index: int) -> List[int]:
+    """インデックスから番号を取得する"""
+    return list(ALL_NUMBERS[index])
+
+
+def _build_table() -> bytes:
+    """720×720の判定テーブルを構築する"""
+    masks = [(1 << a) | (1 << b) | (1 << c) for a, b, c in ALL_NUMBERS]
+    popcount = [bin(m).count("1") for m in range(1 << DIGIT_COUNT)]
+    table = bytearray(NUMBER_COUNT * NUMBER_COUNT)
+    offset = 0
+    for (a0, a1, a2), answer_mask in zip(ALL_NUMBERS, masks):
+        for (g0, g1, g2), guess_mask in zip(ALL_NUMBERS, masks):
+            eat = (a0 == g0) + (a1 == g1) + (a2 == g2)
+            table[offset] = eat * 3 + popcount[answer_mask & guess_mask]
+            offset += 1
+    # eat * 4 + (common - eat) == eat * 3 + common
+    return bytes(table)
+
+
+def table() -> bytes:
+    """判定テーブルを取得する（初回呼び出し時に構築）"""
+    global _TABLE
+    if _TABLE is None:
+        _TABLE = _build_table()
+    return _TABLE
+
+
+def table_array():
+    """判定テーブルをnumpy配列（720×720, uint8）として取得する（numpy未インストール時はNone）"""
+    global _TABLE_ARRAY
+    if np is None:
+        return None
+    if _TABLE_ARRAY is None:
+        _TABLE_ARRAY = np.frombuffer(table(), dtype=np.uint8).reshape(NUMBER_COUNT, NUMBER_COUNT)
+    return _TABLE_ARRAY
+
+
+def high_low_pattern(number: Sequence[int]) -> int:
+    """番号のHIGH/LOWパターンを取得する"""
+    return sum((d >= HIGH_THRESHOLD) << (NUMBER_LENGTH - 1 - pos) for pos, d in enumerate(number))
+
+
+def format_high_low(pattern: int) -> str:
+    """HIGH/LOWパターンを文字列（例: "HLH"）に変換する"""
+    return ''.join('H' if pattern >> (NUMBER_LENGTH - 1 - pos) & 1 else 'L' for pos in range(NUMBER_LENGTH))
+
+
+def parse_high_low(text: str) -> int:
+    """HIGH/LOW文字列（例: "HLH"）をパターンに変換する"""
+    return sum((c == 'H') << (NUMBER_LENGTH - 1 - pos) for pos, c in enumerate(text))
+
+
+def attribute_array(values: bytes):
+    """属性（HIGH_LOW など）をnumpy配列として取得する（numpy未インストール時はNone）"""
+    if np is None:
+        return None
+    array = _ATTRIBUTE_ARRAYS.get(values)
+    if array is None:
+        array = _ATTRIBUTE_ARRAYS[values] = np.frombuffer(values, dtype=np.uint8)
+    return array
+
+
+def row(guess_index: int) -> bytes:
+    """指定した推測に対する全720通りの答えの判定コード列を取得する"""
+    start = guess_index * NUMBER_COUNT
+    return table()[start:start + NUMBER_COUNT]
+
+
+def score(answer_index: int, guess_index: int) -> int:
+    """インデックス同士の判定コードを取得する"""
+    return (_TABLE or table())[answer_index * NUMBER_COUNT + guess_index]
+
+
+def calculate_eat_bite(answer: Sequence[int], guess: Sequence[int]) -> Tuple[int, int]:
+    """EATとBITEを計算する"""
+    answer_index = INDEX.get(tuple(answer))
+    guess_index = INDEX.get(tuple(guess))
+    if answer_index is None or guess_index is None:
+        # 重複ありの番号などテーブル外の入力は直接計算する
+        eat = sum(a == g for a, g in zip(answer, guess))
+        bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
+        return eat, bite
+    return DECODED[(_TABLE or table())[answer_index * NUMBER_COUNT + guess_index]]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+AI戦略木ソルバー
+Offline decision-tree solver for the 3-digit game
+
+【概要】
+- AIの候補全体（generate_all_possible_numbers の648通り）について、全ての局面の推測を決めた戦略木を計算する
+- 各局面では推測戦略で評価上位 width 個の推測を試し、それぞれの先を貪欲に展開して
+  （最悪コール数, 総コール数）が最小のものを採用する
+- 結果は numeron_tree.py の形式でファイルに書き出し、AIPlayer(strategy="tree") が mmap で参照する
+
+【使い方】
+    python3 numeron_solver.py [--strategy entropy] [--width 1] [--output numeron_tree.bin]
+"""
+
+import argparse
+import time
+from typing import List, Tuple, Dict
+
+import numeron_scoring
+from numeron_scoring import WIN_CODE
+from numeron_candidates import CandidateSet
+from numeron_strategy import get_selector, partition_counts, PartitionSelector
+from numeron_tree import TREE_PATH, write_tree, StrategyTree
+
+
+class TreeSolver:
+    """戦略木を計算するクラス"""
+
+    def __init__(self, strategy: str = "entropy", width: int = 1):
+        self.selector = get_selector(strategy)
+        if not isinstance(self.selector, PartitionSelector):
+            raise ValueError(f"戦略木には分割評価の戦略を指定してください: {strategy}")
+        self.strategy = strategy
+        self.width = max(1, width)
+        self.nodes: List[Tuple[int, Dict[int, int]]] = []
+
+    def candidate_guesses(self, candidates: CandidateSet) -> List[int]:
+        """局面で試す推測の一覧"""
+        if len(candidates) <= 2:
+            return [candidates.indices()[0]]
+        return self.selector.rank(candidates, limit=self.width)
+
+    def split(self, candidates: CandidateSet, guess_index: int) -> Dict[int, CandidateSet]:
+        """推測の判定コードごとに候補を分ける（正解のコードは除く）"""
+        children = {}
+        for code, count in enumerate(partition_counts(guess_index, candidates.indices())):
+            if count and code != WIN_CODE:
+                child = candidates.copy()
+                child.filter_code(guess_index, code)
+                children[code] = child
+        return children
+
+    def greedy_cost(self, candidates: CandidateSet, depth: int) -> Tuple[int, int]:
+        """評価1位の推測だけで展開した場合の (最悪コール数, 総コール数)"""
+        guess_index = self.candidate_guesses(candidates)[0]
+        return self.cost_of(candidates, guess_index, depth, self.greedy_cost)
+
+    def cost_of(self, candidates: CandidateSet, guess_index: int, depth: int, expand) -> Tuple[int, int]:
+        """推測した場合の (最悪コール数, 総コール数)"""
+        worst = depth if candidates.contains_index(guess_index) else 0
+        total = depth if worst else 0
+        for child in self.split(candidates, guess_index).values():
+            child_worst, child_total = expand(child, depth + 1)
+            worst = max(worst, child_worst)
+            total += child_total
+        return worst, total
+
+    def solve(self, candidates: CandidateSet, depth: int = 1) -> Tuple[int, int, int]:
+        """局面の戦略木を作成し、(ノード番号, 最悪コール数, 総コール数) を返す"""
+        guesses = self.candidate_guesses(candidates)
+        if len(guesses) > 1:
+            guess_index = min(guesses, key=lambda g: self.cost_of(candidates, g, depth, self.greedy_cost))
+        else:
+            guess_index = guesses[0]
+
+        node = len(self.nodes)
+        children: Dict[int, int] = {}
+        self.nodes.append((guess_index, children))
+        worst = depth if candidates.contains_index(guess_index) else 0
+        total = depth if worst else 0
+        for code, child in self.split(candidates, guess_index).items():
+            child_node, child_worst, child_total = self.solve(child, depth + 1)
+            children[code] = child_node
+            worst = max(worst, child_worst)
+            total += child_total
+        return node, worst, total
+
+    def build(self, output: str = TREE_PATH) -> Dict[str, float]:
+        """全候補の戦略木を作成してファイルに書き出す"""
+        self.nodes = []
+        universe = CandidateSet()
+        root, worst, total = self.solve(universe)
+        write_tree(output, self.nodes, root, worst, self.strategy)
+        return {
+            'nodes': len(self.nodes),
+            'max_depth': worst,
+            'average_depth': total / len(universe),
+        }
+
+
+def verify_tree(path: str = TREE_PATH) -> int:
+    """全候補について戦略木を辿って正解できることを確認し、最悪コール数を返す"""
+    tree = StrategyTree(path)
+    try:
+        worst = 0
+        for secret in numeron_scoring.UNIVERSE:
+            observations = []
+            while True:
+                guess_index = tree.lookup(observations)
+                if guess_index is None:
+                    raise ValueError(f"戦略木に無い局面があります: {numeron_scoring.number_at(secret)}")
+                code = numeron_scoring.score(secret, guess_index)
+                observations.append((guess_index, code))
+                if code == WIN_CODE:
+                    break
+            worst = max(worst, len(observations))
+        if worst != tree.max_depth:
+            raise ValueError("戦略木の最悪コール数が一致しません")
+        return worst
+    finally:
+        tree.close()
+
+
+def main():
+    """戦略木ファイルを生成する"""
+    parser = argparse.ArgumentParser(description="AI戦略木ファイルを生成する")
+    parser.add_argument('--strategy', default='entropy', choices=['entropy', 'minimax', 'expected'],
+                        help="推測の評価方法")
+    parser.add_argument('--width', type=int, default=1, help="各局面で試す推測の数（大きいほど強く、遅い）")
+    parser.add_argument('--output', default=TREE_PATH, help="出力ファイル")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = TreeSolver(args.strategy, args.width).build(args.output)
+    verify_tree(args.output)
+    elapsed = time.perf_counter() - started
+    print(f"ノード数: {stats['nodes']}")
+    print(f"最悪コール数: {stats['max_depth']}")
+    print(f"平均コール数: {stats['average_depth']:.3f}")
+    print(f"計算時間: {elapsed:.1f}秒")
+    print(f"戦略木ファイルを保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
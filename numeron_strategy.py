@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+AI推測戦略
+Guess selection strategies for AIPlayer
+
+【概要】
+- 推測候補ごとに、残り候補が EAT/BITE の結果でどう分かれるか（分割）を数える
+- 分割の評価方法を切り替えられる
+  - entropy: 情報量（エントロピー）最大
+  - minimax: 最悪ケースの残り候補数最小
+  - expected: 残り候補数の期待値最小
+  - random: 残り候補からランダム（従来の戦略）
+  - tree: 事前計算した戦略木（numeron_solver.py）を参照
+- time_budget（秒）を指定すると、時間切れの時点で最良の推測を返す
+- アイテム選択（ItemChooser）と SHUFFLE/CHANGE の防御探索（best_shuffle / best_change）も扱う
+  - 防御後の番号は、相手が防御に合わせて広げた候補の中で、相手の次のコールの後も区別できない番号の数で評価する
+  - 相手の次のコールと分割は、広げた候補ごとに1度だけ計算し、全ての選択肢の評価で使い回す
+"""
+
+import math
+import random
+import time
+from itertools import permutations
+from typing import List, Tuple, Optional, Dict, Type
+
+import numeron_scoring
+from numeron_scoring import np, CODE_COUNT, NUMBER_COUNT
+from numeron_candidates import CandidateSet, OpponentKnowledge
+from numeron_tree import TREE_PATH, load_tree
+
+# 時間切れ判定を行う推測候補の単位
+CHUNK_SIZE = 64
+# 防御の評価で想定する相手のコール数（相手の残り候補数の期待値が小さい順）
+DEFENSE_CALLS = 8
+# defense_table を保持する相手の候補の数（超えたら作り直す）
+DEFENSE_CACHE_SIZE = 1024
+_DEFENSE_TABLES: Dict[Tuple[int, ...], Tuple[List[int], List[List[int]]]] = {}
+
+
+def partition_counts(guess_index: int, candidate_indices: List[int]) -> List[int]:
+    """推測1つについて、判定コードごとの候補数を数える"""
+    counts = [0] * CODE_COUNT
+    row = numeron_scoring.row(guess_index)
+    for i in candidate_indices:
+        counts[row[i]] += 1
+    return counts
+
+
+def partition_matrix(guess_indices, candidate_indices):
+    """複数の推測について、判定コードごとの候補数を一括で数える（numpy版、推測数×16の配列）"""
+    codes = numeron_scoring.table_array()[np.ix_(guess_indices, candidate_indices)]
+    offsets = np.arange(len(guess_indices), dtype=np.intp)[:, None] * CODE_COUNT
+    counts = np.bincount((codes + offsets).ravel(), minlength=len(guess_indices) * CODE_COUNT)
+    return counts.reshape(len(guess_indices), CODE_COUNT)
+
+
+class GuessSelector:
+    """推測選択の基底クラス"""
+
+    name = ""
+
+    def __init__(self, time_budget: Optional[float] = None, rng: Optional[random.Random] = None):
+        self.time_budget = time_budget  # 1手あたりの計算時間の上限（秒）
+        self.rng = rng or random
+        self.last_elapsed = 0.0
+        self.last_timed_out = False
+
+    def select(self, candidates: CandidateSet, exclude: Optional[int] = None) -> int:
+        """推測する番号のインデックスを選ぶ（excludeは推測しない番号のインデックス）"""
+        raise NotImplementedError
+
+
+class RandomSelector(GuessSelector):
+    """残り候補からランダムに選ぶ"""
+
+    name = "random"
+
+    def select(self, candidates: CandidateSet, exclude: Optional[int] = None) -> int:
+        indices = [i for i in candidates.indices() if i != exclude] or candidates.indices()
+        self.last_elapsed = 0.0
+        self.last_timed_out = False
+        return self.rng.choice(indices)
+
+
+class PartitionSelector(GuessSelector):
+    """分割の評価値が最小の推測を選ぶ（評価方法はサブクラスで定義）"""
+
+    def score(self, counts: List[int], total: int) -> float:
+        """分割の評価値（小さいほど良い）"""
+        raise NotImplementedError
+
+    def score_matrix(self, counts, total: int):
+        """分割の評価値を一括計算する（numpy版）"""
+        raise NotImplementedError
+
+    def guess_pool(self, candidates: CandidateSet, exclude: Optional[int] = None) -> List[int]:
+        """評価する推測の一覧（残り候補を先に並べる）"""
+        candidate_indices = candidates.indices()
+        in_candidates = set(candidate_indices)
+        pool = candidate_indices + [i for i in range(NUMBER_COUNT) if i not in in_candidates]
+        return [i for i in pool if i != exclude]
+
+    def select(self, candidates: CandidateSet, exclude: Optional[int] = None) -> int:
+        started = time.perf_counter()
+        self.last_timed_out = False
+        candidate_indices = candidates.indices()
+        if len(candidate_indices) <= 2:
+            # 2候補以下なら候補を直接コールするのが最善
+            self.last_elapsed = time.perf_counter() - started
+            return next((i for i in candidate_indices if i != exclude), candidate_indices[0])
+
+        best_index, best_key = None, None
+        for guess_index, key in self.scan(candidates, exclude, started):
+            if best_key is None or key < best_key:
+                best_index, best_key = guess_index, key
+        self.last_elapsed = time.perf_counter() - started
+        return best_index
+
+    def rank(self, candidates: CandidateSet, exclude: Optional[int] = None, limit: int = 1) -> List[int]:
+        """評価値の良い順に推測インデックスを返す（時間制限なし）"""
+        scored = sorted(self.scan(candidates, exclude), key=lambda item: (item[1], item[0]))
+        return [guess_index for guess_index, _ in scored[:limit]]
+
+    def scan(self, candidates: CandidateSet, exclude: Optional[int] = None, started: Optional[float] = None):
+        """推測ごとの (インデックス, 評価キー) を順に返す（startedを渡すと時間制限を適用する）"""
+        candidate_indices = candidates.indices()
+        total = len(candidate_indices)
+        in_candidates = set(candidate_indices)
+        pool = self.guess_pool(candidates, exclude)
+        candidate_array = np.asarray(candidate_indices, dtype=np.intp) if np is not None else None
+        for start in range(0, len(pool), CHUNK_SIZE):
+            chunk = pool[start:start + CHUNK_SIZE]
+            if candidate_array is not None:
+                scores = self.score_matrix(partition_matrix(chunk, candidate_array), total).tolist()
+            else:
+                scores = [self.score(partition_counts(g, candidate_indices), total) for g in chunk]
+            for guess_index, value in zip(chunk, scores):
+                # 同点なら正解の可能性がある推測を優先する
+                yield guess_index, (value, guess_index not in in_candidates)
+            if (started is not None and self.time_budget is not None
+                    and time.perf_counter() - started >= self.time_budget):
+                self.last_timed_out = start + CHUNK_SIZE < len(pool)
+                return
+
+
+class EntropySelector(PartitionSelector):
+    """情報量（エントロピー）が最大の推測を選ぶ"""
+
+    name = "entropy"
+
+    def score(self, counts: List[int], total: int) -> float:
+        # -H * total = Σ n log(n / total) を最小化する
+        return sum(n * math.log(n / total) for n in counts if n)
+
+    def score_matrix(self, counts, total: int):
+        counts = counts.astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(counts > 0, counts * np.log(counts / total), 0.0)
+        return terms.sum(axis=1)
+
+
+class MinimaxSelector(PartitionSelector):
+    """最悪ケースの残り候補数が最小の推測を選ぶ"""
+
+    name = "minimax"
+
+    def score(self, counts: List[int], total: int) -> float:
+        return max(counts)
+
+    def score_matrix(self, counts, total: int):
+        return counts.max(axis=1)
+
+
+class ExpectedSizeSelector(PartitionSelector):
+    """残り候補数の期待値が最小の推測を選ぶ"""
+
+    name = "expected"
+
+    def score(self, counts: List[int], total: int) -> float:
+        return sum(n * n for n in counts) / total
+
+    def score_matrix(self, counts, total: int):
+        return (counts * counts).sum(axis=1) / total
+
+
+class TreeSelector(GuessSelector):
+    """戦略木ファイル（numeron_solver.pyで生成）から推測を選ぶ（木に無い局面はentropy戦略）"""
+
+    name = "tree"
+
+    def __init__(self, time_budget: Optional[float] = None, rng: Optional[random.Random] = None,
+                 path: str = TREE_PATH):
+        super().__init__(time_budget=time_budget, rng=rng)
+        self.path = path
+        self.fallback = EntropySelector(time_budget=time_budget, rng=rng)
+
+    def select(self, candidates: CandidateSet, exclude: Optional[int] = None) -> int:
+        started = time.perf_counter()
+        tree = load_tree(self.path)
+        if tree is not None and candidates.pristine:
+            guess_index = tree.lookup(candidates.observations)
+            if guess_index is not None and guess_index != exclude:
+                self.last_timed_out = False
+                self.last_elapsed = time.perf_counter() - started
+                return guess_index
+        guess_index = self.fallback.select(candidates, exclude)
+        self.last_timed_out = self.fallback.last_timed_out
+        self.last_elapsed = time.perf_counter() - started
+        return guess_index
+
+
+def attribute_counts(values: bytes, candidate_indices: List[int]) -> List[int]:
+    """属性値（numeron_scoring.HIGH_LOW など）ごとの候補数を数える"""
+    if np is not None:
+        array = numeron_scoring.attribute_array(values)
+        return np.bincount(array[np.asarray(candidate_indices, dtype=np.intp)], minlength=16).tolist()
+    counts = [0] * 16
+    for i in candidate_indices:
+        counts[values[i]] += 1
+    return counts
+
+
+def expected_size(counts: List[int], total: int) -> float:
+    """分割後の残り候補数の期待値"""
+    return sum(n * n for n in counts) / total if total else 0.0
+
+
+class ItemChooser:
+    """攻撃系アイテムの期待情報量を評価して、通常のコールより有利な場合だけアイテムを選ぶ
+    
+    - HIGH&LOW / SLASH / TARGET: アイテムで分割した後の残り候補数の期待値
+    - DOUBLE: 追加の1コールで得る絞り込み率と、自分の番号の1桁開示で相手が得る絞り込み率を比較
+    - 比較対象の通常コールの期待値は、推測候補の先頭 CHUNK_SIZE 個から見積もる
+    """
+
+    ATTACK_ITEMS = ("DOUBLE", "HIGH&LOW", "TARGET", "SLASH")
+    DEFENSE_ITEMS = ("SHUFFLE", "CHANGE")
+
+    def __init__(self, min_candidates: int = 3, defense_threshold: int = 6):
+        self.min_candidates = min_candidates  # これより候補が少なければコールで当てにいく
+        self.defense_threshold = defense_threshold  # 相手の残り候補がこれ以下なら防御アイテムを使う
+
+    def call_expected_size(self, candidates: CandidateSet) -> float:
+        """通常コールの残り候補数の期待値（見積もり）"""
+        candidate_indices = candidates.indices()
+        total = len(candidate_indices)
+        pool = candidate_indices[:CHUNK_SIZE]
+        if len(pool) < CHUNK_SIZE:
+            in_candidates = set(candidate_indices)
+            pool += [i for i in range(NUMBER_COUNT) if i not in in_candidates][:CHUNK_SIZE - len(pool)]
+        if np is not None:
+            counts = partition_matrix(pool, np.asarray(candidate_indices, dtype=np.intp))
+            return float(((counts * counts).sum(axis=1) / total).min())
+        return min(expected_size(partition_counts(g, candidate_indices), total) for g in pool)
+
+    def best_target_digit(self, candidate_indices: List[int]) -> Tuple[int, float]:
+        """TARGETで指定する数字と、その場合の残り候補数の期待値"""
+        total = len(candidate_indices)
+        return min(((d, expected_size(attribute_counts(numeron_scoring.DIGIT_POSITION[d], candidate_indices), total))
+                    for d in range(numeron_scoring.DIGIT_COUNT)), key=lambda item: item[1])
+
+    def reveal_fraction(self, opponent_knowledge: Optional[OpponentKnowledge]) -> float:
+        """自分の番号の1桁開示後に相手の候補が残る割合の期待値"""
+        knowledge = (opponent_knowledge.candidates.indices() if opponent_knowledge is not None
+                     else numeron_scoring.UNIVERSE)
+        if not knowledge:
+            return 1.0
+        total = len(knowledge)
+        fractions = [expected_size(attribute_counts(numeron_scoring.DIGIT_AT[pos], knowledge), total) / total
+                     for pos in range(numeron_scoring.NUMBER_LENGTH)]
+        return sum(fractions) / len(fractions)
+
+    def evaluate(self, candidates: CandidateSet, item_names: List[str]) -> Dict[str, Tuple[float, Optional[int]]]:
+        """アイテムごとに (使用後の残り候補数の期待値, TARGETの数字) を返す（DOUBLEを除く）"""
+        candidate_indices = candidates.indices()
+        total = len(candidate_indices)
+        values: Dict[str, Tuple[float, Optional[int]]] = {}
+        if "HIGH&LOW" in item_names:
+            values["HIGH&LOW"] = (expected_size(attribute_counts(numeron_scoring.HIGH_LOW, candidate_indices), total),
+                                  None)
+        if "SLASH" in item_names:
+            values["SLASH"] = (expected_size(attribute_counts(numeron_scoring.SLASH, candidate_indices), total), None)
+        if "TARGET" in item_names:
+            digit, value = self.best_target_digit(candidate_indices)
+            values["TARGET"] = (value, digit)
+        return values
+
+    def choose_defense(self, item_names: List[str], opponent_knowledge: Optional[OpponentKnowledge],
+                       number: Optional[List[int]]) -> Optional[str]:
+        """相手の残り候補が少なければ、より多くの番号と区別できなくなる防御アイテムを返す"""
+        if (opponent_knowledge is None or not number
+                or len(opponent_knowledge.candidates) > self.defense_threshold):
+            return None
+        # 使わない場合と、それぞれの最善の番号を比べる（乱数は使わない）
+        best, best_score = None, defense_scores(opponent_knowledge, [number])[0]
+        for name, search in (("SHUFFLE", shuffle_scores), ("CHANGE", change_scores)):
+            if name not in item_names:
+                continue
+            scores = search(opponent_knowledge, number)[1]
+            if scores and max(scores) > best_score:
+                best, best_score = name, max(scores)
+        return best
+
+    def choose(self, candidates: CandidateSet, item_names: List[str],
+               opponent_knowledge: Optional[OpponentKnowledge] = None,
+               number: Optional[List[int]] = None) -> Optional[Tuple[str, Optional[int]]]:
+        """使用するアイテム名とTARGETの数字を返す（通常コールの方が良ければNone）"""
+        defense = self.choose_defense(item_names, opponent_knowledge, number)
+        if defense is not None:
+            return defense, None
+        total = len(candidates)
+        item_names = [name for name in item_names if name in self.ATTACK_ITEMS]
+        if total < self.min_candidates or not item_names:
+            return None
+        call_value = self.call_expected_size(candidates)
+
+        best: Optional[Tuple[str, Optional[int]]] = None
+        best_ratio = call_value / total  # 通常コール1回分の絞り込み率
+        for name, (value, digit) in self.evaluate(candidates, item_names).items():
+            if value < total and value / total <= best_ratio:
+                best, best_ratio = (name, digit), value / total
+        if best is None and "DOUBLE" in item_names:
+            # 追加コールの絞り込み率が、1桁開示で相手が得る絞り込み率より大きければ使用する
+            if call_value / total < self.reveal_fraction(opponent_knowledge):
+                best = ("DOUBLE", None)
+        return best
+
+
+def shuffle_options(number: List[int]) -> List[List[int]]:
+    """SHUFFLEで選べる並べ替え（元の並びを除く）"""
+    return [list(p) for p in permutations(number) if list(p) != number]
+
+
+def change_options(number: List[int]) -> List[Tuple[int, int]]:
+    """CHANGEで選べる (桁, 新しい数字) の一覧（HIGH/LOWを保持し、番号に無い数字と交換）"""
+    threshold = numeron_scoring.HIGH_THRESHOLD
+    return [(pos, digit) for pos, old in enumerate(number)
+            for digit in range(numeron_scoring.DIGIT_COUNT)
+            if digit not in number and (digit >= threshold) == (old >= threshold)]
+
+
+def opponent_calls(candidate_indices: List[int], limit: int = DEFENSE_CALLS) -> Tuple[List[int], List[List[int]]]:
+    """相手が次にしそうなコール（相手の残り候補数の期待値が小さい順に limit 個）と、
+    それぞれの判定コードごとの候補数を返す"""
+    if np is not None:
+        # 全ての推測について数える（partition_matrix と同じ集計を、行の選択を省いて行う）
+        guesses = np.arange(NUMBER_COUNT, dtype=np.intp)
+        codes = numeron_scoring.table_array()[:, np.asarray(candidate_indices, dtype=np.intp)]
+        counts = np.bincount((codes + guesses[:, None] * CODE_COUNT).ravel(),
+                             minlength=NUMBER_COUNT * CODE_COUNT).reshape(NUMBER_COUNT, CODE_COUNT)
+        # 同じ値は推測インデックスの小さい順（純Python版の sorted と同じ順）
+        keys = (counts * counts).sum(axis=1) * NUMBER_COUNT + guesses
+        calls = np.argpartition(keys, limit)[:limit]
+        calls = calls[np.argsort(keys[calls])]
+        return calls.tolist(), counts[calls].tolist()
+    rows = [partition_counts(g, candidate_indices) for g in range(NUMBER_COUNT)]
+    sizes = [sum(c * c for c in counts) for counts in rows]
+    calls = sorted(range(NUMBER_COUNT), key=sizes.__getitem__)[:limit]
+    return calls, [rows[g] for g in calls]
+
+
+def defense_table(candidate_indices: List[int]) -> Tuple[List[int], List[List[int]]]:
+    """opponent_calls の結果（相手の候補ごとに1度だけ計算し、同じ候補の評価では使い回す）"""
+    key = tuple(candidate_indices)
+    table = _DEFENSE_TABLES.get(key)
+    if table is None:
+        if len(_DEFENSE_TABLES) >= DEFENSE_CACHE_SIZE:
+            _DEFENSE_TABLES.clear()
+        table = _DEFENSE_TABLES[key] = opponent_calls(candidate_indices)
+    return table
+
+
+def hidden_size(number: List[int], table: Tuple[List[int], List[List[int]]]) -> float:
+    """相手が table のコールのいずれかをした後も number と区別できない候補数の平均"""
+    index = numeron_scoring.index_of(number)
+    calls, counts = table
+    return sum(counts[k][numeron_scoring.row(g)[index]] for k, g in enumerate(calls)) / len(calls)
+
+
+def defense_scores(knowledge: OpponentKnowledge, numbers: List[List[int]], item: Optional[str] = None,
+                   position: Optional[int] = None) -> List[float]:
+    """防御後の番号ごとに、相手の次のコールの後も区別できない候補数（大きいほど相手に情報を与えない）
+
+    相手の候補は、相手が防御アイテムの使用を見て広げたもの（CandidateSet.expand、item=None なら今の候補）。
+    SHUFFLE ではどの並べ替えを選んでも広がった候補は同じなので、その中での見つけにくさで比べる
+    """
+    candidates = CandidateSet(knowledge.candidates.indices())
+    if item is not None:
+        candidates.expand(item, position)
+    candidate_indices = candidates.indices()
+    if not candidate_indices:
+        return [0.0] * len(numbers)
+    table = defense_table(candidate_indices)
+    return [hidden_size(number, table) for number in numbers]
+
+
+def shuffle_scores(knowledge: OpponentKnowledge, number: List[int]) -> Tuple[List[List[int]], List[float]]:
+    """SHUFFLEで選べる並べ替えと、それぞれの defense_scores"""
+    options = shuffle_options(number)
+    return options, defense_scores(knowledge, options, "SHUFFLE")
+
+
+def change_scores(knowledge: OpponentKnowledge, number: List[int]) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """CHANGEで選べる (桁, 新しい数字) と、それぞれの defense_scores
+
+    交換した桁は相手に伝わるので、相手の候補は桁ごとに広げる
+    """
+    options = change_options(number)
+    scores = []
+    by_position: Dict[int, List[List[int]]] = {}
+    for pos, digit in options:
+        changed = list(number)
+        changed[pos] = digit
+        by_position.setdefault(pos, []).append(changed)
+    for pos, numbers in by_position.items():
+        scores.extend(defense_scores(knowledge, numbers, "CHANGE", pos))
+    # options は桁の順に並んでいるので、桁ごとに並べた scores と位置が一致する
+    return options, scores
+
+
+def best_defense(scores: List[float], rng: Optional[random.Random] = None) -> Optional[int]:
+    """スコアが最も大きい位置を返す（同点はランダム、候補が無ければNone）"""
+    if not scores:
+        return None
+    best = max(scores)
+    return (rng or random).choice([i for i, score in enumerate(scores) if score == best])
+
+
+def best_shuffle(knowledge: OpponentKnowledge, number: List[int],
+                 rng: Optional[random.Random] = None) -> List[int]:
+    """相手に最も情報を与えない並べ替えを選ぶ"""
+    options, scores = shuffle_scores(knowledge, number)
+    return options[best_defense(scores, rng)]
+
+
+def best_change(knowledge: OpponentKnowledge, number: List[int],
+                rng: Optional[random.Random] = None) -> Optional[Tuple[int, int]]:
+    """相手に最も情報を与えない (桁, 新しい数字) を選ぶ（交換できなければNone）"""
+    options, scores = change_scores(knowledge, number)
+    choice = best_defense(scores, rng)
+    return None if choice is None else options[choice]
+
+
+SELECTORS: Dict[str, Type[GuessSelector]] = {
+    RandomSelector.name: RandomSelector,
+    EntropySelector.name: EntropySelector,
+    MinimaxSelector.name: MinimaxSelector,
+    ExpectedSizeSelector.name: ExpectedSizeSelector,
+    TreeSelector.name: TreeSelector,
+}
+
+
+def get_selector(name: str, time_budget: Optional[float] = None,
+                 rng: Optional[random.Random] = None) -> GuessSelector:
+    """名前から推測戦略を作成する"""
+    if name not in SELECTORS:
+        raise ValueError(f"不明な推測戦略です: {name}")
+    return SELECTORS[name](time_budget=time_budget, rng=rng)
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+AI総当たりトーナメント
+Round-robin tournament of AI profiles with Elo ratings
+
+【概要】
+- AI設定（numeron_game.ai_profiles()、推測戦略を登録すると自動で追加される）の全ての組み合わせで対戦する
+- 番号の組は (seed, ラウンド) から決めて全ての組み合わせで共通にする。
+  各ラウンドは2ゲームで、2ゲーム目は番号と先攻を入れ替える
+- 組み合わせ×ゲーム番号のチャンクをプロセスプールに配り、結果は列ごとの配列で保存する
+  （numpyがあれば .npz、無ければJSON）
+- 結果ファイルは途中経過（チェックポイント）を兼ね、同じ条件で再実行すると終わっていないチャンクだけを実行する
+- Bradley-Terry モデルの最尤推定でEloレーティングを求め、ゲームのブートストラップで95%信頼区間を付ける
+
+【使い方】
+    python3 numeron_tournament.py [--profiles random entropy minimax ...] [--rounds 50]
+                                  [--seed 0] [--workers 4] [--output tournament.npz]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Dict, Any, Tuple, Iterable
+
+from numeron_scoring import np
+from numeron_game import ai_profiles, random_number
+from numeron_simulate import play_game, warm_up, MAX_TURNS
+
+TOURNAMENT_PATH = 'tournament.npz'
+TOURNAMENT_VERSION = 1
+CHUNK_SIZE = 10  # 1回の作業で実行するゲーム数
+CHECKPOINT_INTERVAL = 30.0  # 結果ファイルを書き出す間隔（秒）
+BOOTSTRAP_SAMPLES = 200
+INITIAL_RATING = 1500.0
+PRIOR_GAMES = 1.0  # レーティングの事前分布（各組み合わせに引き分け1ゲーム分を加える）
+
+# 結果の列: (列名, 型)。winner は 0: a の勝ち / 1: b の勝ち / -1: 打ち切り、first は 0: a が先攻
+COLUMNS = [
+    ('a', 'u2'), ('b', 'u2'), ('game', 'u4'), ('winner', 'i1'), ('first', 'u1'),
+    ('turns', 'u2'), ('calls_a', 'u1'), ('calls_b', 'u1'), ('items_a', 'u1'), ('items_b', 'u1'),
+]
+
+
+def schedule_secrets(seed: int, round_index: int) -> Tuple[List[int], List[int]]:
+    """ラウンドの番号の組（全ての組み合わせで共通）"""
+    rng = random.Random(f"{seed}:secrets:{round_index}")
+    return random_number(rng), random_number(rng)
+
+
+def pairings(count: int) -> List[Tuple[int, int]]:
+    """総当たりの組み合わせ"""
+    return [(a, b) for a in range(count) for b in range(a + 1, count)]
+
+
+def play_tournament_chunk(task: Tuple[List[str], int, int, int, int, int, Optional[float]]) -> List[Tuple[int, ...]]:
+    """組み合わせ (a, b) のゲーム番号 start〜stop-1 を実行し、結果の行を返す（プロセスプールの作業単位）"""
+    profiles, a, b, start, stop, seed, time_budget = task
+    rows = []
+    for game in range(start, stop):
+        secrets = schedule_secrets(seed, game // 2)
+        swap = game % 2
+        if swap:
+            secrets = secrets[::-1]
+        result = play_game(game, seed=seed, profiles=(profiles[a], profiles[b]), secrets=secrets,
+                           first=swap, time_budget=time_budget, max_turns=MAX_TURNS)
+        winner = -1 if result['winner'] is None else result['winner'] - 1
+        rows.append((a, b, game, winner, swap, result['turns'], *result['calls'],
+                     *(len(items) for items in result['items'])))
+    return rows
+
+
+class TournamentResults:
+    """トーナメント結果（列ごとの配列）と条件"""
+
+    def __init__(self, profiles: List[str], rounds: int, seed: int):
+        self.profiles = profiles
+        self.rounds = rounds
+        self.seed = seed
+        self.columns: Dict[str, List[int]] = {name: [] for name, _ in COLUMNS}
+
+    def meta(self) -> Dict[str, Any]:
+        """結果ファイルの条件（再開時に一致を確認する）"""
+        return {'version': TOURNAMENT_VERSION, 'profiles': self.profiles, 'rounds': self.rounds, 'seed': self.seed}
+
+    def __len__(self) -> int:
+        return len(self.columns['game'])
+
+    def add(self, rows: Iterable[Tuple[int, ...]]):
+        """結果の行を追加する"""
+        for row in rows:
+            for (name, _), value in zip(COLUMNS, row):
+                self.columns[name].append(value)
+
+    def completed(self) -> Dict[Tuple[int, int], set]:
+        """組み合わせごとの終わったゲーム番号"""
+        done: Dict[Tuple[int, int], set] = {}
+        for a, b, game in zip(self.columns['a'], self.columns['b'], self.columns['game']):
+            done.setdefault((a, b), set()).add(game)
+        return done
+
+    def save(self, path: str):
+        """結果ファイルを書き出す（書き込み途中で中断しても壊れないよう置き換える）"""
+        temporary = path + '.tmp'
+        if np is not None:
+            arrays = {name: np.asarray(self.columns[name], dtype=dtype) for name, dtype in COLUMNS}
+            with open(temporary, 'wb') as f:
+                np.savez_compressed(f, meta=np.array(json.dumps(self.meta())), **arrays)
+        else:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump({'meta': self.meta(), 'columns': self.columns}, f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TournamentResults':
+        """結果ファイルを読み込む"""
+        if np is not None:
+            try:
+                with np.load(path) as data:
+                    meta = json.loads(str(data['meta']))
+                    columns = {name: data[name].tolist() for name, _ in COLUMNS}
+            except ValueError:
+                meta, columns = cls._load_json(path)
+        else:
+            meta, columns = cls._load_json(path)
+        if meta.get('version') != TOURNAMENT_VERSION:
+            raise ValueError(f"結果ファイルの形式が異なります: {path}")
+        results = cls(meta['profiles'], meta['rounds'], meta['seed'])
+        results.columns = columns
+        return results
+
+    @staticmethod
+    def _load_json(path: str) -> Tuple[Dict[str, Any], Dict[str, List[int]]]:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return data['meta'], data['columns']
+
+
+def tournament_tasks(results: TournamentResults, chunk_size: int = CHUNK_SIZE,
+                     time_budget: Optional[float] = None) -> List[Tuple]:
+    """まだ終わっていないチャンクの一覧"""
+    done = results.completed()
+    games = results.rounds * 2
+    tasks = []
+    for a, b in pairings(len(results.profiles)):
+        finished = done.get((a, b), set())
+        for start in range(0, games, chunk_size):
+            stop = min(start + chunk_size, games)
+            if not all(game in finished for game in range(start, stop)):
+                tasks.append((results.profiles, a, b, start, stop, results.seed, time_budget))
+    return tasks
+
+
+def run_tournament(profiles: List[str], rounds: int = 50, seed: int = 0, workers: Optional[int] = None,
+                   output: Optional[str] = None, chunk_size: int = CHUNK_SIZE, time_budget: Optional[float] = None,
+                   checkpoint_interval: float = CHECKPOINT_INTERVAL, max_tasks: Optional[int] = None,
+                   progress=None) -> TournamentResults:
+    """トーナメントを実行する（output に同じ条件の結果ファイルがあれば続きから実行する）
+
+    max_tasks を指定すると、その数のチャンクを実行した時点で中断する（結果ファイルは書き出す）
+    """
+    unknown = [profile for profile in profiles if profile not in ai_profiles()]
+    if unknown:
+        raise ValueError(f"不明なAI設定です: {', '.join(unknown)}")
+    results = TournamentResults(list(profiles), rounds, seed)
+    if output and os.path.exists(output):
+        previous = TournamentResults.load(output)
+        if previous.meta() != results.meta():
+            raise ValueError(f"結果ファイルの条件が異なります（別のファイルを指定してください）: {output}")
+        # 途中で中断したチャンクは最初からやり直す
+        results.add(zip(*(previous.columns[name] for name, _ in COLUMNS)))
+    tasks = tournament_tasks(results, chunk_size, time_budget)
+    done = results.completed()
+    if max_tasks is not None:
+        tasks = tasks[:max_tasks]
+
+    workers = workers or os.cpu_count() or 1
+    last_saved = time.perf_counter()
+
+    def collect(rows):
+        nonlocal last_saved
+        for row in rows:
+            # 中断したチャンクの実行済みゲームは結果を重複させない
+            if row[2] not in done.get((row[0], row[1]), ()):
+                results.add([row])
+        if progress is not None:
+            progress(results)
+        if output and time.perf_counter() - last_saved >= checkpoint_interval:
+            results.save(output)
+            last_saved = time.perf_counter()
+
+    warm_up()
+    if workers == 1:
+        for task in tasks:
+            collect(play_tournament_chunk(task))
+    else:
+        with Pool(workers, initializer=warm_up) as pool:
+            for rows in pool.imap_unordered(play_tournament_chunk, tasks):
+                collect(rows)
+    if output:
+        results.save(output)
+    return results
+
+
+def score_matrix(a: List[int], b: List[int], winner: List[int], count: int) -> Tuple[List[List[float]], List[List[float]]]:
+    """(勝ち点の行列, 対戦数の行列)。打ち切りは引き分け（0.5点ずつ）"""
+    points = [[0.0] * count for _ in range(count)]
+    games = [[0.0] * count for _ in range(count)]
+    for i, j, w in zip(a, b, winner):
+        score = 1.0 if w == 0 else 0.0 if w == 1 else 0.5
+        points[i][j] += score
+        points[j][i] += 1.0 - score
+        games[i][j] += 1
+        games[j][i] += 1
+    return points, games
+
+
+def elo_ratings(points: List[List[float]], games: List[List[float]], iterations: int = 200) -> List[float]:
+    """Bradley-Terry モデルの最尤推定（MMアルゴリズム）をEloの尺度（平均1500）で返す"""
+    count = len(points)
+    # 全勝・全敗でも発散しないよう、各組み合わせに引き分けを加える
+    prior = PRIOR_GAMES / 2
+    wins = [sum(points[i][j] + prior for j in range(count) if j != i) for i in range(count)]
+    strength = [1.0] * count
+    for _ in range(iterations):
+        updated = []
+        for i in range(count):
+            denominator = sum((games[i][j] + PRIOR_GAMES) / (strength[i] + strength[j])
+                              for j in range(count) if j != i)
+            updated.append(wins[i] / denominator if denominator else strength[i])
+        mean_log = sum(math.log(s) for s in updated) / count
+        strength = [s / math.exp(mean_log) for s in updated]
+    return [INITIAL_RATING + 400 * math.log10(s) for s in strength]
+
+
+def bootstrap_intervals(results: TournamentResults, samples: int = BOOTSTRAP_SAMPLES, seed: int = 0,
+                        level: float = 0.95) -> List[Tuple[float, float]]:
+    """ゲームを復元抽出してレーティングを再計算し、プロファイルごとの信頼区間を返す"""
+    columns = results.columns
+    count = len(results.profiles)
+    total = len(columns['game'])
+    rng = random.Random(seed)
+    if np is not None:
+        generator = np.random.default_rng(seed)
+        a = np.asarray(columns['a'], dtype=np.intp)
+        b = np.asarray(columns['b'], dtype=np.intp)
+        winner = np.asarray(columns['winner'])
+        score = np.where(winner == 0, 1.0, np.where(winner == 1, 0.0, 0.5))
+    samples_by_profile: List[List[float]] = [[] for _ in range(count)]
+    for _ in range(samples):
+        if np is not None:
+            # 組み合わせ (i, j) ごとの勝ち点と対戦数を bincount で一括集計する
+            picks = generator.integers(total, size=total)
+            cells = a[picks] * count + b[picks]
+            won = np.bincount(cells, weights=score[picks], minlength=count * count).reshape(count, count)
+            played = np.bincount(cells, minlength=count * count).reshape(count, count)
+            points = (won + (played - won).T).tolist()
+            games = (played + played.T).astype(float).tolist()
+        else:
+            picks = [rng.randrange(total) for _ in range(total)]
+            points, games = score_matrix([columns['a'][k] for k in picks], [columns['b'][k] for k in picks],
+                                         [columns['winner'][k] for k in picks], count)
+        for profile, rating in enumerate(elo_ratings(points, games, iterations=50)):
+            samples_by_profile[profile].append(rating)
+    lower_rank = int((1 - level) / 2 * samples)
+    upper_rank = min(samples - 1, int((1 + level) / 2 * samples))
+    intervals = []
+    for ratings in samples_by_profile:
+        ratings.sort()
+        intervals.append((ratings[lower_rank], ratings[upper_rank]))
+    return intervals
+
+
+def standings(results: TournamentResults, samples: int = BOOTSTRAP_SAMPLES) -> List[Dict[str, Any]]:
+    """レーティング順の順位表"""
+    columns = results.columns
+    count = len(results.profiles)
+    points, games = score_matrix(columns['a'], columns['b'], columns['winner'], count)
+    ratings = elo_ratings(points, games)
+    intervals = bootstrap_intervals(results, samples) if samples and len(results) else [(r, r) for r in ratings]
+    calls = [0] * count
+    played = [0] * count
+    for a, b, calls_a, calls_b in zip(columns['a'], columns['b'], columns['calls_a'], columns['calls_b']):
+        calls[a] += calls_a
+        calls[b] += calls_b
+        played[a] += 1
+        played[b] += 1
+    table = [{
+        'profile': profile,
+        'rating': ratings[i],
+        'interval': intervals[i],
+        'games': played[i],
+        'score': sum(points[i]) / played[i] if played[i] else 0.0,
+        'average_calls': calls[i] / played[i] if played[i] else 0.0,
+    } for i, profile in enumerate(results.profiles)]
+    return sorted(table, key=lambda row: -row['rating'])
+
+
+def main():
+    """トーナメントを実行して順位表を表示する"""
+    profiles = ai_profiles()
+    parser = argparse.ArgumentParser(description="AI設定の総当たりトーナメント")
+    parser.add_argument('--profiles', nargs='+', default=['random', 'entropy', 'minimax', 'expected', 'tree',
+                                                          'entropy-nobook', 'entropy-noitems'],
+                        choices=sorted(profiles), metavar='PROFILE', help="参加するAI設定")
+    parser.add_argument('--rounds', type=int, default=50, help="組み合わせごとのラウンド数（1ラウンド2ゲーム）")
+    parser.add_argument('--seed', type=int, default=0, help="乱数シード（番号の組を決める）")
+    parser.add_argument('--workers', type=int, default=None, help="プロセス数（省略時はCPU数）")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="1回の作業で実行するゲーム数")
+    parser.add_argument('--time-budget', type=float, default=None, help="1手あたりの計算時間の上限（秒）")
+    parser.add_argument('--bootstrap', type=int, default=BOOTSTRAP_SAMPLES, help="信頼区間のブートストラップ回数")
+    parser.add_argument('--output', default=TOURNAMENT_PATH, help="結果ファイル（同じ条件なら続きから実行）")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = len(pairings(len(args.profiles))) * args.rounds * 2
+
+    def progress(results):
+        print(f"\r{len(results)}/{total} ゲーム", end='', flush=True)
+
+    results = run_tournament(args.profiles, args.rounds, args.seed, args.workers, args.output,
+                             args.chunk_size, args.time_budget, progress=progress)
+    elapsed = time.perf_counter() - started
+    print(f"\n実行時間: {elapsed:.1f}秒")
+    print(f"{'順位':>4} {'AI設定':<20} {'Elo':>7} {'95%信頼区間':>17} {'勝ち点率':>8} {'平均コール':>8}")
+    for rank, row in enumerate(standings(results, args.bootstrap), 1):
+        low, high = row['interval']
+        print(f"{rank:>4} {row['profile']:<20} {row['rating']:>7.1f} {low:>8.1f}〜{high:<8.1f} "
+              f"{row['score']:>8.3f} {row['average_calls']:>8.2f}")
+    print(f"結果ファイル: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+AI戦略木ファイル
+Memory-mapped strategy tree file
+
+【ファイル形式】（リトルエンディアン）
+- ヘッダ（32バイト）: マジック "NMTR"、バージョン、ノードサイズ、ノード数、ルートノード番号、最悪コール数、戦略名
+- ノード（68バイト × ノード数）: 推測インデックス(u16)、予備(u16)、判定コード0〜15ごとの子ノード番号+1(u32 × 16、0は子なし)
+
+【使い方】
+- numeron_solver.py で生成したファイルを StrategyTree で mmap して参照する
+- 観測履歴 [(推測, 判定コード), ...] をルートから辿るだけなので、1手あたり O(履歴の長さ)
+- ファイルはOSのページキャッシュ経由で全プロセスから共有される
+"""
+
+import mmap
+import os
+import struct
+from typing import List, Tuple, Optional, Dict
+
+from numeron_scoring import CODE_COUNT
+
+TREE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'numeron_tree.bin')
+TREE_MAGIC = b'NMTR'
+TREE_VERSION = 1
+
+HEADER = struct.Struct('<4sHHIIH14s')
+NODE = struct.Struct('<HH%dI' % CODE_COUNT)
+
+_TREES: Dict[str, Optional['StrategyTree']] = {}
+
+
+class StrategyTree:
+    """mmapした戦略木"""
+
+    def __init__(self, path: str = TREE_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, node_size, node_count, root, max_depth, strategy = HEADER.unpack_from(self._buffer, 0)
+        if magic != TREE_MAGIC or version != TREE_VERSION or node_size != NODE.size:
+            self._buffer.close()
+            raise ValueError(f"戦略木ファイルの形式が不正です: {path}")
+        if len(self._buffer) != HEADER.size + node_count * NODE.size:
+            self._buffer.close()
+            raise ValueError(f"戦略木ファイルのサイズが不正です: {path}")
+        self.node_count = node_count
+        self.root = root
+        self.max_depth = max_depth  # 最悪ケースのコール数
+        self.strategy = strategy.rstrip(b'\0').decode('ascii')
+
+    def guess_at(self, node: int) -> int:
+        """ノードの推測インデックスを取得する"""
+        return struct.unpack_from('<H', self._buffer, HEADER.size + node * NODE.size)[0]
+
+    def child(self, node: int, code: int) -> Optional[int]:
+        """ノードの判定コードに対応する子ノードを取得する"""
+        offset = HEADER.size + node * NODE.size + 4 + code * 4
+        value = struct.unpack_from('<I', self._buffer, offset)[0]
+        return value - 1 if value else None
+
+    def lookup(self, observations: List[Tuple[int, int]]) -> Optional[int]:
+        """観測履歴に対する次の推測インデックスを取得する（木に無い履歴ならNone）"""
+        node = self.root
+        for guess_index, code in observations:
+            if self.guess_at(node) != guess_index:
+                return None
+            node = self.child(node, code)
+            if node is None:
+                return None
+        return self.guess_at(node)
+
+    def node_arrays(self):
+        """(推測インデックスの配列, 子ノード番号の配列（ノード数×16、子なしは-1）) を取得する（numpy使用、一括探索用）"""
+        import numpy as np
+        dtype = np.dtype([('guess', '<u2'), ('reserved', '<u2'), ('children', '<u4', (CODE_COUNT,))])
+        nodes = np.frombuffer(self._buffer, dtype=dtype, count=self.node_count, offset=HEADER.size)
+        return nodes['guess'].astype(np.intp), nodes['children'].astype(np.intp) - 1
+
+    def close(self):
+        """mmapを閉じる"""
+        self._buffer.close()
+
+
+def write_tree(path: str, nodes: List[Tuple[int, Dict[int, int]]], root: int, max_depth: int, strategy: str):
+    """戦略木をファイルに書き出す（nodesは (推測インデックス, {判定コード: 子ノード番号}) のリスト）"""
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(TREE_MAGIC, TREE_VERSION, NODE.size, len(nodes), root, max_depth,
+                            strategy.encode('ascii')))
+        for guess_index, children in nodes:
+            slots = [0] * CODE_COUNT
+            for code, child in children.items():
+                slots[code] = child + 1
+            f.write(NODE.pack(guess_index, 0, *slots))
+    os.replace(temporary, path)
+
+
+def load_tree(path: str = TREE_PATH) -> Optional[StrategyTree]:
+    """戦略木を読み込む（プロセス内で1度だけmmapする、ファイルが無ければNone）"""
+    if path not in _TREES:
+        try:
+            _TREES[path] = StrategyTree(path)
+        except (OSError, ValueError):
+            _TREES[path] = None
+    return _TREES[path]
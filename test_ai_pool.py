@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+AIワーカープールのテストスクリプト
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from ai_pool import AIWorkerPool, Ponderer, PoolFullError, compute_ai_move
+import numeron_scoring
+
+
+def test_compute_ai_move():
+    """スナップショットからAIの推測を計算できることをテストする"""
+    print("=== AI推測計算テスト ===")
+    snapshot = {'number': [1, 2, 3], 'calls': [([4, 5, 6], 0, 1), ([7, 8, 9], 1, 0)],
+                'strategy': 'entropy', 'time_budget': None, 'fallback_strategy': 'random'}
+    move = compute_ai_move(snapshot)
+    guess = move['guess']
+    assert len(set(guess)) == 3 and guess != [1, 2, 3]
+    assert move['strategy'] == 'entropy' and not move['timed_out'] and move['think_time'] >= 0
+    # 時間切れになると次から軽い戦略を使う
+    snapshot.update(calls=[([4, 5, 6], 0, 0)], time_budget=0.0)
+    move = compute_ai_move(snapshot)
+    assert move['timed_out'] and move['selector'] == 'entropy' and move['strategy'] == 'random'
+    print(f"時間制限0秒: {move}")
+    print("✅ AI推測計算テスト完了")
+
+
+def test_backpressure():
+    """実行中＋待機中が上限に達したら登録を拒否することをテストする"""
+    print("\n=== 背圧テスト ===")
+    pool = AIWorkerPool(workers=1, max_queue=2)
+    release = threading.Event()
+    tickets = [pool.submit(release.wait, 5) for _ in range(3)]
+    try:
+        pool.submit(release.wait, 5)
+        assert False, "満杯のプールに登録できてしまいました"
+    except PoolFullError:
+        pass
+    stats = pool.stats()
+    assert stats['in_flight'] == 3 and stats['queue_depth'] == 2 and stats['rejected'] == 1
+    assert pool.result(tickets[0], timeout=0.01) == (False, None)  # まだ計算中
+
+    release.set()
+    assert all(pool.result(ticket, timeout=5) == (True, True) for ticket in tickets)
+    try:
+        pool.result(tickets[0])
+        assert False, "取得済みのチケットが残っています"
+    except KeyError:
+        pass
+    stats = pool.stats()
+    assert stats['completed'] == 3 and stats['in_flight'] == 0 and stats['max_queue_depth'] == 2
+    assert stats['tickets'] == 0
+
+    # 指定したチケットでの登録・計算済みの結果・チケットの付け替え
+    assert pool.submit(release.wait, 5, ticket="t1") == "t1"
+    pool.complete("t2", {'guess': [1, 2, 3]})
+    assert pool.rename("t1", "t3") and not pool.rename("missing", "t4")
+    assert pool.result("t2") == (True, {'guess': [1, 2, 3]}) and pool.result("t3", timeout=5) == (True, True)
+
+    # 取り消したチケットは失敗ではなく取り消しとして数える
+    release.clear()
+    running = pool.submit(release.wait, 5)
+    waiting = pool.submit(release.wait, 5)
+    pool.cancel(waiting)
+    release.set()
+    assert pool.result(running, timeout=5) == (True, True)
+    stats = pool.stats()
+    assert stats['cancelled'] == 1 and stats['failed'] == 0 and stats['completed'] == 5
+    pool.shutdown()
+    print(f"カウンタ: {stats}")
+    print("✅ 背圧テスト完了")
+
+
+def test_process_pool():
+    """プロセスプールでも同じ推測を計算できることをテストする"""
+    print("\n=== プロセスプールテスト ===")
+    snapshot = {'number': [9, 8, 7], 'calls': [([1, 2, 3], 0, 2)], 'strategy': 'minimax'}
+    pool = AIWorkerPool(workers=1, max_queue=1, processes=True)
+    try:
+        done, move = pool.result(pool.submit(compute_ai_move, snapshot), timeout=30)
+    finally:
+        pool.shutdown()
+    assert done and move['guess'] == compute_ai_move(snapshot)['guess']
+    assert numeron_scoring.index_of(move['guess']) is not None
+    print("✅ プロセスプールテスト完了")
+
+
+def test_ponder():
+    """先読みした局面だけが使われ、取り消しと上限が効くことをテストする"""
+    print("\n=== 先読みテスト ===")
+    pool = AIWorkerPool(workers=1, max_queue=4)
+    ponderer = Ponderer(pool, time_budget=None, max_games=2)
+    snapshot = {'number': [1, 2, 3], 'calls': [([4, 5, 6], 0, 1)], 'strategy': 'entropy',
+                'time_budget': 0.0, 'fallback_strategy': 'random'}
+    ponderer.ponder("g1", [snapshot])
+    ticket, move = ponderer.take("g1", snapshot)
+    if ticket is not None:
+        move = pool.result(ticket, timeout=5)[1]
+    # 先読みは時間制限なしで計算され、戦略も切り替わらない
+    assert move['guess'] == compute_ai_move(dict(snapshot, time_budget=None))['guess']
+    assert move['strategy'] == 'entropy'
+    assert ponderer.take("g1", snapshot) == (None, None)  # 取り出すと消える
+
+    # 別の局面（コール履歴が違う）では使わない
+    ponderer.ponder("g1", [snapshot])
+    other = dict(snapshot, calls=[([4, 5, 6], 1, 0)])
+    assert ponderer.take("g1", other) == (None, None)
+
+    # 空いているワーカーが無ければ先読みしない
+    release = threading.Event()
+    busy = pool.submit(release.wait, 5)
+    ponderer.ponder("g2", [snapshot])
+    assert ponderer.take("g2", snapshot) == (None, None)
+    release.set()
+    pool.result(busy, timeout=5)
+
+    # 保持するゲーム数の上限と取り消し
+    for game_id in ("a", "b", "c"):
+        ponderer.ponder(game_id, [snapshot])
+        for _ in range(50):
+            if pool.idle():
+                break
+            threading.Event().wait(0.01)
+    ponderer.cancel("c")
+    stats = ponderer.stats()
+    assert stats['games'] == 1 and stats['skipped'] == 1 and stats['hits'] == 1
+    pool.shutdown()
+    print(f"先読みカウンタ: {stats}")
+    print("✅ 先読みテスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_compute_ai_move()
+    test_backpressure()
+    test_process_pool()
+    test_ponder()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+一括シミュレーションのテストスクリプト
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(__file__))
+
+import numeron_scoring
+from numeron_scoring import np
+from numeron_game import NumeronGame, GameMode, AIPlayer
+from numeron_batch import simulate_batch, simulate, summarize, secret_map
+
+
+def play_scalar(secrets, first, strategies):
+    """同じ条件のゲームを NumeronGame で1件ずつ実行する（比較用）"""
+    game = NumeronGame(GameMode.SINGLE_PLAYER, rng=random.Random(0))
+    players = [AIPlayer(f"AI{i + 1}", strategy=strategy, item_policy="none", rng=game.rng)
+               for i, strategy in enumerate(strategies)]
+    game.player1, game.player2 = players
+    game.start(*[numeron_scoring.number_at(secret) for secret in secrets])
+    game.current_player = players[first]
+    while not game.game_ended:
+        game.play_ai_turn()
+    return players.index(game.winner) + 1, game.turn_count + 1, [len(p.call_history) for p in players]
+
+
+def test_matches_scalar_engine():
+    """tree戦略の一括シミュレーションが NumeronGame と同じ結果になることをテストする"""
+    print("=== 一括/逐次一致テスト ===")
+    if np is None:
+        print("numpy未インストールのためスキップ")
+        return
+    rng = random.Random(5)
+    secrets = [[rng.choice(numeron_scoring.UNIVERSE) for _ in range(2)] for _ in range(40)]
+    # 自分の番号が戦略木の推測と重なり、木を外れるゲームも含める
+    opening = numeron_scoring.index_of([1, 2, 3])
+    secrets += [[opening, secrets[0][1]], [secrets[1][0], opening]]
+    first = [i % 2 for i in range(len(secrets))]
+    results = simulate_batch(secrets, first, ("tree", "tree"))
+    for i, (pair, side) in enumerate(zip(secrets, first)):
+        winner, turns, calls = play_scalar(pair, side, ("tree", "tree"))
+        assert results['winner'][i] == winner
+        assert results['turns'][i] == turns
+        assert results['calls'][i].tolist() == calls
+    print("✅ 一括/逐次一致テスト完了")
+
+
+def test_random_policy():
+    """random戦略で全ゲームが正しく終わることをテストする"""
+    print("\n=== random戦略テスト ===")
+    if np is None:
+        print("numpy未インストールのためスキップ")
+        return
+    results = simulate(2000, seed=3, strategies=("random", "tree"), batch_size=512)
+    summary = summarize(results)
+    assert summary['games'] == 2000 and summary['unfinished'] == 0
+    # 勝者の最後のコールまでのコール数は、戦略木なら最悪7回
+    assert summary['max_calls'][1] <= 7
+    assert 0.3 < summary['win_rate'][0] < 0.6
+    # 同じシードなら同じ結果
+    again = simulate(2000, seed=3, strategies=("random", "tree"), batch_size=512)
+    assert (again['winner'] == results['winner']).all()
+    print(f"集計: {summary}")
+    print("✅ random戦略テスト完了")
+
+
+def test_secret_distribution():
+    """番号の分布が Player.generate_random_number と同じであることをテストする"""
+    print("\n=== 番号分布テスト ===")
+    if np is None:
+        print("numpy未インストールのためスキップ")
+        return
+    mapping = secret_map()
+    assert all(numeron_scoring.IN_UNIVERSE[i] for i in mapping.tolist())
+    expected = np.zeros(numeron_scoring.NUMBER_COUNT)
+    for number in numeron_scoring.ALL_NUMBERS:
+        digits = list(number) + [d for d in range(10) if d not in number]
+        if digits[0] == 0:
+            digits[0], digits[1] = digits[1], digits[0]
+        expected[numeron_scoring.index_of(digits[:3])] += 1
+    actual = np.bincount(mapping, minlength=numeron_scoring.NUMBER_COUNT)
+    assert (actual == expected).all()
+    print("✅ 番号分布テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_matches_scalar_engine()
+    test_random_policy()
+    test_secret_distribution()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
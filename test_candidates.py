@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+AI候補番号管理のテストスクリプト
+"""
+
+import sys
+import os
+import random
+from itertools import permutations
+sys.path.append(os.path.dirname(__file__))
+
+import numeron_scoring
+from numeron_candidates import CandidateSet
+from numeron_game import NumeronGame, GameMode, AIPlayer
+
+
+def backends():
+    """テスト対象の実装（純Python / numpy）"""
+    return [False, True] if numeron_scoring.np is not None else [False]
+
+
+def reference_filter(numbers, guess, eat, bite):
+    """従来の1件ずつの絞り込み（比較用）"""
+    return [n for n in numbers if numeron_scoring.calculate_eat_bite(n, guess) == (eat, bite)]
+
+
+def test_filter_matches_reference():
+    """一括絞り込みが従来の絞り込みと一致することをテストする"""
+    print("=== 候補絞り込みテスト ===")
+    rng = random.Random(1)
+    for use_numpy in backends():
+        for _ in range(20):
+            secret = numeron_scoring.number_at(rng.choice(numeron_scoring.UNIVERSE))
+            candidates = CandidateSet(use_numpy=use_numpy)
+            expected = candidates.numbers()
+            for _ in range(3):
+                guess = numeron_scoring.number_at(rng.randrange(numeron_scoring.NUMBER_COUNT))
+                eat, bite = numeron_scoring.calculate_eat_bite(secret, guess)
+                remaining = candidates.filter(guess, eat, bite)
+                expected = reference_filter(expected, guess, eat, bite)
+                assert candidates.numbers() == expected
+                assert remaining == len(expected)
+                assert secret in candidates
+    print("✅ 候補絞り込みテスト完了")
+
+
+def test_candidate_set_views():
+    """従来形式のビューと複製をテストする"""
+    print("\n=== 候補ビューテスト ===")
+    for use_numpy in backends():
+        candidates = CandidateSet.from_numbers([[1, 2, 3], [4, 5, 6]], use_numpy=use_numpy)
+        assert candidates.numbers() == [[1, 2, 3], [4, 5, 6]]
+        clone = candidates.copy()
+        clone.filter([1, 2, 3], 3, 0)
+        assert len(clone) == 1 and len(candidates) == 2
+        assert [4, 5, 6] not in clone and [4, 5, 6] in candidates
+    print("✅ 候補ビューテスト完了")
+
+
+def test_ai_possible_numbers():
+    """AIPlayer.possible_numbers が従来通り使えることをテストする"""
+    print("\n=== AI候補互換テスト ===")
+    ai = AIPlayer("テストAI")
+    assert len(ai.possible_numbers) == 648
+    ai.update_possible_numbers([1, 2, 3], 1, 1)
+    assert ai.possible_numbers == reference_filter(
+        [numeron_scoring.number_at(i) for i in numeron_scoring.UNIVERSE], [1, 2, 3], 1, 1)
+    ai.possible_numbers = [[9, 8, 7]]
+    assert ai.possible_numbers == [[9, 8, 7]]
+    ai.generate_all_possible_numbers()
+    assert len(ai.possible_numbers) == 648
+    print("✅ AI候補互換テスト完了")
+
+
+def test_item_constraints():
+    """アイテム効果の結果で候補が正しく絞り込まれることをテストする"""
+    print("\n=== アイテム絞り込みテスト ===")
+    game = NumeronGame(GameMode.SINGLE_PLAYER)
+    game.initialize_players()
+    human, ai = game.player1, game.player2
+    human.set_number([1, 6, 0])
+    ai.set_number([9, 8, 7])
+    for use_numpy in backends():
+        results = [
+            game.process_item_effect(ai, ai.items[1], human)['info'],                  # HIGH&LOW
+            game.process_item_effect(ai, ai.items[3], human)['info'],                  # SLASH
+            game.process_item_effect(ai, ai.items[2], human, target_digit=6)['info'],  # TARGET（含まれる）
+            game.process_item_effect(ai, ai.items[2], human, target_digit=3)['info'],  # TARGET（含まれない）
+        ]
+        assert results[0] == {'item': 'HIGH&LOW', 'pattern': 'LHL'}
+        assert results[1] == {'item': 'SLASH', 'slash': 6}
+        assert results[2] == {'item': 'TARGET', 'digit': 6, 'position': 1}
+        assert results[3] == {'item': 'TARGET', 'digit': 3, 'position': None}
+
+        candidates = CandidateSet(use_numpy=use_numpy)
+        sizes = [candidates.apply_item(info) for info in results]
+        expected = [n for n in (numeron_scoring.number_at(i) for i in numeron_scoring.UNIVERSE)
+                    if all(d < 5 for d in (n[0], n[2])) and n[1] >= 5
+                    and max(n) - min(n) == 6 and n[1] == 6 and 3 not in n]
+        assert candidates.numbers() == expected
+        assert [1, 6, 0] in candidates
+        assert not candidates.pristine
+        print(f"アイテム適用後の候補数: {sizes}")
+
+    # DOUBLEは使用者の番号が相手のAIに開示される
+    double = game.process_item_effect(human, human.items[0], ai)
+    game.share_item_info(human, ai, double)
+    position = double['info']['position']
+    assert all(n[position] == human.number[position] for n in ai.possible_numbers)
+    assert human.number in ai.possible_numbers
+    print("✅ アイテム絞り込みテスト完了")
+
+
+def test_expand_after_defense():
+    """相手のSHUFFLE/CHANGE後に候補が広がり、相手の番号を見失わないことをテストする"""
+    print("\n=== 防御後の候補拡張テスト ===")
+    game = NumeronGame(GameMode.SINGLE_PLAYER)
+    game.initialize_players()
+    human, ai = game.player1, game.player2
+    human.set_number([1, 6, 0])
+    ai.set_number([9, 8, 7])
+    for guess in ([1, 2, 3], [4, 5, 6]):
+        eat, bite = numeron_scoring.calculate_eat_bite(human.number, guess)
+        ai.update_possible_numbers(guess, eat, bite)
+        human.opponent_knowledge.observe_call(guess, eat, bite)
+    survivors = ai.possible_numbers
+
+    # SHUFFLE: 残り候補の全ての並べ替え
+    result = game.process_item_effect(human, human.items[4], ai)
+    game.share_item_info(human, ai, result)
+    expected = sorted({tuple(p) for n in survivors for p in permutations(n)})
+    assert [tuple(n) for n in ai.possible_numbers] == expected
+    assert human.number in ai.possible_numbers
+    # 相手の知識も同じように広がる
+    assert len(human.opponent_knowledge.candidates) == len(expected)
+    print(f"SHUFFLE: {len(survivors)} → {len(ai.possible_numbers)} 候補")
+
+    # 以降のコールは広げた候補に対してのみ適用する
+    eat, bite = numeron_scoring.calculate_eat_bite(human.number, [0, 1, 6])
+    ai.update_possible_numbers([0, 1, 6], eat, bite)
+    assert human.number in ai.possible_numbers
+    survivors = ai.possible_numbers
+
+    # CHANGE: 交換した桁だけを、HIGH/LOWを保った数字で置き換えたもの
+    result = game.process_item_effect(human, human.items[5], ai)
+    game.share_item_info(human, ai, result)
+    pos = result['info']['position']
+    expected = sorted({tuple(n[:pos] + [d] + n[pos + 1:]) for n in survivors for d in range(10)
+                       if d not in n and (d >= 5) == (n[pos] >= 5)} | {tuple(n) for n in survivors})
+    assert [tuple(n) for n in ai.possible_numbers] == expected
+    assert human.number in ai.possible_numbers
+    print(f"CHANGE: {len(survivors)} → {len(ai.possible_numbers)} 候補")
+
+    # 並べ替え・交換で先頭が0になった番号も見失わない
+    game = NumeronGame(GameMode.SINGLE_PLAYER)
+    game.initialize_players()
+    human, ai = game.player1, game.player2
+    human.set_number([1, 0, 2])
+    ai.possible_numbers = [[1, 0, 2]]
+    human.number = [0, 1, 2]
+    game.share_item_info(human, ai, {'info': {'item': 'SHUFFLE'}})
+    assert human.number in ai.possible_numbers
+    human.number = [0, 3, 2]
+    game.share_item_info(human, ai, {'info': {'item': 'CHANGE', 'position': 1, 'high': False}})
+    assert human.number in ai.possible_numbers
+    print("✅ 防御後の候補拡張テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_filter_matches_reference()
+    test_candidate_set_views()
+    test_ai_possible_numbers()
+    test_item_constraints()
+    test_expand_after_defense()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
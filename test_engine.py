@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+入出力なしのゲーム進行APIのテストスクリプト
+"""
+
+import sys
+import os
+import builtins
+sys.path.append(os.path.dirname(__file__))
+
+from numeron_game import NumeronGame, GameMode, AIPlayer, parse_number
+
+
+def forbid_console():
+    """input() / print() を呼ぶと失敗するようにする"""
+    def fail(*args, **kwargs):
+        raise AssertionError("エンジンがコンソール入出力を使用しました")
+    originals = (builtins.input, builtins.print)
+    builtins.input = fail
+    builtins.print = fail
+    return originals
+
+
+def restore_console(originals):
+    """input() / print() を元に戻す"""
+    builtins.input, builtins.print = originals
+
+
+def test_parse_number():
+    """番号入力の検証をテストする"""
+    print("=== 番号入力検証テスト ===")
+    assert parse_number(" 012 ") == [0, 1, 2]
+    for text, message in (("12", "3桁の数字を入力してください"),
+                          ("1a3", "3桁の数字を入力してください"),
+                          ("113", "数字の重複は禁止です")):
+        try:
+            parse_number(text)
+        except ValueError as e:
+            assert str(e) == message
+        else:
+            raise AssertionError(f"{text} が受け付けられました")
+    print("✅ 番号入力検証テスト完了")
+
+
+def test_scripted_game():
+    """人間同士の対戦を構造化結果だけで進行できることをテストする"""
+    print("\n=== スクリプト対戦テスト ===")
+    game = NumeronGame(GameMode.TWO_PLAYER)
+    game.start([1, 2, 3], [4, 5, 6])
+    p1, p2 = game.player1, game.player2
+
+    originals = forbid_console()
+    try:
+        assert game.submit_guess([1, 1, 2]) == {'ok': False, 'error': "数字の重複は禁止です"}
+        result = game.submit_guess([4, 6, 0])
+        assert result['ok'] and (result['eat'], result['bite']) == (1, 1)
+        assert result['next_player'] == p2.name and game.current_player is p2
+
+        # 同じターンにアイテムは1回まで
+        result = game.use_item("HIGH&LOW")
+        assert result['ok'] and result['info'] == {'item': 'HIGH&LOW', 'pattern': 'LLL'}
+        assert not game.use_item("SLASH")['ok']
+        assert not game.use_item("HIGH&LOW")['ok']
+        result = game.submit_guess([1, 2, 4])
+        assert result['item_used'] == "HIGH&LOW" and result['next_player'] == p1.name
+
+        # DOUBLE: 同じプレイヤーが2回続けてコールし、2回目はアイテム使用不可
+        result = game.use_item("DOUBLE")
+        assert result['ok'] and result['info']['digit'] == p1.number[result['info']['position']]
+        result = game.submit_guess([7, 8, 9])
+        assert result['double_remaining'] == 1 and game.current_player is p1
+        assert not game.use_item("TARGET")['ok']
+        result = game.submit_guess([4, 5, 6])
+        assert result['game_ended'] and result['winner'] == p1.name and game.winner is p1
+        assert [call['guess'] for call in p1.call_history] == [[4, 6, 0], [7, 8, 9], [4, 5, 6]]
+
+        assert game.submit_guess([1, 2, 3]) == {'ok': False, 'error': "ゲームは終了しています"}
+    finally:
+        restore_console(originals)
+    print("✅ スクリプト対戦テスト完了")
+
+
+def test_give_up():
+    """ギブアップで相手の勝利になることをテストする"""
+    print("\n=== ギブアップテスト ===")
+    game = NumeronGame(GameMode.TWO_PLAYER)
+    game.start([1, 2, 3], [4, 5, 6])
+    result = game.give_up()
+    assert result == {'ok': True, 'player': game.player1.name, 'winner': game.player2.name, 'answer': [4, 5, 6]}
+    assert game.game_ended and game.winner is game.player2
+    print("✅ ギブアップテスト完了")
+
+
+def test_ai_vs_ai():
+    """AI同士の対戦を入出力なしで最後まで進行できることをテストする"""
+    print("\n=== AI同士の対戦テスト ===")
+    turns = []
+    for _ in range(5):
+        game = NumeronGame(GameMode.SINGLE_PLAYER)
+        game.player1 = AIPlayer("AI1", strategy="entropy")
+        game.player2 = AIPlayer("AI2", strategy="minimax")
+        game.start()
+        originals = forbid_console()
+        try:
+            while not game.game_ended and game.turn_count < 40:
+                events = game.play_ai_turn()
+                assert events and all(event['ok'] for event in events)
+        finally:
+            restore_console(originals)
+        assert game.game_ended
+        loser = game.get_opponent()
+        assert game.winner.call_history[-1]['guess'] == loser.number
+        turns.append(game.turn_count + 1)
+    print(f"対戦ターン数: {turns}")
+    print("✅ AI同士の対戦テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_parse_number()
+    test_scripted_game()
+    test_give_up()
+    test_ai_vs_ai()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
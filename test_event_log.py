@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+ログの非同期出力のテストスクリプト
+"""
+
+import sys
+import os
+import json
+import time
+import logging
+import random
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import event_log
+from event_log import SamplingFilter, log_event
+from web_test_helper import WORK_DIR, in_work_dir, new_client
+
+
+def read_events(path, count, game_id=None, timeout=5.0):
+    """書き込みスレッドが count 件を書き込むまで待って、JSONのイベントを返す（game_id で絞り込む）"""
+    deadline = time.monotonic() + timeout
+    while True:
+        events = []
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                events = [json.loads(line) for line in f if line.strip()]
+        if game_id is not None:
+            events = [event for event in events if event.get('game_id') == game_id]
+        if len(events) >= count or time.monotonic() > deadline:
+            return events
+        time.sleep(0.01)
+
+
+def restore_app_logging():
+    """Webアプリを読み込み済みなら、アプリのログ設定に戻す"""
+    if 'app' in sys.modules:
+        web = sys.modules['app']
+        with in_work_dir():
+            web.setup_logging(web.app)
+
+
+def test_game_events():
+    """ゲームの操作がJSONのイベントとして記録されることをテストする"""
+    print("=== 操作イベントテスト ===")
+    restore_app_logging()
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, game_id = setup
+    client.post(f'/api/games/{game_id}/guess', json={'guess': '340'})
+    client.post(f'/api/games/{game_id}/item', json={'item_name': 'SLASH'})
+    guess, item = read_events(os.path.join(WORK_DIR, web.app.config['LOG_FILE']), 2, game_id)[:2]
+    assert guess['action'] == 'guess' and guess['guess'] == '340' and (guess['eat'], guess['bite']) == (0, 2)
+    assert guess['player'] == 'player1' and guess['level'] == 'INFO' and 'ts' in guess
+    assert item['action'] == 'item' and item['item'] == 'SLASH' and 'eat' not in item
+    print("✅ 操作イベントテスト完了")
+
+
+def test_rotation_and_sampling():
+    """サイズでの切り替え・DEBUGの間引き・満杯時に捨てることをテストする"""
+    print("\n=== 切り替え・間引きテスト ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'events.log')
+        event_log.setup_logging(logging.DEBUG, path, max_bytes=2000, backup_count=2, sample_rate=0.1,
+                                stream=False)
+        for i in range(100):
+            log_event('guess', game_id=f"g{i}", eat=i % 4, think_time_ms=None)
+        # テキスト形式の出力場所（[in ...]）は log_event() ではなく呼び出し元
+        records = []
+        capture = logging.Handler()
+        capture.emit = records.append
+        event_log.logger.addHandler(capture)
+        try:
+            log_event('guess', game_id="caller")
+        finally:
+            event_log.logger.removeHandler(capture)
+        assert os.path.basename(records[0].pathname) == 'test_event_log.py'
+        for i in range(1000):
+            log_event('save', logging.DEBUG, game_id=f"g{i}")
+        stats = event_log.stats()
+        assert stats['dropped'] == 0 and 800 < stats['sampled_out'] < 960
+        event_log.shutdown()  # 残りを書き込む
+        files = sorted(os.listdir(directory))
+        assert files == ['events.log', 'events.log.1', 'events.log.2']
+        assert all(os.path.getsize(os.path.join(directory, name)) <= 2000 for name in files)
+        last = read_events(path, 1)[-1]
+        assert last['action'] == 'save' and 'think_time_ms' not in last
+
+        # 書き込みが遅くてもログを出すスレッドは待たない
+        event_log.setup_logging(logging.INFO, path, max_queue=10, stream=False)
+        slow = logging.Handler()
+        slow.emit = lambda record: time.sleep(0.05)
+        event_log._listener.handlers = (slow,)
+        started = time.perf_counter()
+        for i in range(50):
+            log_event('guess', game_id=f"g{i}")
+        assert time.perf_counter() - started < 0.05
+        assert event_log.stats()['dropped'] >= 30
+        event_log.shutdown()
+
+    sampler = SamplingFilter(0.25, rng=random.Random(0))
+    record = logging.LogRecord('x', logging.DEBUG, __file__, 0, 'debug', None, None)
+    kept = sum(sampler.filter(record) for _ in range(1000))
+    assert 200 < kept < 300 and sampler.sampled_out == 1000 - kept
+    record.levelno = logging.INFO
+    assert sampler.filter(record)
+    restore_app_logging()
+    print("✅ 切り替え・間引きテスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_game_events()
+    test_rotation_and_sampling()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+ゲーム記録の保存のテストスクリプト
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from game_records import GameRecorder, game_record, database_path
+
+
+def finished_state(winner):
+    """終了したゲーム状態（Webのゲーム状態と同じ形式）"""
+    return {
+        'game_mode': 'single', 'turn': 3, 'winner': winner, 'started_at': 100.0,
+        'player1_history': [
+            {'guess': [1, 2, 3], 'eat': 0, 'bite': 1, 'effect': ''},
+            {'guess': None, 'eat': 0, 'bite': 0, 'effect': 'SLASHアイテム: スラッシュナンバー: 5'},
+            {'guess': [4, 5, 6], 'eat': 3, 'bite': 0, 'effect': ''},
+        ],
+        'player2_history': [{'guess': [7, 8, 9], 'eat': 0, 'bite': 0, 'effect': '', 'think_time': 0.01}],
+    }
+
+
+def test_game_record():
+    """ゲーム状態から記録を作成できることをテストする"""
+    print("=== 記録作成テスト ===")
+    record = game_record("g1", finished_state('プレイヤー1'), ("alice", "ai:entropy"), ended_at=200.0)
+    assert record['game'] == ("g1", 'single', "alice", "ai:entropy", 1, "alice", 'eat', 3, 100.0, 200.0)
+    assert record['calls'] == [("g1", 1, 0, "123", 0, 1, None), ("g1", 1, 2, "456", 3, 0, None),
+                               ("g1", 2, 0, "789", 0, 0, 0.01)]
+    assert record['item_uses'] == [("g1", 1, 1, "SLASH", 'SLASHアイテム: スラッシュナンバー: 5')]
+    assert database_path("sqlite:///numeron.db") == os.path.abspath("numeron.db")
+    print("✅ 記録作成テスト完了")
+
+
+def test_batched_writes():
+    """待ち行列の記録がまとめて書き込まれ、履歴とランキングを読めることをテストする"""
+    print("\n=== まとめ書きテスト ===")
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = GameRecorder(os.path.join(directory, 'records.db'), batch_size=50, flush_interval=0.2)
+        for i in range(120):
+            winner = 'プレイヤー1' if i % 3 else 'AI'
+            player = f"p{i % 4}"
+            recorder.record(game_record(f"g{i}", finished_state(winner), (player, "ai:entropy"),
+                                        ended_at=1000.0 + i))
+        recorder.flush()
+        stats = recorder.stats()
+        assert stats['written'] == 120 and stats['queued'] == 0
+        assert stats['batches'] < 120  # 1件ずつではなくまとめて書き込む
+
+        games = recorder.player_games("p1", limit=5)
+        assert [game['id'] for game in games] == ["g117", "g113", "g109", "g105", "g101"]
+        assert len(recorder.game_calls("g1")) == 3
+        board = recorder.leaderboard(limit=2)
+        assert board[0] == {'player_id': "ai:entropy", 'wins': 40}
+        assert board[1]['wins'] == 20
+
+        with recorder.connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            plan = ' '.join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM games WHERE player1_id = ? ORDER BY ended_at DESC", ("p1",)))
+            assert 'games_player1' in plan
+        assert recorder.stats()['pooled_connections'] == 1  # 読み込み用の接続は使い回す
+        recorder.close()
+        assert not recorder.record(game_record("late", finished_state(None)))
+    print(f"カウンタ: {stats}")
+    print("✅ まとめ書きテスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_game_record()
+    test_batched_writes()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
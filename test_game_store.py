@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Webバックエンドのゲーム状態ストアのテストスクリプト
+"""
+
+import sys
+import os
+import tempfile
+import time
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from game_store import MemoryGameStore, SQLiteGameStore, ConflictError, HashRing, create_game_store
+from web_test_helper import load_app
+
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_memory_store():
+    """プロセス内ストアのLRU・TTLによる削除をテストする"""
+    print("=== メモリストアテスト ===")
+    clock = FakeClock()
+    store = MemoryGameStore(max_games=3, ttl=60, clock=clock)
+    for i in range(3):
+        store.put(f"g{i}", {'turn': i})
+    assert store.get("g0") == {'turn': 0}  # g0 を最近使用にする
+    store.put("g3", {'turn': 3})
+    assert store.get("g1") is None  # 最も古い g1 が削除される
+    assert len(store) == 3
+
+    clock.now += 30
+    assert store.get("g0") is not None  # アクセスで期限が延びる
+    clock.now += 45
+    assert store.get("g2") is None and store.get("g3") is None
+    assert store.get("g0") == {'turn': 0}
+    # 取得・保存した辞書を変更してもストアの状態は変わらない
+    state = store.get("g0")
+    state['turn'] = 9
+    assert store.get("g0") == {'turn': 0}
+    store.put("g0", state)
+    state['turn'] = 10
+    assert store.get("g0") == {'turn': 9}
+    store.delete("g0")
+    assert store.get("g0") is None
+    print("✅ メモリストアテスト完了")
+
+
+def test_sqlite_store():
+    """SQLiteストアの保存・読み込み・期限切れをテストする"""
+    print("\n=== SQLiteストアテスト ===")
+    clock = FakeClock()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'games.db')
+        store = SQLiteGameStore(path, ttl=60, clock=clock)
+        state = {'game_mode': 'single', 'player1_history': [{'guess': [1, 2, 3], 'eat': 0, 'bite': 1}],
+                 'message': '推測: 123'}
+        store.put("a", state)
+        # 別のストア（別ワーカー相当）からも読める
+        assert SQLiteGameStore(path, ttl=60, clock=clock).get("a") == state
+        clock.now += 61
+        assert store.get("a") is None and len(store) == 0
+        assert isinstance(create_game_store(f"sqlite:///{path}"), SQLiteGameStore)
+    assert isinstance(create_game_store("memory://"), MemoryGameStore)
+    print("✅ SQLiteストアテスト完了")
+
+
+def add_moves(path, moves):
+    """別ワーカー相当のプロセスで、読み込み→追加→バージョン付き保存を繰り返す（競合したらやり直す）"""
+    store = SQLiteGameStore(path)
+    retries = 0
+    for move in moves:
+        while True:
+            version, state = store.get_versioned("shared")
+            state['moves'].append(move)
+            try:
+                store.put("shared", state, version)
+                break
+            except ConflictError:
+                retries += 1
+    return retries
+
+
+def test_optimistic_versions():
+    """バージョン付き保存の競合検出と、複数プロセスから同じゲームを更新しても操作が失われないことをテストする"""
+    print("\n=== バージョン付き保存テスト ===")
+    store = MemoryGameStore()
+    assert store.put("m", {'turn': 1}, 0) == 1 and store.get_versioned("m") == (1, {'turn': 1})
+    assert store.put("m", {'turn': 2}, 1) == 2
+    for version in (0, 1):
+        try:
+            store.put("m", {'turn': 3}, version)
+            assert False, "ConflictErrorが発生しませんでした"
+        except ConflictError:
+            pass
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'games.db')
+        worker1, worker2 = SQLiteGameStore(path), SQLiteGameStore(path)
+        assert worker1.put("a", {'turn': 1}, 0) == 1
+        version, state = worker1.get_versioned("a")
+        _, other = worker2.get_versioned("a")
+        assert worker2.put("a", dict(other, turn=2), version) == 2
+        try:
+            worker1.put("a", dict(state, turn=3), version)  # worker2 の保存を上書きしない
+            assert False, "ConflictErrorが発生しませんでした"
+        except ConflictError:
+            pass
+        assert worker1.get_versioned("a") == (2, {'turn': 2})
+        assert worker1.put("a", {'turn': 4}) == 3  # バージョンを指定しなければ上書き
+
+        worker1.put("shared", {'moves': []}, 0)
+        chunks = [[f"{worker}-{i}" for i in range(25)] for worker in range(4)]
+        with ProcessPoolExecutor(4) as pool:
+            retries = sum(pool.map(add_moves, [path] * 4, chunks))
+        version, state = worker1.get_versioned("shared")
+        assert sorted(state['moves']) == sorted(move for chunk in chunks for move in chunk)
+        assert version == 101
+        print(f"競合によるやり直し: {retries}回")
+
+        # バージョン番号の無い以前のデータベースも読める
+        legacy = os.path.join(directory, 'legacy.db')
+        with sqlite3.connect(legacy) as conn:
+            conn.execute("CREATE TABLE games (id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)")
+            conn.execute("INSERT INTO games VALUES ('old', '{\"turn\": 5}', 1e12)")
+        conn.close()
+        assert SQLiteGameStore(legacy).get_versioned("old") == (1, {'turn': 5})
+    print("✅ バージョン付き保存テスト完了")
+
+
+def test_hash_ring():
+    """コンシステントハッシュの振り分けが均等で、ワーカーの追加で移るゲームが少ないことをテストする"""
+    print("\n=== 振り分けテスト ===")
+    ring = HashRing(["web1", "web2", "web3"])
+    keys = [f"game{i}" for i in range(3000)]
+    counts = {}
+    for key in keys:
+        counts[ring.node_for(key)] = counts.get(ring.node_for(key), 0) + 1
+    assert set(counts) == {"web1", "web2", "web3"} and min(counts.values()) > 600
+    grown = HashRing(["web1", "web2", "web3", "web4"])
+    moved = sum(ring.node_for(key) != grown.node_for(key) for key in keys)
+    assert moved < len(keys) * 0.4  # 移るのは新しいワーカーの担当分（約1/4）だけ
+    assert all(grown.node_for(key) == "web4" for key in keys if ring.node_for(key) != grown.node_for(key))
+    print("✅ 振り分けテスト完了")
+
+
+def test_cookie_holds_only_game_id():
+    """クッキーにはゲームIDのみが保存され、ゲームが進んでも大きくならないことをテストする"""
+    print("\n=== セッションクッキーテスト ===")
+    web = load_app()
+    if web is None:
+        return
+    client = web.app.test_client()
+    client.get('/game?mode=single')
+    cookie = client.get_cookie('session').value
+    game_id = web.app.session_interface.get_signing_serializer(web.app).loads(cookie)['game_id']
+    state = web.game_store.get(game_id)
+    state['player2_number'] = [6, 3, 4]  # AIの番号を固定する
+    web.game_store.put(game_id, state)
+    for digits in ('084', '123', '569', '702'):
+        response = client.post('/game', data={'action': 'guess', 'digit1': digits[0],
+                                              'digit2': digits[1], 'digit3': digits[2]})
+        assert response.status_code == 200
+        # 状態はサーバー側に保存されるのでクッキーは再発行されない
+        assert 'Set-Cookie' not in response.headers
+        # AIの推測が間に合わなかった場合は、画面を開き直すと適用される
+        for _ in range(100):
+            if 'data-ai-ticket' not in response.get_data(as_text=True):
+                break
+            time.sleep(0.05)
+            response = client.get('/game?mode=single')
+        assert 'data-ai-ticket' not in response.get_data(as_text=True)
+    assert client.get_cookie('session').value == cookie
+    state = web.game_store.get(game_id)
+    # 1人用ではコールのたびにAIも1回コールする
+    assert len(state['player1_history']) == len(state['player2_history']) >= 1
+    assert state['player1_history'][0]['eat'] == 1
+    assert "1EAT 0BITE" in client.get('/game?mode=single').get_data(as_text=True)
+
+    # 新しいゲームでは新しいIDになり、古い状態は削除される
+    client.get('/game?mode=single&new=true')
+    assert web.game_store.get(game_id) is None
+    print("✅ セッションクッキーテスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_memory_store()
+    test_sqlite_store()
+    test_optimistic_versions()
+    test_hash_ring()
+    test_cookie_holds_only_game_id()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+メトリクス（/metrics）のテストスクリプト
+"""
+
+import sys
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from metrics import Registry
+from web_test_helper import new_client
+
+
+def sample(text, name):
+    """テキスト形式から1つの値を取り出す（無ければNone）"""
+    match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def new_registry(directory=None):
+    registry = Registry(directory)
+    requests = registry.counter('requests_total', "リクエスト数", ['action'])
+    latency = registry.histogram('latency_seconds', "処理時間", ['action'], buckets=(0.01, 0.1))
+    registry.gauge('active_games', "ゲーム数", function=lambda: 7)
+    return registry, requests, latency
+
+
+def worker_observe(directory):
+    """別ワーカー相当のプロセスで記録して書き出す"""
+    registry, requests, latency = new_registry(directory)
+    for value in (0.005, 0.05, 0.5):
+        requests.inc(action='guess')
+        latency.observe(value, action='guess')
+    registry.write()
+    return os.getpid()
+
+
+def test_exposition_format():
+    """Counter / Histogram / Gauge のテキスト形式をテストする"""
+    print("=== テキスト形式テスト ===")
+    registry, requests, latency = new_registry()
+    requests.inc(action='guess')
+    requests.inc(2, action='item')
+    for value in (0.005, 0.01, 0.05, 3.0):
+        latency.observe(value, action='guess')
+    with latency.time(action='render'):
+        pass
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text and '# TYPE latency_seconds histogram' in text
+    assert sample(text, 'requests_total{action="item"}') == 2
+    assert sample(text, 'latency_seconds_bucket{action="guess",le="0.01"}') == 2  # 上限を含む
+    assert sample(text, 'latency_seconds_bucket{action="guess",le="0.1"}') == 3
+    assert sample(text, 'latency_seconds_bucket{action="guess",le="+Inf"}') == 4
+    assert sample(text, 'latency_seconds_count{action="guess"}') == 4
+    assert abs(sample(text, 'latency_seconds_sum{action="guess"}') - 3.065) < 1e-9
+    assert sample(text, 'latency_seconds_count{action="render"}') == 1
+    assert sample(text, f'active_games{{worker="{os.getpid()}"}}') == 7
+    try:
+        requests.inc()
+        assert False, "ラベルが足りない場合はValueError"
+    except ValueError:
+        pass
+    print("✅ テキスト形式テスト完了")
+
+
+def test_multi_worker_merge():
+    """複数ワーカーの値が合算され、終了したワーカーのGaugeは捨てられることをテストする"""
+    print("\n=== 複数ワーカーテスト ===")
+    with tempfile.TemporaryDirectory() as directory:
+        with ProcessPoolExecutor(2) as pool:
+            pids = set(pool.map(worker_observe, [directory] * 4))
+        registry, requests, latency = new_registry(directory)
+        requests.inc(action='guess')
+        text = registry.render()
+        assert sample(text, 'requests_total{action="guess"}') == 3 * len(pids) + 1
+        assert sample(text, 'latency_seconds_bucket{action="guess",le="0.1"}') == 2 * len(pids)
+        # 終了したワーカーの現在値は出さない
+        assert text.count('active_games{') == 1
+        assert sorted(os.listdir(directory)) == sorted(f"{pid}.json" for pid in pids | {os.getpid()})
+    print("✅ 複数ワーカーテスト完了")
+
+
+def test_metrics_endpoint():
+    """/metrics に操作ごとの処理時間・テンプレート・AIの思考時間などが出ることをテストする"""
+    print("\n=== /metrics テスト ===")
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, game_id = setup
+    before = sample(web.registry.render(), 'numeron_handler_seconds_count{handler="api_guess"}') or 0
+    client.post(f'/api/games/{game_id}/guess', json={'guess': '340'})
+    # JSON API の操作も処理時間を記録する
+    assert sample(web.registry.render(), 'numeron_handler_seconds_count{handler="api_guess"}') == before + 1
+    client.post('/game', data={'action': 'guess', 'digit1': '1', 'digit2': '5', 'digit3': '8'})
+    client.get('/game?mode=single&new=true')
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    for name in ('numeron_request_seconds_count{action="api_guess"}',
+                 'numeron_request_seconds_count{action="game_guess"}',
+                 'numeron_handler_seconds_count{handler="handle_guess"}',
+                 'numeron_handler_seconds_count{handler="render_game_page"}',
+                 'numeron_template_render_seconds_count{template="game_with_items.html"}',
+                 'numeron_session_bytes_count', 'numeron_game_state_bytes_count',
+                 'numeron_evicted_games_total'):
+        assert sample(text, name) is not None, name
+    assert sample(text, 'numeron_handler_seconds_count{handler="handle_guess"}') >= 1
+    assert sample(text, f'numeron_active_games{{worker="{os.getpid()}"}}') >= 1
+    assert '# TYPE numeron_ai_think_seconds histogram' in text
+    print("✅ /metrics テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_exposition_format()
+    test_multi_worker_merge()
+    test_metrics_endpoint()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+オンライン2人対戦（ルーム・イベント配信）のテストスクリプト
+"""
+
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from rooms import RoomRegistry, RoomError, event_stream, benchmark, MAX_PENDING_EVENTS
+from web_test_helper import load_app
+
+
+def test_registry():
+    """ルームの作成・参加・満員・配信をテストする"""
+    print("=== ルームテスト ===")
+    registry = RoomRegistry()
+    room = registry.create("alice", {'game_mode': 'two'})
+    assert registry.get(room.id) is room and len(registry) == 1
+    subscriber = room.subscribe()
+    assert registry.join(room.id, "alice") == (room, 1)  # 作成者は席1のまま
+    assert registry.join(room.id, "bob") == (room, 2)
+    assert subscriber.get_nowait() == ('joined', {'seat': 2})
+    assert registry.join(room.id, "bob") == (room, 2)
+    for player_id, room_id in (("carol", room.id), ("carol", "missing")):
+        try:
+            registry.join(room_id, player_id)
+            assert False, "RoomErrorが発生しませんでした"
+        except RoomError:
+            pass
+
+    # 受け取りが追いつかない購読者は切断する
+    for i in range(MAX_PENDING_EVENTS + 1):
+        room.publish('move', {'i': i})
+    assert room.subscribers == [] and subscriber.qsize() == 1
+    stream = event_stream(room, subscriber)
+    assert next(stream).startswith("retry:") and list(stream) == []  # 切断の通知で終了する
+
+    subscriber = room.subscribe()
+    stream = event_stream(room, subscriber, heartbeat=0.01)
+    next(stream)
+    assert next(stream) == ": keep-alive\n\n"
+    registry.remove(room.id)
+    assert next(stream) == "event: closed\ndata: {}\n\n"
+    assert registry.get(room.id) is None
+    print("✅ ルームテスト完了")
+
+
+def test_quick_match_and_eviction():
+    """クイックマッチの組み合わせ・相手待ちの一覧・操作の無いルームの削除をテストする"""
+    print("\n=== クイックマッチ・削除テスト ===")
+    now = [0.0]
+    registry = RoomRegistry(max_rooms=3, idle_timeout=60, clock=lambda: now[0])
+    new_state = lambda: {'game_mode': 'two'}  # noqa: E731
+    first, seat = registry.quick_match("alice", new_state)
+    assert seat == 1 and first.public and registry.quick_match("alice", new_state) == (first, 1)
+    now[0] = 5
+    second, _ = registry.quick_match("bob", new_state)
+    assert second is first and second.players == ["alice", "bob"]
+    private = registry.create("carol", new_state())  # URLで招待するルームは一覧に出さない
+    waiting, _ = registry.quick_match("dave", new_state)
+    assert waiting is not private and registry.list_waiting() == [{'room_id': waiting.id, 'waiting_seconds': 0.0}]
+    assert registry.join(waiting.id, "erin") == (waiting, 2) and registry.list_waiting() == []
+
+    # 最大数を超えたら最終操作の古いルームから削除する
+    now[0] = 10
+    registry.get(first.id)
+    subscriber = private.subscribe()
+    newest = registry.create("frank", new_state())
+    assert registry.get(private.id) is None and subscriber.get_nowait() == ('closed', {})
+    assert registry.get(first.id) is first and len(registry) == 3
+    now[0] = 65  # first と newest 以外は60秒以上操作なし
+    assert registry.evict_idle() == 1 and registry.get(waiting.id) is None
+    stats = registry.stats()
+    assert stats['rooms'] == 2 and stats['matched'] == 1 and stats['evicted'] == 2
+
+    result = benchmark(200, new_state)
+    assert result['rooms'] == result['evicted'] == 200
+    print(f"1ルームあたり {result['bytes_per_room']:.0f}バイト、取得 {result['get_us']:.2f}µs")
+    print("✅ クイックマッチ・削除テスト完了")
+
+
+def test_sweeper():
+    """ルームの作成・参加が無くても、一定間隔で操作の無いルームを削除することをテストする"""
+    print("\n=== 定期削除テスト ===")
+    now = [0.0]
+    registry = RoomRegistry(idle_timeout=60, clock=lambda: now[0])
+    room = registry.create("alice", {'game_mode': 'two'})
+    subscriber = room.subscribe()
+    registry.start_sweeper(0.01)
+    registry.start_sweeper(0.01)  # 2回目は何もしない
+    try:
+        time.sleep(0.05)
+        assert len(registry) == 1
+        now[0] = 61
+        assert subscriber.get(timeout=5) == ('closed', {})
+        assert len(registry) == 0 and registry.stats()['evicted'] == 1
+    finally:
+        registry.stop_sweeper()
+    print("✅ 定期削除テスト完了")
+
+
+def read_event(stream):
+    """SSEのストリームから次のイベントを読む（キープアライブは読み飛ばす）"""
+    while True:
+        chunk = next(stream).decode()
+        if chunk.startswith("event:"):
+            event, data = chunk.strip().split("\n")
+            return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_online_match():
+    """2つのクライアントで対戦し、相手の操作がイベントで届くことをテストする"""
+    print("\n=== オンライン対戦テスト ===")
+    web = load_app()
+    if web is None:
+        return
+    host, guest, stranger = (web.app.test_client() for _ in range(3))
+    location = host.get('/room/new').headers['Location']
+    room_id = location.rsplit('/', 1)[1]
+    api = f'/api/rooms/{room_id}'
+    assert room_id in host.get(location).get_data(as_text=True)
+    host_events = host.get(f'{api}/events', buffered=False)
+    host_stream = iter(host_events.response)
+    assert host_events.mimetype == 'text/event-stream' and next(host_stream).startswith(b"retry:")
+
+    assert 'data-room-id' in guest.get(location).get_data(as_text=True)
+    assert read_event(host_stream) == ('joined', {'seat': 2})
+    stranger.get(location)  # 満員ならメニューに戻る
+    assert stranger.post(f'{api}/guess', json={'guess': '123'}).status_code == 404
+
+    assert host.post(f'{api}/number', json={'number': '158'}).get_json() == {'ok': True, 'ready': False}
+    assert not guest.post(f'{api}/number', json={'number': '112'}).get_json()['ok']
+    assert guest.post(f'{api}/number', json={'number': '634'}).get_json()['ready']
+    assert read_event(host_stream) == ('ready', {})
+    page = guest.get(location).get_data(as_text=True)
+    assert f'data-api-base="{api}"' in page and 'data-seat="2"' in page
+
+    # 手番でないプレイヤーは操作できない
+    response = guest.post(f'{api}/guess', json={'guess': '123'})
+    assert response.status_code == 400 and response.get_json()['error'] == 'あなたの手番ではありません'
+    delta = host.post(f'{api}/guess', json={'guess': '340'}).get_json()
+    assert delta['ok'] and delta['current_player'] == 'プレイヤー2'
+    event, pushed = read_event(host_stream)
+    assert event == 'move' and pushed == delta
+
+    guest_events = guest.get(f'{api}/events', buffered=False)
+    guest_stream = iter(guest_events.response)
+    next(guest_stream)
+    delta = guest.post(f'{api}/guess', json={'guess': [1, 5, 8]}).get_json()
+    assert delta['game_ended'] and delta['winner'] == 'プレイヤー2'
+    assert read_event(host_stream) == ('move', delta) == read_event(guest_stream)
+
+    state = guest.get(f'{api}/state').get_json()
+    assert state['seat'] == 2 and state['number'] == [6, 3, 4] and 'player1_number' not in state
+    web.game_recorder.flush()
+    game = host.get('/api/players/me/games').get_json()[0]
+    assert game['id'] == room_id and game['mode'] == 'two' and game['winner'] == 2
+    host_events.close()
+    guest_events.close()
+
+    # クイックマッチは相手待ちのプレイヤーと組む
+    waiting = host.post('/api/rooms/quick').get_json()
+    assert waiting['seat'] == 1 and host.get('/api/rooms').get_json()['waiting'][0]['room_id'] == waiting['room_id']
+    assert guest.get('/room/quick').headers['Location'].endswith(waiting['url'])
+    assert web.rooms.get(waiting['room_id']).players[1] is not None
+
+    # 複数ワーカー（ROOMS_ENABLED=False）ではルームを使えない
+    web.app.config['ROOMS_ENABLED'] = False
+    try:
+        assert 'オンライン対戦' not in host.get('/').get_data(as_text=True)
+        assert host.get('/room/new').headers['Location'].endswith('/')
+        response = host.post('/api/rooms/quick')
+        assert response.status_code == 503 and not response.get_json()['ok']
+        assert host.get(f'{api}/state').status_code == 503
+    finally:
+        web.app.config['ROOMS_ENABLED'] = True
+    print("✅ オンライン対戦テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_registry()
+    test_quick_match_and_eviction()
+    test_sweeper()
+    test_online_match()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+EAT/BITE判定テーブルのテストスクリプト
+"""
+
+import sys
+import os
+import timeit
+sys.path.append(os.path.dirname(__file__))
+
+import numeron_scoring
+from numeron_game import NumeronGame, GameMode, AIPlayer
+
+
+def reference_eat_bite(answer, guess):
+    """従来のEAT/BITE計算（比較用）"""
+    eat = sum(a == g for a, g in zip(answer, guess))
+    bite = sum(min(answer.count(d), guess.count(d)) for d in set(guess)) - eat
+    return eat, bite
+
+
+def test_index_mapping():
+    """番号とインデックスの対応をテストする"""
+    print("=== インデックス対応テスト ===")
+    assert numeron_scoring.NUMBER_COUNT == 720
+    assert len(numeron_scoring.UNIVERSE) == 648
+    for index in (0, 1, 100, 719):
+        number = numeron_scoring.number_at(index)
+        assert numeron_scoring.index_of(number) == index
+    assert numeron_scoring.index_of([1, 1, 2]) is None
+
+    ai = AIPlayer("テストAI")
+    universe = [numeron_scoring.number_at(i) for i in numeron_scoring.UNIVERSE]
+    assert universe == ai.possible_numbers
+    print("✅ インデックス対応テスト完了")
+
+
+def test_table_matches_reference():
+    """全ての組み合わせで従来の計算と一致することをテストする"""
+    print("\n=== 判定テーブル全件テスト ===")
+    numbers = numeron_scoring.ALL_NUMBERS
+    for a, answer in enumerate(numbers):
+        for g, guess in enumerate(numbers):
+            code = numeron_scoring.score(a, g)
+            assert numeron_scoring.decode(code) == reference_eat_bite(answer, guess)
+    assert numeron_scoring.score(0, 0) == numeron_scoring.WIN_CODE
+    print("✅ 判定テーブル全件テスト完了")
+
+
+def test_call_sites():
+    """各呼び出し元がテーブルを使って同じ結果を返すことをテストする"""
+    print("\n=== 呼び出し元テスト ===")
+    game = NumeronGame(GameMode.TWO_PLAYER)
+    ai = AIPlayer("テストAI")
+    assert game.calculate_eat_bite([1, 2, 3], [1, 2, 4]) == (2, 0)
+    assert game.calculate_eat_bite([1, 2, 3], [3, 1, 2]) == (0, 3)
+    assert ai.calculate_eat_bite([6, 3, 4], [0, 8, 4]) == (1, 0)
+    # テーブル外の入力（重複あり）は直接計算する
+    assert game.calculate_eat_bite([1, 2, 3], [0, 0, 0]) == (0, 0)
+    assert game.calculate_eat_bite([1, 2, 3], [1, 1, 1]) == reference_eat_bite([1, 2, 3], [1, 1, 1])
+    print("✅ 呼び出し元テスト完了")
+
+
+def test_row_filtering_speed():
+    """候補の一括絞り込みが従来の計算より高速であることを確認する"""
+    print("\n=== 速度比較 ===")
+    numbers = [list(numeron_scoring.ALL_NUMBERS[i]) for i in numeron_scoring.UNIVERSE]
+    guess = [1, 2, 3]
+    guess_index = numeron_scoring.index_of(guess)
+
+    def reference():
+        return [n for n in numbers if reference_eat_bite(n, guess) == (1, 1)]
+
+    def table():
+        row = numeron_scoring.row(guess_index)
+        code = numeron_scoring.encode(1, 1)
+        return [i for i in numeron_scoring.UNIVERSE if row[i] == code]
+
+    assert [numeron_scoring.number_at(i) for i in table()] == reference()
+    reference_time = min(timeit.repeat(reference, number=5, repeat=3))
+    table_time = min(timeit.repeat(table, number=5, repeat=3))
+    print(f"従来: {reference_time * 200:.2f}ms/回  テーブル: {table_time * 200:.2f}ms/回")
+    assert table_time < reference_time
+    print("✅ 速度比較完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_index_mapping()
+    test_table_matches_reference()
+    test_call_sites()
+    test_row_filtering_speed()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+自己対戦シミュレーターのテストスクリプト
+"""
+
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(__file__))
+
+from numeron_game import NumeronGame, GameMode, AIPlayer
+from numeron_simulate import play_game, simulate, SimulationStats
+
+TIMING_FIELDS = ('move_time', 'move_time_max', 'elapsed')
+
+
+def without_timing(result):
+    """時間以外の結果（再現性の比較用）"""
+    return {key: value for key, value in result.items() if key not in TIMING_FIELDS}
+
+
+def test_seeded_game():
+    """同じシードのゲームは同じ結果になることをテストする"""
+    print("=== シード固定テスト ===")
+    for policy in ("information", "random"):
+        for game_id in range(5):
+            first = play_game(game_id, seed=7, strategies=("entropy", "random"), item_policy=policy)
+            second = play_game(game_id, seed=7, strategies=("entropy", "random"), item_policy=policy)
+            assert without_timing(first) == without_timing(second)
+            assert first['winner'] in (1, 2)
+            assert first['first'] == game_id % 2 + 1
+    # プレイヤーの乱数もゲームの乱数に従う
+    numbers = [AIPlayer(rng=random.Random(3)).generate_random_number() for _ in range(2)]
+    assert numbers[0] == numbers[1]
+    game = NumeronGame(GameMode.TWO_PLAYER, rng=random.Random(3))
+    game.initialize_players()
+    assert game.player1.rng is game.rng and game.player2.rng is game.rng
+    print("✅ シード固定テスト完了")
+
+
+def test_simulate_chunks():
+    """並列数・チャンクサイズを変えても各ゲームの結果が変わらないことをテストする"""
+    print("\n=== 並列実行テスト ===")
+    serial = sorted((without_timing(r) for r in simulate(12, seed=1, workers=1, chunk_size=5)),
+                    key=lambda r: r['game_id'])
+    parallel = sorted((without_timing(r) for r in simulate(12, seed=1, workers=2, chunk_size=3)),
+                      key=lambda r: r['game_id'])
+    assert [r['game_id'] for r in serial] == list(range(12))
+    assert serial == parallel
+    print("✅ 並列実行テスト完了")
+
+
+def test_stats():
+    """集計結果をテストする"""
+    print("\n=== 集計テスト ===")
+    stats = SimulationStats()
+    results = list(simulate(10, seed=2, workers=1))
+    for result in results:
+        stats.add(result)
+    summary = stats.summary()
+    assert summary['games'] == 10
+    assert abs(sum(summary['win_rate']) + summary['unfinished'] / 10 - 1) < 1e-9
+    assert summary['average_turns'] == sum(r['turns'] for r in results) / 10
+    assert summary['max_calls'][0] == max(r['calls'][0] for r in results)
+    print(f"集計: {summary}")
+    print("✅ 集計テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_seeded_game()
+    test_simulate_chunks()
+    test_stats()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
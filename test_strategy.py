@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+AI推測戦略のテストスクリプト
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+sys.path.append(os.path.dirname(__file__))
+
+import numeron_scoring
+import numeron_strategy
+import numeron_opening
+from numeron_candidates import CandidateSet, OpponentKnowledge
+from numeron_strategy import get_selector, partition_counts
+from numeron_strategy import TreeSelector, ItemChooser
+from numeron_solver import TreeSolver, verify_tree
+from numeron_tree import StrategyTree
+from numeron_game import NumeronGame, GameMode, AIPlayer
+
+
+def solve(selector, secret_index):
+    """指定した戦略で番号を当てるまでのコール数を数える"""
+    candidates = CandidateSet()
+    for turn in range(1, 20):
+        guess_index = selector.select(candidates)
+        code = numeron_scoring.score(secret_index, guess_index)
+        if code == numeron_scoring.WIN_CODE:
+            return turn
+        candidates.filter_code(guess_index, code)
+    raise AssertionError("20回以内に当てられませんでした")
+
+
+def test_partition_counts():
+    """分割カウントが候補数の合計と一致することをテストする"""
+    print("=== 分割カウントテスト ===")
+    universe = numeron_scoring.UNIVERSE
+    counts = partition_counts(numeron_scoring.index_of([1, 2, 3]), universe)
+    assert sum(counts) == len(universe)
+    assert counts[numeron_scoring.WIN_CODE] == 1
+    if numeron_scoring.np is not None:
+        matrix = numeron_strategy.partition_matrix([numeron_scoring.index_of([1, 2, 3])], universe)
+        assert matrix[0].tolist() == counts
+    print("✅ 分割カウントテスト完了")
+
+
+def test_selectors_solve_faster_than_random():
+    """分割評価の戦略がランダム戦略より少ないコール数で当てることをテストする"""
+    print("\n=== 戦略比較テスト ===")
+    rng = random.Random(3)
+    secrets = rng.sample(numeron_scoring.UNIVERSE, 60)
+    averages = {}
+    for name in ("random", "entropy", "minimax", "expected"):
+        selector = get_selector(name, rng=random.Random(0))
+        turns = [solve(selector, secret) for secret in secrets]
+        averages[name] = sum(turns) / len(turns)
+        print(f"{name}: 平均 {averages[name]:.2f} コール（最大 {max(turns)}）")
+        if name != "random":
+            # 全648通りで最悪7コール以内に当てられる
+            assert max(turns) <= 7
+    assert averages["entropy"] < averages["random"]
+    assert averages["expected"] < averages["random"]
+    print("✅ 戦略比較テスト完了")
+
+
+def test_pure_python_matches_numpy():
+    """純Python版とnumpy版で同じ推測を選ぶことをテストする"""
+    print("\n=== 実装一致テスト ===")
+    if numeron_scoring.np is None:
+        print("numpy未インストールのためスキップ")
+        return
+    candidates = CandidateSet()
+    candidates.filter([1, 2, 3], 0, 1)
+    for name in ("entropy", "minimax", "expected"):
+        with_numpy = get_selector(name).select(candidates)
+        numeron_strategy.np = None
+        try:
+            without_numpy = get_selector(name).select(candidates)
+        finally:
+            numeron_strategy.np = numeron_scoring.np
+        assert with_numpy == without_numpy
+    # 防御探索で想定する相手のコールも一致する
+    with_numpy = numeron_strategy.opponent_calls(candidates.indices())
+    numeron_strategy.np = None
+    try:
+        without_numpy = numeron_strategy.opponent_calls(candidates.indices())
+    finally:
+        numeron_strategy.np = numeron_scoring.np
+    assert with_numpy == without_numpy
+    print("✅ 実装一致テスト完了")
+
+
+def test_time_budget():
+    """時間切れの場合もそれまでの最良の推測を返すことをテストする"""
+    print("\n=== 時間制限テスト ===")
+    selector = get_selector("entropy", time_budget=0.0)
+    guess_index = selector.select(CandidateSet())
+    assert selector.last_timed_out
+    assert 0 <= guess_index < numeron_scoring.NUMBER_COUNT
+    print(f"時間制限0秒での推測: {numeron_scoring.number_at(guess_index)}")
+    # 時間切れのあとは軽い戦略に切り替える
+    from numeron_game import AIPlayer
+    ai = AIPlayer("テストAI", strategy="entropy", time_budget=0.0, fallback_strategy="random", opening_book=False)
+    assert len(set(ai.make_guess(None))) == 3
+    assert ai.strategy == "random" and ai.guess_selector.name == "random"
+    print("✅ 時間制限テスト完了")
+
+
+def test_ai_player_strategy():
+    """AIPlayerが戦略を切り替えられることをテストする"""
+    print("\n=== AI戦略切り替えテスト ===")
+    ai = AIPlayer("テストAI", strategy="minimax")
+    ai.set_number([1, 0, 2])
+    guess = ai.make_guess(None)
+    assert guess != [1, 0, 2]
+    assert len(set(guess)) == 3
+    try:
+        AIPlayer("テストAI", strategy="unknown")
+        assert False, "不明な戦略でエラーになりませんでした"
+    except ValueError:
+        pass
+    print("✅ AI戦略切り替えテスト完了")
+
+
+def test_opening_book():
+    """定跡ファイルが推測戦略の計算結果と一致することをテストする"""
+    print("\n=== 定跡テスト ===")
+    book = numeron_opening.load_book()
+    for name in numeron_opening.BOOK_STRATEGIES:
+        universe = CandidateSet()
+        first = numeron_opening.book_move(name, universe)
+        assert first == get_selector(name).select(universe)
+        candidates = universe.copy()
+        candidates.filter_code(first, numeron_scoring.encode(0, 1))
+        reply = numeron_opening.book_move(name, candidates)
+        assert reply == get_selector(name).select(candidates)
+        print(f"{name}: 1手目 {book['strategies'][name]['first']}")
+
+    # 定跡外の履歴ではNoneを返す
+    candidates = CandidateSet()
+    candidates.filter([9, 8, 7], 0, 0)
+    assert numeron_opening.book_move("entropy", candidates) is None
+    assert numeron_opening.book_move("random", CandidateSet()) is None
+
+    ai = AIPlayer("テストAI")
+    ai.set_number([9, 8, 7])
+    assert ai.make_guess(None) == numeron_scoring.number_at(numeron_opening.book_move("entropy", CandidateSet()))
+    print("✅ 定跡テスト完了")
+
+
+def test_strategy_tree():
+    """戦略木の生成・mmap参照をテストする"""
+    print("\n=== 戦略木テスト ===")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tree.bin")
+        stats = TreeSolver("entropy").build(path)
+        assert verify_tree(path) == stats['max_depth'] <= 7
+        print(f"ノード数 {stats['nodes']}、最悪 {stats['max_depth']} コール、平均 {stats['average_depth']:.3f} コール")
+
+        tree = StrategyTree(path)
+        first = tree.lookup([])
+        assert tree.lookup([(first, numeron_scoring.encode(0, 0))]) is not None
+        assert tree.lookup([(first + 1, numeron_scoring.encode(0, 0))]) is None
+        tree.close()
+
+        selector = TreeSelector(path=path)
+        candidates = CandidateSet()
+        assert selector.select(candidates) == first
+        # 木に無い局面（候補を直接指定）はentropy戦略で選ぶ
+        narrowed = CandidateSet.from_numbers([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        assert selector.select(narrowed) == get_selector("entropy").select(narrowed)
+    print("✅ 戦略木テスト完了")
+
+
+def test_item_chooser():
+    """期待情報量によるアイテム選択をテストする"""
+    print("\n=== アイテム選択テスト ===")
+    chooser = ItemChooser()
+    universe = CandidateSet()
+    values = chooser.evaluate(universe, ["HIGH&LOW", "TARGET", "SLASH"])
+    call_value = chooser.call_expected_size(universe)
+    print(f"通常コール: {call_value:.1f}  " + "  ".join(f"{k}: {v[0]:.1f}" for k, v in values.items()))
+    assert values["HIGH&LOW"][0] < call_value
+    assert chooser.choose(universe, ["HIGH&LOW", "TARGET", "SLASH"]) == ("HIGH&LOW", None)
+    # 通常コールより絞り込めないアイテムは使わない
+    assert values["TARGET"][0] > call_value
+    assert chooser.choose(universe, ["TARGET"]) is None
+    # 候補が少なければコールで当てにいく
+    assert chooser.choose(CandidateSet.from_numbers([[1, 2, 3], [1, 2, 4]]), ["HIGH&LOW"]) is None
+
+    ai = AIPlayer("テストAI")
+    assert ai.choose_item(None).name == "HIGH&LOW"
+    ai.used_items_this_turn = True
+    assert ai.choose_item(None) is None
+    assert AIPlayer("テストAI", item_policy="none").choose_item(None) is None
+    print("✅ アイテム選択テスト完了")
+
+
+def test_defense_search():
+    """SHUFFLE/CHANGEの防御探索をテストする"""
+    print("\n=== 防御探索テスト ===")
+    number = [1, 2, 3]
+    knowledge = OpponentKnowledge()
+    for guess in ([1, 4, 5], [2, 1, 6]):
+        eat, bite = numeron_scoring.calculate_eat_bite(number, guess)
+        knowledge.observe_call(guess, eat, bite)
+    knowledge.observe_item({'item': 'SLASH', 'slash': 2})
+    assert number in knowledge.candidates
+
+    # SHUFFLE後に相手が広げる候補は、どの並べ替えを選んでも同じ
+    expanded = set()
+    for i in knowledge.candidates.indices():
+        expanded.update(numeron_scoring.PERMUTATIONS[i])
+    expanded = sorted(expanded)
+    calls = numeron_strategy.opponent_calls(expanded)[0]
+    assert len(calls) == numeron_strategy.DEFENSE_CALLS
+
+    def hidden(candidate):
+        """広げた候補のうち、相手のコールの後も candidate と区別できない番号の数の平均（比較用）"""
+        total = 0
+        for g in calls:
+            guess = numeron_scoring.number_at(g)
+            result = numeron_scoring.calculate_eat_bite(candidate, guess)
+            total += sum(1 for i in expanded
+                         if numeron_scoring.calculate_eat_bite(numeron_scoring.number_at(i), guess) == result)
+        return total / len(calls)
+
+    options, scores = numeron_strategy.shuffle_scores(knowledge, number)
+    assert scores == [hidden(o) for o in options]
+    rng = random.Random(0)
+    shuffled = numeron_strategy.best_shuffle(knowledge, number, rng=rng)
+    assert sorted(shuffled) == number and shuffled != number
+    assert hidden(shuffled) == max(scores)
+
+    pos, digit = numeron_strategy.best_change(knowledge, number, rng=rng)
+    assert digit not in number and (digit >= 5) == (number[pos] >= 5)
+
+    # アイテム選択は全体の乱数を使わない
+    state = random.getstate()
+    ItemChooser().choose_defense(["SHUFFLE", "CHANGE"], knowledge, number)
+    assert random.getstate() == state
+
+    # 広げた候補ごとのコールと分割は1度だけ計算し、全ての選択肢の評価で使い回す
+    tables = numeron_strategy._DEFENSE_TABLES
+    tables.clear()
+    numeron_strategy.change_scores(knowledge, number)
+    assert len(tables) == 3  # 交換する桁ごと
+    chooser = ItemChooser()
+    started = time.perf_counter()
+    for _ in range(200):
+        tables.clear()
+        chooser.choose_defense(["SHUFFLE", "CHANGE"], knowledge, number)
+    cold = (time.perf_counter() - started) / 200
+    started = time.perf_counter()
+    for _ in range(1000):
+        chooser.choose_defense(["SHUFFLE", "CHANGE"], knowledge, number)
+    warm = (time.perf_counter() - started) / 1000
+    print(f"防御探索: 初回 {cold * 1e6:.0f}µs/回、2回目以降 {warm * 1e6:.0f}µs/回")
+    assert cold < 0.002 and warm < 0.0005
+
+    # ゲーム中のSHUFFLE/CHANGEでは数字の組・HIGH/LOWが保たれる
+    game = NumeronGame(GameMode.TWO_PLAYER)
+    game.initialize_players()
+    game.player1.set_number([1, 2, 3])
+    game.player2.set_number([4, 5, 6])
+    game.player2.opponent_knowledge = knowledge
+    game.process_item_effect(game.player2, game.player2.items[4], game.player1)
+    assert sorted(game.player2.number) == [4, 5, 6]
+    result = game.process_item_effect(game.player1, game.player1.items[5], game.player2)
+    assert result['info']['high'] is False
+    assert all(d < 5 for d in game.player1.number) and len(set(game.player1.number)) == 3
+    print("✅ 防御探索テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_partition_counts()
+    test_selectors_solve_faster_than_random()
+    test_pure_python_matches_numpy()
+    test_time_budget()
+    test_ai_player_strategy()
+    test_opening_book()
+    test_strategy_tree()
+    test_item_chooser()
+    test_defense_search()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
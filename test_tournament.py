@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+AI総当たりトーナメントのテストスクリプト
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+from numeron_game import AIPlayer, ai_profiles, register_profile, AI_PROFILES
+from numeron_strategy import SELECTORS
+from numeron_tournament import (run_tournament, TournamentResults, elo_ratings, score_matrix,
+                                standings, schedule_secrets, COLUMNS)
+
+PROFILES = ['random-noitems', 'entropy-noitems', 'minimax']
+
+
+def test_profiles():
+    """推測戦略ごとのAI設定が自動で用意され、登録した設定も使えることをテストする"""
+    print("=== AI設定テスト ===")
+    profiles = ai_profiles()
+    for strategy in SELECTORS:
+        assert profiles[strategy] == {'strategy': strategy}
+        assert profiles[f"{strategy}-noitems"]['item_policy'] == "none"
+        assert profiles[f"{strategy}-nobook"]['opening_book'] is False
+    register_profile("test-minimax-random-items", strategy="minimax", item_policy="random")
+    try:
+        ai = AIPlayer.from_profile("test-minimax-random-items", "テストAI")
+        assert ai.name == "テストAI" and ai.strategy == "minimax" and ai.item_policy == "random"
+    finally:
+        del AI_PROFILES["test-minimax-random-items"]
+    try:
+        AIPlayer.from_profile("unknown")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("不明な設定が受け付けられました")
+    print("✅ AI設定テスト完了")
+
+
+def rows(results):
+    """結果を (a, b, game) 順の行の一覧にする（比較用）"""
+    return sorted(zip(*(results.columns[name] for name, _ in COLUMNS)))
+
+
+def test_tournament_resume():
+    """共通の番号で総当たりし、中断した結果ファイルから再開できることをテストする"""
+    print("\n=== トーナメント再開テスト ===")
+    with tempfile.TemporaryDirectory() as directory:
+        full_path = os.path.join(directory, 'full.npz')
+        partial_path = os.path.join(directory, 'partial.npz')
+        full = run_tournament(PROFILES, rounds=3, seed=4, workers=1, output=full_path, chunk_size=4)
+        assert len(full) == 3 * 3 * 2
+        # 2ゲーム目は同じ番号の組を入れ替え、先攻も入れ替える
+        assert schedule_secrets(4, 0) == schedule_secrets(4, 0)
+        assert full.columns['first'][:2] == [0, 1]
+
+        partial = run_tournament(PROFILES, rounds=3, seed=4, workers=1, output=partial_path, chunk_size=4,
+                                 max_tasks=2)
+        assert 0 < len(partial) < len(full)
+        resumed = run_tournament(PROFILES, rounds=3, seed=4, workers=2, output=partial_path, chunk_size=4)
+        assert rows(resumed) == rows(full)
+        assert rows(TournamentResults.load(partial_path)) == rows(full)
+
+        try:
+            run_tournament(PROFILES, rounds=4, seed=4, workers=1, output=partial_path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("条件の異なる結果ファイルから再開しました")
+
+        table = standings(full, samples=50)
+        assert len(table) == 3
+        for row in table:
+            low, high = row['interval']
+            assert row['games'] == 12
+            assert low <= high
+        print(f"順位表: {[(row['profile'], round(row['rating'])) for row in table]}")
+    print("✅ トーナメント再開テスト完了")
+
+
+def test_elo():
+    """勝ち点の多いプロファイルほどレーティングが高いことをテストする"""
+    print("\n=== Eloレーティングテスト ===")
+    # 0は1に8勝2敗、1は2に全勝、打ち切りは引き分け
+    a = [0] * 10 + [1] * 10 + [0]
+    b = [1] * 10 + [2] * 10 + [2]
+    winner = [0] * 8 + [1] * 2 + [0] * 10 + [-1]
+    points, games = score_matrix(a, b, winner, 3)
+    assert points[0][1] == 8 and points[1][0] == 2 and points[0][2] == 0.5
+    ratings = elo_ratings(points, games)
+    assert ratings[0] > ratings[1] > ratings[2]
+    assert abs(sum(ratings) / 3 - 1500) < 1e-6
+    print(f"レーティング: {[round(r) for r in ratings]}")
+    print("✅ Eloレーティングテスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_profiles()
+    test_tournament_resume()
+    test_elo()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+WebバックエンドのJSON APIのテストスクリプト
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from web_test_helper import new_client
+
+
+def test_guess_delta():
+    """推測・アイテム・GIVE UPが変化した部分だけを返すことをテストする"""
+    print("=== 差分レスポンステスト ===")
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, game_id = setup
+    api = f'/api/games/{game_id}'
+
+    response = client.post(f'{api}/guess', json={'guess': '340'})
+    delta = response.get_json()
+    assert response.status_code == 200 and delta['ok']
+    assert delta['player'] == 'player1' and delta['current_player'] == 'プレイヤー2'
+    assert delta['history'] == {'guess': [3, 4, 0], 'eat': 0, 'bite': 2, 'effect': '', 'index': 1}
+    assert delta['turn'] == 2 and not delta['game_ended']
+    # 画面全体より1桁以上小さい
+    page = client.get('/game?mode=two')
+    assert len(response.data) * 10 < len(page.data)
+
+    delta = client.post(f'{api}/item', json={'item_name': 'TARGET', 'target_digit': 5}).get_json()
+    assert delta['ok'] and delta['player'] == 'player2' and delta['item_used_this_turn']
+    assert delta['history']['effect'] == "TARGETアイテム: 数字5は2桁目にあります"
+    assert {'name': 'TARGET', 'used': True} in delta['items']
+    response = client.post(f'{api}/item', json={'item_name': 'SLASH'})
+    assert response.status_code == 400 and not response.get_json()['ok']
+
+    delta = client.post(f'{api}/guess', json={'guess': [1, 5, 8]}).get_json()
+    assert delta['ok'] and delta['game_ended'] and delta['winner'] == 'プレイヤー2'
+    response = client.post(f'{api}/giveup')
+    assert response.status_code == 400  # 終了後は操作できない
+
+    # 状態の保存とフォーム画面への反映
+    state = web.game_store.get(game_id)
+    assert len(state['player1_history']) == 1 and len(state['player2_history']) == 2
+    assert "0EAT 2BITE" in client.get('/game?mode=two').get_data(as_text=True)
+    print("✅ 差分レスポンステスト完了")
+
+
+def test_state_and_errors():
+    """状態取得・入力エラー・他人のゲームIDをテストする"""
+    print("\n=== 状態取得・エラーテスト ===")
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, game_id = setup
+    api = f'/api/games/{game_id}'
+
+    response = client.post(f'{api}/guess', json={'guess': '113'})
+    assert response.status_code == 400 and response.get_json()['error'] == "数字の重複は禁止です"
+    assert client.post(f'{api}/guess', json={}).get_json()['error'] == "3桁の数字を入力してください"
+
+    delta = client.post(f'{api}/giveup').get_json()
+    assert delta['ok'] and delta['winner'] == 'プレイヤー2'
+    assert delta['history']['effect'] == "GIVE UP! 答えは 634 でした"
+
+    state = client.get(f'{api}/state').get_json()
+    assert state['game_ended'] and state['mode'] == 'two'
+    assert len(state['player1_history']) == 1 and 'player1_number' not in state
+
+    # 終了したゲームは記録される
+    web.game_recorder.flush()
+    games = client.get('/api/players/me/games').get_json()
+    assert games[0]['id'] == game_id and games[0]['reason'] == 'giveup' and games[0]['winner'] == 2
+    assert web.game_recorder.game_calls(game_id) == []
+
+    # セッションのゲームID以外は見つからない
+    assert client.get('/api/games/other/state').status_code == 404
+    other = web.app.test_client()
+    assert other.post(f'{api}/guess', json={'guess': '634'}).status_code == 404
+    print("✅ 状態取得・エラーテスト完了")
+
+
+def test_single_player_ai_turn():
+    """1人用でコールのたびにAIが推測し、思考時間が記録されることをテストする"""
+    print("\n=== AIターンテスト ===")
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, _ = setup
+    client.get('/game?mode=single&new=true')
+    cookie = client.get_cookie('session').value
+    game_id = web.app.session_interface.get_signing_serializer(web.app).loads(cookie)['game_id']
+    state = web.game_store.get(game_id)
+    assert len(set(state['player2_number'])) == 3 and state['player2_number'][0] != 0
+
+    guesses = [g for g in ('901', '902', '903', '904', '905', '906', '907', '908', '910', '912')
+               if [int(d) for d in g] != state['player2_number']]
+    for guess in guesses:
+        delta = client.post(f'/api/games/{game_id}/guess', json={'guess': guess}).get_json()
+        assert delta['ok'] and delta['current_player'] == 'AI'
+        if 'ai' in delta:
+            ai = delta['ai']  # 先読み済み
+        else:
+            # AIの手番の間は操作できない
+            assert client.post(f'/api/games/{game_id}/giveup').status_code == 400
+            ai = client.get(f"/api/games/{game_id}/ai?ticket={delta['ai_ticket']}&wait=5").get_json()
+            assert not ai.get('pending')
+        assert ai['player'] == 'player2' and ai['history']['think_time'] >= 0 and ai['history']['compute_time'] >= 0
+        eat, bite = web.calculate_eat_bite(state['player1_number'], ai['history']['guess'])
+        assert (ai['history']['eat'], ai['history']['bite']) == (eat, bite)
+        if ai['game_ended']:
+            assert ai['winner'] == 'AI'
+            break
+        assert ai['current_player'] == 'プレイヤー1' and ai['turn'] == delta['turn'] + 1
+    state = web.game_store.get(game_id)
+    assert state['game_ended']  # AIは10手以内に当てる
+    assert len(state['player1_history']) == len(state['player2_history'])
+    print(f"AIのコール数: {len(state['player2_history'])}")
+    # 2手目以降は人間の手番の間に先読みした推測を使う
+    ponder = client.get('/api/ai/stats').get_json()['ponder']
+    assert ponder['started'] >= 1 and ponder['hits'] >= 1
+
+    # 思考時間はプレイヤーが待った時間で、先読みでの計算時間は compute_time に分けて記録する
+    with web.app.test_request_context():
+        web.session['game_id'] = 'think-time'
+        state = web.new_game_state('single')
+        state.update(current_player='AI', ai_started_at=time.time() - 0.2)
+        move = {'guess': [2, 3, 4], 'think_time': 3.0, 'strategy': 'entropy', 'selector': 'entropy',
+                'timed_out': False, 'pondered': True}
+        row = web.apply_ai_move(state, move)['history']
+    assert 0.2 <= row['think_time'] < 3.0 and row['compute_time'] == 3.0 and 'ai_started_at' not in state
+    print("✅ AIターンテスト完了")
+
+
+def test_concurrent_guesses():
+    """同じセッションから同時に推測しても、適用される操作は1回だけであることをテストする"""
+    print("\n=== 同時操作テスト ===")
+    setup = new_client()
+    if setup is None:
+        return
+    web, client, game_id = setup
+    other = web.app.test_client()
+    other.set_cookie('session', client.get_cookie('session').value)
+    calculate_eat_bite = web.calculate_eat_bite
+
+    def slow_calculate_eat_bite(answer, guess):
+        time.sleep(0.2)  # 両方のリクエストが保存前の状態を読み込むようにする
+        return calculate_eat_bite(answer, guess)
+
+    web.calculate_eat_bite = slow_calculate_eat_bite
+    try:
+        with ThreadPoolExecutor(2) as pool:
+            responses = list(pool.map(lambda c: c.post(f'/api/games/{game_id}/guess', json={'guess': '340'}),
+                                      (client, other)))
+    finally:
+        web.calculate_eat_bite = calculate_eat_bite
+    # 後から保存した方は手番が進んでいるので、相手の手番としてやり直さずに409を返す
+    assert sorted(response.status_code for response in responses) == [200, 409]
+    state = web.game_store.get(game_id)
+    assert len(state['player1_history']) == 1 and state['player2_history'] == []
+    assert state['turn'] == 2 and state['current_player'] == 'プレイヤー2'
+    print("✅ 同時操作テスト完了")
+
+
+def main():
+    """メインテスト関数"""
+    test_guess_delta()
+    test_state_and_errors()
+    test_single_player_ai_turn()
+    test_concurrent_guesses()
+    print("\n🎉 全てのテストが完了しました！")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,26 @@
 """
 Web版シナリオテスト
 実際のWebアプリケーションの動作をシミュレートしてテストする
+
+負荷テスト（--players を指定）:
+- N人の仮想プレイヤーがスレッドで同時に1人用・2人用のゲーム（推測・アイテム・GIVE UP）を繰り返し、
+  操作ごとのスループット・p50/p95/p99の応答時間・エラー率を表示する
+- --in-process: HTTPではなくFlaskのテストクライアントで直接呼び出す（ネットワークを除いたWSGIの処理時間）
+  - 画面へのログ出力は LOG_LEVEL=WARNING で抑えられる
+
+    python web_scenario_test.py --players 50 --duration 30 --base-url http://localhost:8000
+    LOG_LEVEL=WARNING python web_scenario_test.py --players 20 --games 10 --in-process
 """
 
+import argparse
+import os
+import random
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Any
+
 import requests
 import time
 import json
@@ -212,10 +230,273 @@ class WebGameTester:
             import traceback
             traceback.print_exc()
 
+# ----------------------------------------
+# 負荷テスト（仮想プレイヤーの同時実行）
+# ----------------------------------------
+ITEMS = ('HIGH&LOW', 'TARGET', 'SLASH')  # 番号・手番を変えないアイテム
+GAME_ID_PATTERN = re.compile(r'data-game-id="([^"]+)"')
+
+
+class HttpClient:
+    """HTTPで呼び出すクライアント（仮想プレイヤーごとに1つのセッション）"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method: str, path: str, **kwargs) -> Tuple[int, str]:
+        response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+        return response.status_code, response.text
+
+
+class InProcessClient:
+    """Flaskのテストクライアントで直接呼び出すクライアント"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, **kwargs) -> Tuple[int, str]:
+        response = self.client.open(path, method=method, **kwargs)
+        return response.status_code, response.get_data(as_text=True)
+
+
+def load_app():
+    """負荷テスト用に一時ディレクトリでWebアプリを読み込む（ログ・ゲーム記録の作成先）"""
+    import tempfile
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+    try:
+        import app as web
+    finally:
+        os.chdir(cwd)
+    return web.app
+
+
+class LoadStats:
+    """操作ごとの応答時間とエラー数（スレッド間で共有）"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.games = 0
+        self._lock = threading.Lock()
+
+    def record(self, action: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies.setdefault(action, []).append(seconds)
+            if not ok:
+                self.errors[action] = self.errors.get(action, 0) + 1
+
+    def game_finished(self):
+        with self._lock:
+            self.games += 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        """操作ごとの件数・スループット・パーセンタイル（ミリ秒）・エラー率"""
+        rows = {}
+        for action, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows[action] = {
+                'count': len(values),
+                'rps': len(values) / elapsed if elapsed > 0 else 0.0,
+                'p50': percentile(values, 50) * 1000,
+                'p95': percentile(values, 95) * 1000,
+                'p99': percentile(values, 99) * 1000,
+                'error_rate': self.errors.get(action, 0) / len(values),
+            }
+        return rows
+
+
+def percentile(values: List[float], p: float) -> float:
+    """昇順に並んだ値のパーセンタイル（nearest-rank）"""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+class VirtualPlayer:
+    """1人の仮想プレイヤー（ブラウザと同じ順序でAPIを呼び出す）"""
+
+    def __init__(self, client, stats: LoadStats, rng: random.Random,
+                 giveup_rate: float = 0.1, max_turns: int = 12):
+        self.client = client
+        self.stats = stats
+        self.rng = rng
+        self.giveup_rate = giveup_rate
+        self.max_turns = max_turns
+
+    def call(self, action: str, method: str, path: str, **kwargs) -> Tuple[bool, Any]:
+        """1回の呼び出しの応答時間を記録し、(成功したか, JSONまたは本文) を返す"""
+        started = time.perf_counter()
+        try:
+            status, body = self.client.request(method, path, **kwargs)
+        except Exception:
+            self.stats.record(action, time.perf_counter() - started, False)
+            return False, None
+        elapsed = time.perf_counter() - started
+        if path.startswith('/api/'):
+            try:
+                body = json.loads(body)
+            except ValueError:
+                body = None
+            ok = status == 200 and isinstance(body, dict) and body.get('ok', True)
+        else:
+            ok = status == 200
+        self.stats.record(action, elapsed, ok)
+        return ok, body
+
+    def new_guess(self) -> str:
+        digits = random_digits(self.rng)
+        return ''.join(map(str, digits))
+
+    def start(self, mode: str) -> Optional[str]:
+        """新しいゲームを開始し、ゲームIDを返す（2人用は両プレイヤーの番号を設定する）"""
+        ok, page = self.call('page', 'GET', f'/game?mode={mode}&new=true')
+        if ok and mode == 'two':
+            for _ in range(2):
+                digits = random_digits(self.rng)
+                ok, page = self.call('set_number', 'POST', '/game', data={
+                    'action': 'set_number', 'digit1': str(digits[0]),
+                    'digit2': str(digits[1]), 'digit3': str(digits[2])})
+                if not ok:
+                    break
+        match = GAME_ID_PATTERN.search(page or '') if ok else None
+        return match.group(1) if match and match.group(1) else None
+
+    def play_single(self):
+        """1人用: 推測→AIの応答を待つ、を繰り返す（途中でアイテム・GIVE UP）"""
+        game_id = self.start('single')
+        if game_id is None:
+            return
+        api = f'/api/games/{game_id}'
+        item_turn = self.rng.randrange(1, 4)
+        giveup_turn = self.rng.randrange(2, self.max_turns) if self.rng.random() < self.giveup_rate else None
+        for turn in range(1, self.max_turns + 1):
+            if turn == giveup_turn:
+                self.call('giveup', 'POST', f'{api}/giveup')
+                break
+            if turn == item_turn:
+                self.use_item(api)
+            ok, delta = self.call('guess', 'POST', f'{api}/guess', json={'guess': self.new_guess()})
+            if not ok or delta['game_ended']:
+                break
+            ticket = delta.get('ai_ticket')
+            while ticket and 'ai' not in delta:
+                ok, delta = self.call('ai', 'GET', f'{api}/ai?ticket={ticket}&wait=5')
+                if not ok or not delta.get('pending'):
+                    break
+            if not ok or delta.get('ai', delta).get('game_ended'):
+                break
+        self.stats.game_finished()
+
+    def play_two(self):
+        """2人用: 同じ端末で2人が交互に推測する（途中でアイテム・GIVE UP）"""
+        game_id = self.start('two')
+        if game_id is None:
+            return
+        api = f'/api/games/{game_id}'
+        giveup_turn = self.rng.randrange(2, self.max_turns) if self.rng.random() < self.giveup_rate else None
+        for turn in range(1, self.max_turns + 1):
+            if turn == giveup_turn:
+                self.call('giveup', 'POST', f'{api}/giveup')
+                break
+            if turn <= 2:
+                self.use_item(api)  # 各プレイヤーが最初の手番で1回ずつ
+            ok, delta = self.call('guess', 'POST', f'{api}/guess', json={'guess': self.new_guess()})
+            if not ok or delta['game_ended']:
+                break
+        self.stats.game_finished()
+
+    def use_item(self, api: str):
+        item_name = self.rng.choice(ITEMS)
+        data = {'item_name': item_name}
+        if item_name == 'TARGET':
+            data['target_digit'] = self.rng.randrange(10)
+        self.call('item', 'POST', f'{api}/item', json=data)
+
+
+def random_digits(rng: random.Random) -> List[int]:
+    """重複の無い3桁（最初の桁は1-9）"""
+    first = rng.randrange(1, 10)
+    rest = rng.sample([d for d in range(10) if d != first], 2)
+    return [first] + rest
+
+
+def run_load(players: int, new_client, games: Optional[int] = None, duration: Optional[float] = None,
+             single_ratio: float = 0.5, giveup_rate: float = 0.1, seed: Optional[int] = None) -> Dict[str, Any]:
+    """仮想プレイヤーを同時に動かし、操作ごとの集計を返す
+
+    games: 1人あたりのゲーム数、duration: 実行する秒数（両方指定した場合は先に達した方で終了）
+    """
+    if games is None and duration is None:
+        games = 1
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(index: int):
+        rng = random.Random(None if seed is None else seed + index)
+        player = VirtualPlayer(new_client(), stats, rng, giveup_rate)
+        played = 0
+        while (games is None or played < games) and (deadline is None or time.perf_counter() < deadline):
+            if rng.random() < single_ratio:
+                player.play_single()
+            else:
+                player.play_two()
+            played += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(players) as pool:
+        list(pool.map(worker, range(players)))
+    elapsed = time.perf_counter() - started
+    total = sum(len(values) for values in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    return {
+        'players': players, 'elapsed': elapsed, 'games': stats.games, 'requests': total,
+        'rps': total / elapsed if elapsed > 0 else 0.0,
+        'error_rate': errors / total if total else 0.0,
+        'actions': stats.report(elapsed),
+    }
+
+
+def print_report(result: Dict[str, Any], target: str):
+    print(f"負荷テスト結果（{target}、{result['players']}人同時）")
+    print("=" * 72)
+    print(f"実行時間: {result['elapsed']:.2f}秒  ゲーム数: {result['games']}  リクエスト数: {result['requests']}")
+    print(f"スループット: {result['rps']:.1f} req/s  エラー率: {result['error_rate'] * 100:.2f}%")
+    print()
+    print(f"{'操作':<12}{'件数':>8}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'エラー率':>10}")
+    for action, row in result['actions'].items():
+        print(f"{action:<12}{row['count']:>8}{row['rps']:>10.1f}{row['p50']:>10.2f}{row['p95']:>10.2f}"
+              f"{row['p99']:>10.2f}{row['error_rate'] * 100:>9.2f}%")
+
+
 def main():
-    """メインテスト関数"""
-    tester = WebGameTester()
-    tester.run_all_tests()
+    """メインテスト関数（--players を指定すると負荷テスト）"""
+    parser = argparse.ArgumentParser(description="Web版シナリオテスト・負荷テスト")
+    parser.add_argument('--base-url', default="http://localhost:3001", help="テスト対象のURL")
+    parser.add_argument('--players', type=int, help="同時に動かす仮想プレイヤー数（指定すると負荷テスト）")
+    parser.add_argument('--games', type=int, help="1人あたりのゲーム数（既定: --duration が無ければ1）")
+    parser.add_argument('--duration', type=float, help="実行する秒数")
+    parser.add_argument('--single-ratio', type=float, default=0.5, help="1人用ゲームの割合")
+    parser.add_argument('--giveup-rate', type=float, default=0.1, help="途中でGIVE UPするゲームの割合")
+    parser.add_argument('--seed', type=int, help="乱数のシード")
+    parser.add_argument('--in-process', action='store_true', help="Flaskのテストクライアントで直接呼び出す")
+    args = parser.parse_args()
+
+    if not args.players:
+        tester = WebGameTester(args.base_url)
+        tester.run_all_tests()
+        return
+    if args.in_process:
+        app = load_app()
+        new_client, target = (lambda: InProcessClient(app)), "in-process"
+    else:
+        new_client, target = (lambda: HttpClient(args.base_url)), args.base_url
+    result = run_load(args.players, new_client, games=args.games, duration=args.duration,
+                      single_ratio=args.single_ratio, giveup_rate=args.giveup_rate, seed=args.seed)
+    print_report(result, target)
 
 if __name__ == "__main__":
     main()
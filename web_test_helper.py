@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Webアプリのテストで共通に使う処理（test_*.py から読み込む）
+
+- Webアプリは一時ディレクトリ WORK_DIR で読み込み、ログ・ゲーム記録をそこに作成する
+- Flask が無い環境では load_app() / new_client() が「Flask未インストールのためスキップ」と表示して None を返す
+"""
+
+import sys
+import os
+import tempfile
+import atexit
+import shutil
+from contextlib import contextmanager
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+WORK_DIR = tempfile.mkdtemp()  # Webアプリを読み込むディレクトリ（ログ・ゲーム記録の作成先）
+atexit.register(shutil.rmtree, WORK_DIR, True)
+
+
+@contextmanager
+def in_work_dir():
+    """WORK_DIR に移動して実行する（ログファイルなど相対パスの作成先）"""
+    cwd = os.getcwd()
+    os.chdir(WORK_DIR)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def load_app():
+    """Webアプリのモジュールを返す（Flask未インストールならNone）"""
+    try:
+        import flask  # noqa: F401
+    except ImportError:
+        print("Flask未インストールのためスキップ")
+        return None
+    with in_work_dir():
+        import app as web
+    return web
+
+
+def new_client():
+    """2人用のゲームで番号を設定済みのテストクライアントとゲームIDを返す（Flask未インストールならNone）"""
+    web = load_app()
+    if web is None:
+        return None
+    client = web.app.test_client()
+    client.get('/game?mode=two')
+    cookie = client.get_cookie('session').value
+    game_id = web.app.session_interface.get_signing_serializer(web.app).loads(cookie)['game_id']
+    for digits in ('158', '634'):
+        client.post('/game', data={'action': 'set_number', 'digit1': digits[0],
+                                   'digit2': digits[1], 'digit3': digits[2]})
+    assert f'data-game-id="{game_id}"' in client.get('/game?mode=two').get_data(as_text=True)
+    return web, client, game_id